@@ -0,0 +1,101 @@
+"""Benchmark of /query response decoding
+
+Compares the generic path (`json.loads` + `QueryResponse.from_dict`) with the fast decode path
+(`decode_query_response_json`, for each embedding mode when the chunks carry embeddings) on a
+synthetic response, reporting decode time and the memory retained by the decoded models.
+
+Usage, from the repository root:
+    python -m benchmarks.benchmark_decode --top-k 100 --queries 4 --embedding-dim 1536
+"""
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+from pyframework.long_term_memory_client.models import QueryResponse
+from pyframework.long_term_memory_client.models.fast_decode import decode_query_response_json
+
+
+def synthetic_response(queries: int, top_k: int, embedding_dim: int) -> bytes:
+    rng = random.Random(0)
+    results = []
+    for query_index in range(queries):
+        chunks = []
+        for rank in range(top_k):
+            chunk = {
+                "id": f"doc-{query_index}-{rank}_0",
+                "text": " ".join(rng.choice(("memory", "travel", "plan", "user", "note", "meeting")) for _ in range(60)),
+                "score": rng.random(),
+                "metadata": {
+                    "source": "chat",
+                    "source_id": f"chat-{rng.randrange(1000)}",
+                    "created_at": "2024-05-01T12:00:00Z",
+                    "author": "user",
+                    "document_id": f"doc-{query_index}-{rank}",
+                    "user_id": "42",
+                },
+            }
+            if embedding_dim:
+                chunk["embedding"] = [rng.random() for _ in range(embedding_dim)]
+            chunks.append(chunk)
+        results.append({"query": f"query {query_index}", "results": chunks})
+    return json.dumps({"results": results}).encode("utf-8")
+
+
+def generic_decode(content: bytes) -> QueryResponse:
+    return QueryResponse.from_dict(json.loads(content))
+
+
+def measure(decode: Callable[[bytes], QueryResponse], content: bytes, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode(content)
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    decoded = decode(content)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+    return statistics.median(timings), retained - before, peak - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--embedding-dim", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    content = synthetic_response(args.queries, args.top_k, args.embedding_dim)
+    assert generic_decode(content) == decode_query_response_json(content)
+    print(f"{args.queries} queries x top_k={args.top_k}, embedding_dim={args.embedding_dim}, {len(content) / 1024:.0f} KiB")
+
+    decoders = [("from_dict", generic_decode), ("fast", decode_query_response_json)]
+    if args.embedding_dim:
+        decoders += [
+            ("fast drop", lambda data: decode_query_response_json(data, "drop")),
+            ("fast f32", lambda data: decode_query_response_json(data, "float32")),
+        ]
+
+    baseline = None
+    for name, decode in decoders:
+        seconds, retained, peak = measure(decode, content, args.repeat)
+        line = f"{name:>10}: {seconds * 1000:8.2f} ms  retained {retained / 1024:8.0f} KiB  peak {peak / 1024:8.0f} KiB"
+        if baseline is None:
+            baseline = (seconds, retained)
+        else:
+            line += f"  ({baseline[0] / seconds:.1f}x faster, {100 * (1 - retained / baseline[1]):.0f}% less retained)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import collections
 import json
 import os
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import List, Optional, Type, TypeVar
+from typing import List, Optional, Type, TypeVar, Union
 
 import litellm
 import tenacity
@@ -13,7 +12,11 @@ from openai.types.chat import ChatCompletion
 from pydantic import BaseModel
 
 from pyframework.jwt_util import logger
+from pyframework.trace.deadline import DeadlineExceeded, bounded_timeout, remaining_time
+from pyframework.trace.disconnect import ClientDisconnected, check_disconnected
 from pyframework.utils import current_datetime_tz
+from .routing import ModelConfig, ModelRouter
+from .tools import ToolRegistry
 from .timezone import get_current_timezone
 
 
@@ -54,32 +57,6 @@ litellm.drop_params = True
 # os.environ['LITELLM_LOG'] = 'DEBUG'
 
 
-ModelConfig = collections.namedtuple('ModelConfig',
-                                     [
-                                         'classification',
-                                         'big_summary',
-                                         'code',
-                                         'summary',
-                                         'reminder',
-                                         'reminder_process',
-                                         'answer',
-                                         'question',
-                                         'command',
-                                         'infer_context',
-                                         'response_eval',
-                                         'response_prep',
-                                         'response_refine',
-                                         'grounding',
-                                         'utility',
-                                         'decision',
-                                         'scrape',
-                                         'reference',
-                                         'post_answer',
-                                         'reason',
-                                         'quick_reason',
-                                         'alt_reason',
-                                     ])
-
 gpt_main_alt = os.getenv('GPT_MAIN', 'gpt-4.1')
 gpt_o3_mini = os.getenv('GPT_MAIN', 'o3-mini')
 gpt_main = os.getenv('GPT_MAIN', 'gpt-4.1')
@@ -96,7 +73,7 @@ groq_versatile = os.getenv('GROQ_VERSATILE', 'groq/llama-3.1-70b-versatile')
 groq_high = os.getenv('GROQ_HIGH', 'groq/llama-3.2-3b-preview')
 deepseek_reasoner = os.getenv('DEEPSEEK_REASONER', 'deepseek-reasoner')
 
-MODEL_CONFIG = ModelConfig(
+DEFAULT_MODEL_ROUTES = dict(
     classification=gpt_main,
     big_summary=gpt_main,
     code=gpt_main_alt,
@@ -121,6 +98,10 @@ MODEL_CONFIG = ModelConfig(
     alt_reason=deepseek_reasoner,
 )
 
+model_router = ModelRouter.from_env(DEFAULT_MODEL_ROUTES)
+
+MODEL_CONFIG = ModelConfig(model_router)
+
 client_openai = OpenAI()
 
 class BaseChat(ABC):
@@ -259,28 +240,43 @@ def add_chat_usage(response):
 
 T = TypeVar('T', bound=BaseModel)
 
+
+def format_system_message(messages):
+    # Check if the messages[0] is a system message and replace the marker "datetime" with the current date and time
+    if messages and messages[0].get("role") == "system":
+        messages[0]["content"] = messages[0]["content"].format(
+            datetime=f"\n** The current time and date is {current_datetime_tz().strftime('%Y-%m-%dT%H:%M:%S')}"
+                     f"\n** Timezone: {get_current_timezone()}\n"
+
+        )
+
+
 def call_llm_completion(target_model,
                         messages,
                         temperature=0.0,
                         response_format: Optional[Type[T]] = None,
-                        tools: Optional[List] = None,
+                        tools: Optional[Union[List, ToolRegistry]] = None,
                         stream: Optional[bool] = None,
                         **kwargs
 ):
-    # Check if the messages[0] is a system message and replace the marker "datetime" with the current date and time
-    if messages and messages[0].get("role") == "system":
-        messages[0]["content"] = messages[0]["content"].format(
-            datetime=f"\n** The current time and date is {current_datetime_tz().strftime('%Y-%m-%dT%H:%M:%S')}"
-                     f"\n** Timezone: {get_current_timezone()}\n"
+    if isinstance(tools, ToolRegistry):
+        tools = tools.tools()
 
-        )
+    # Don't spend tokens on a client that is gone, and never wait on the provider longer than
+    # the current request deadline allows
+    check_disconnected(f"calling {target_model}")
+    timeout = bounded_timeout(kwargs.pop('timeout', None), f"calling {target_model}")
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+
+    format_system_message(messages)
 
     target_response_format = response_format
     target_class_response = target_response_format
     if target_model.startswith("gemini"):
         # messages = convert_to_gemini_format(messages)
         safety_settings_arg = safety_settings
-    elif target_model.startswith("groq") and target_class_response is not None:
+    elif target_model.startswith("groq") and isinstance(target_class_response, type):
         target_response_format = response_format={"type": "json_object"}
         add_message("user",
                     f"Respond in this format:\n"
@@ -292,7 +288,8 @@ def call_llm_completion(target_model,
         response = client.chat.completions.create(
             model=target_model,
             temperature=temperature,
-            messages=messages
+            messages=messages,
+            **({"timeout": timeout} if timeout is not None else {})
         )
 
         add_chat_usage(response)
@@ -321,11 +318,20 @@ def call_llm_completion(target_model,
 
     while attempt < max_attempts:
         attempt += 1
+        if attempt > 1:
+            check_disconnected(f"retrying {target_model}")
+        if attempt > 1 and timeout is not None:
+            completion_params["timeout"] = bounded_timeout(timeout, f"retrying {target_model}")
         response = completion(**completion_params)
 
+        if stream:
+            # Streams are accounted once at the end by LLMStreamingResponse
+            break
+
         add_chat_usage(response)
 
-        if tools is None and response_format is not None:
+        # Only classes are parsed, dict formats such as {"type": "json_object"} return the raw response
+        if tools is None and isinstance(response_format, type):
             try:
                 if target_model.startswith("groq") and response_format is not None:
                     # TODO fix for groq
@@ -345,10 +351,17 @@ def call_llm_completion(target_model,
     return response
 
 
+def _stop_before_deadline(retry_state: tenacity.RetryCallState) -> bool:
+    # Stop retrying when the backoff sleep alone would run past the request deadline
+    remaining = remaining_time()
+    return remaining is not None and remaining <= (retry_state.upcoming_sleep or 0)
+
+
 @tenacity.retry(
-    stop=tenacity.stop_after_attempt(3),
+    stop=tenacity.stop_after_attempt(3) | _stop_before_deadline,
     wait=tenacity.wait_exponential(multiplier=1, min=4, max=10),
-    retry=tenacity.retry_if_exception_type(Exception),
+    retry=tenacity.retry_if_exception_type(Exception)
+          & tenacity.retry_if_not_exception_type((DeadlineExceeded, ClientDisconnected)),
     reraise=True
 )
 def call_model(target_model, messages, tools=None, response_format=None, temperature=0.0, max_tokens=None):
@@ -362,6 +375,32 @@ def call_model(target_model, messages, tools=None, response_format=None, tempera
     )
 
 
+def call_role_completion(role, messages, **kwargs):
+    """
+    Call the model currently routed for a role, falling back to the route's fallback models on errors.
+
+    The route's temperature and max_tokens are used unless they are passed explicitly.
+    """
+    route = model_router.route(role)
+    if route.temperature is not None:
+        kwargs.setdefault('temperature', route.temperature)
+    if route.max_tokens is not None:
+        kwargs.setdefault('max_tokens', route.max_tokens)
+
+    candidates = route.candidates
+    for index, target_model in enumerate(candidates):
+        try:
+            # Fresh dicts per attempt: format_system_message fills the system prompt in place
+            return call_llm_completion(target_model, [dict(message) for message in messages], **kwargs)
+        except (DeadlineExceeded, ClientDisconnected):
+            # The request is already over, another model would only spend more time and tokens
+            raise
+        except Exception as e:
+            if index == len(candidates) - 1:
+                raise
+            logger.warning(f"Model {target_model} failed for role {role}, falling back to {candidates[index + 1]}: {e}")
+
+
 def call_openai_voice(model, messages, temperature=0.0, **kwargs):
     # Check if the messages[0] is a system message and replace the marker "datetime" with the current date and time
     if messages and messages[0].get("role") == "system":
@@ -0,0 +1,259 @@
+"""
+Batched, cached text embeddings.
+
+Concurrent `embed` calls (from threads or from asyncio via `aembed`) are coalesced into a single
+provider request per `max_wait` window, identical texts in flight share one result, and every
+vector is cached in memory and optionally on disk as float32, keyed by a hash of model + text.
+Usage of each provider call is recorded with `add_chat_usage`, so each unique text is paid once.
+`close()` (or leaving the client as a context manager) embeds pending texts and stops the worker.
+
+Example:
+    embedder = EmbeddingClient(os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'),
+                               cache=EmbeddingCache(cache_dir=os.getenv('EMBEDDING_CACHE_DIR')))
+    vectors = embedder.embed(["first text", "second text"])  # np.ndarray, shape (2, dim), float32
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import litellm
+import numpy as np
+
+from pyframework.jwt_util import logger
+from .base import add_chat_usage
+
+
+def content_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingClientClosed(RuntimeError):
+    """Raised when texts are submitted to a closed EmbeddingClient"""
+
+
+class EmbeddingCache:
+    """
+    Two level embedding cache: a bounded in-memory LRU in front of an optional directory of .npy files.
+
+    Disk entries are sharded by the first two hex characters of the key and written atomically
+    (temporary file + rename), so concurrent processes can share a cache directory.
+    """
+
+    def __init__(self, max_items: int = 100_000, cache_dir: Optional[str] = None):
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                return vector
+
+        if not self.cache_dir:
+            return None
+        try:
+            vector = np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        vector.setflags(write=False)
+        self._remember(key, vector)
+        return vector
+
+    def put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        self._remember(key, vector)
+
+        if not self.cache_dir:
+            return vector
+        path = self._path(key)
+        if os.path.exists(path):
+            return vector
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, vector, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist embedding {key}: {e}")
+        return vector
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def __len__(self):
+        return len(self._memory)
+
+
+class EmbeddingClient:
+    """
+    Micro-batching embedding client.
+
+    Args:
+        model: litellm embedding model name, e.g. "text-embedding-3-small"
+        cache: Cache for computed vectors (a memory-only cache is created when omitted)
+        batch_size: Maximum number of texts sent in one provider call
+        max_wait: Seconds to wait for more requests before sending a partial batch
+        **embedding_kwargs: Extra arguments for `litellm.embedding` (dimensions, api_base, ...)
+    """
+
+    def __init__(self,
+                 model: str,
+                 cache: Optional[EmbeddingCache] = None,
+                 batch_size: int = 256,
+                 max_wait: float = 0.01,
+                 **embedding_kwargs):
+        self.model = model
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.embedding_kwargs = embedding_kwargs
+
+        self._pending: "OrderedDict[str, Tuple[str, Future]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._first_pending_at = 0.0
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts, reusing cached vectors and batching misses with concurrent callers.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dim)
+        """
+        futures = self._submit(texts)
+        return self._stack([future.result() for future in futures])
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        futures = self._submit(texts)
+        vectors = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        return self._stack(vectors)
+
+    def _stack(self, vectors: List[np.ndarray]) -> np.ndarray:
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def _submit(self, texts: Sequence[str]) -> List[Future]:
+        keys = [content_hash(self.model, text) for text in texts]
+        # Cache lookups may read from disk, so they stay outside the condition every producer waits on
+        cached: Dict[str, Optional[np.ndarray]] = {}
+        for key in keys:
+            if key not in cached:
+                cached[key] = self.cache.get(key)
+
+        futures = []
+        with self._condition:
+            if self._closed:
+                raise EmbeddingClientClosed("EmbeddingClient is closed")
+            for key, text in zip(keys, texts):
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    vector = cached[key]
+                    if vector is not None:
+                        future.set_result(vector)
+                    else:
+                        if not self._pending:
+                            self._first_pending_at = time.monotonic()
+                        self._pending[key] = (text, future)
+                        self._in_flight[key] = future
+                futures.append(future)
+
+            if self._pending:
+                self._ensure_worker()
+                self._condition.notify()
+        return futures
+
+    def close(self):
+        """Embed pending texts and stop the background thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def __enter__(self) -> "EmbeddingClient":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[str, str, Future]]:
+        with self._condition:
+            while True:
+                while not self._pending:
+                    if self._closed:
+                        return []
+                    self._condition.wait()
+                wait = self._first_pending_at + self.max_wait - time.monotonic()
+                if len(self._pending) >= self.batch_size or wait <= 0 or self._closed:
+                    break
+                self._condition.wait(wait)
+
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                key, (text, future) = self._pending.popitem(last=False)
+                batch.append((key, text, future))
+            self._first_pending_at = time.monotonic()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                vectors = self._call_provider([text for _, text, _ in batch])
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Embedding provider returned {len(vectors)} vectors for {len(batch)} texts")
+                for (key, _, future), vector in zip(batch, vectors):
+                    future.set_result(self.cache.put(key, vector))
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(batch)} texts failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    for key, _, _ in batch:
+                        self._in_flight.pop(key, None)
+
+    def _call_provider(self, texts: List[str]) -> np.ndarray:
+        response = litellm.embedding(model=self.model, input=texts, **self.embedding_kwargs)
+        add_chat_usage(response)
+
+        data = [item if isinstance(item, dict) else item.model_dump() for item in response.data]
+        data.sort(key=lambda item: item['index'])
+        return np.asarray([item['embedding'] for item in data], dtype=np.float32)
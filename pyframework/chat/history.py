@@ -0,0 +1,216 @@
+"""
+Conversation history compaction.
+
+Runs on raw chat messages (dicts with `type` and `content`) before
+`convert_chat_messages_to_role_format`, so the model is not re-sent data that newer messages
+have already superseded:
+
+    * REFERENCE_DATA and ORIENTATION messages are deduplicated by key and only the newest copy
+      of each key is kept.
+    * Consecutive NOTIFICATION messages are collapsed into one, and only the newest
+      `max_notification_groups` groups are kept.
+    * Optionally, conversation turns older than the last `window` messages are replaced by a
+      summary. Summaries are cached per conversation and extended incrementally with only the
+      turns that left the window since the previous call.
+
+Example:
+    compactor = HistoryCompactor(window=30, summarize=llm_summarizer())
+    messages = convert_chat_messages_to_role_format(
+        compactor.compact(chat_history, conversation_id=chat_id), system_prompt
+    )
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+from pydantic import BaseModel
+
+from .base import ChatMessageType, call_role_completion
+
+SUPERSEDED_TYPES = (ChatMessageType.REFERENCE_DATA, ChatMessageType.ORIENTATION)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages. Keep facts, decisions, open questions and "
+    "user preferences, drop small talk. Answer with the updated summary only."
+)
+
+Summarizer = Callable[[Optional[str], List[dict]], str]
+
+
+def default_message_key(message: dict) -> Hashable:
+    """Key under which a newer reference/orientation message supersedes an older one."""
+    key = message.get('key') or message.get('reference')
+    if key is not None:
+        return message['type'], key
+    if message['type'] == ChatMessageType.ORIENTATION:
+        return message['type']
+    return message['type'], message['content'] if isinstance(message['content'], str) else repr(message['content'])
+
+
+def llm_summarizer(role: str = 'summary', big_role: str = 'big_summary', big_threshold_chars: int = 12_000) -> Summarizer:
+    """
+    Build a summarizer that calls the routed `summary` model, or `big_summary` for large spans.
+    """
+    def summarize(previous_summary: Optional[str], messages: List[dict]) -> str:
+        transcript = "\n".join(
+            f"{message['type']}: {message['content']}" for message in messages if isinstance(message['content'], str)
+        )
+        prompt = f"Current summary:\n{previous_summary or '(empty)'}\n\nNew messages:\n{transcript}"
+        target_role = big_role if len(prompt) > big_threshold_chars else role
+        response = call_role_completion(target_role, [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": prompt},
+        ])
+        return response.choices[0].message.content.strip()
+
+    return summarize
+
+
+class CachedSummary(BaseModel):
+    covered: int
+    digest: str
+    summary: str
+
+
+class HistoryCompactor:
+    """
+    Removes superseded reference data and repeated notifications from chat histories, and
+    optionally replaces turns older than a window with a cached, incrementally updated summary.
+
+    Args:
+        window: Number of newest messages kept verbatim when summarizing (None never summarizes)
+        summarize: Summarizer called with the previous summary and the turns that left the window
+        message_key: Key under which a newer REFERENCE_DATA/ORIENTATION message supersedes an older one
+        max_notification_groups: Number of newest runs of consecutive notifications kept
+        max_cached_summaries: Number of conversations whose summary is cached (least recently used are dropped)
+    """
+
+    def __init__(self,
+                 window: Optional[int] = None,
+                 summarize: Optional[Summarizer] = None,
+                 message_key: Callable[[dict], Hashable] = default_message_key,
+                 max_notification_groups: int = 1,
+                 max_cached_summaries: int = 10_000):
+        self.window = window
+        self.summarize = summarize
+        self.message_key = message_key
+        self.max_notification_groups = max_notification_groups
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: "OrderedDict[Hashable, CachedSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, messages: List[dict], conversation_id: Optional[Hashable] = None) -> List[dict]:
+        """
+        Compact a raw chat history.
+
+        Args:
+            messages: Chat messages, oldest first, with `type` and `content` keys
+            conversation_id: Key for the summary cache. Summaries are only produced when it is given.
+
+        Returns:
+            A new list of messages, oldest first
+        """
+        latest_index = self._latest_superseded_index(messages)
+
+        split = len(messages)
+        if self.window is not None and self.summarize is not None and conversation_id is not None:
+            split = max(0, len(messages) - self.window)
+
+        compacted = []
+        if split:
+            turns = [message for message in messages[:split] if message['type'] not in SUPERSEDED_TYPES
+                     and message['type'] != ChatMessageType.NOTIFICATION]
+            if split < len(messages):
+                summary = self._summary(conversation_id, turns)
+                if summary:
+                    compacted.append({
+                        "type": ChatMessageType.REFERENCE_DATA,
+                        "content": f"Summary of the earlier conversation:\n{summary}",
+                    })
+                # Reference data still current is kept even if it was sent before the window
+                compacted.extend(messages[index] for index in sorted(latest_index) if index < split)
+            else:
+                compacted.extend(self._dedup(messages, latest_index, 0, split))
+
+        if split < len(messages):
+            compacted.extend(self._dedup(messages, latest_index, split, len(messages)))
+
+        return self._collapse_notifications(compacted)
+
+    def _latest_superseded_index(self, messages: List[dict]) -> Set[int]:
+        latest: Dict[Hashable, int] = {}
+        for index, message in enumerate(messages):
+            if message['type'] in SUPERSEDED_TYPES:
+                latest[self.message_key(message)] = index
+        return set(latest.values())
+
+    def _dedup(self, messages: List[dict], latest_index: Set[int], start: int, end: int) -> List[dict]:
+        return [
+            message for index, message in enumerate(messages[start:end], start)
+            if message['type'] not in SUPERSEDED_TYPES or index in latest_index
+        ]
+
+    def _collapse_notifications(self, messages: List[dict]) -> List[dict]:
+        groups = []
+        result = []
+        for message in messages:
+            if message['type'] != ChatMessageType.NOTIFICATION:
+                result.append(message)
+                continue
+            if result and result[-1] is (groups[-1] if groups else None):
+                _merge_notification(groups[-1], message['content'])
+                continue
+            group = {**message}
+            groups.append(group)
+            result.append(group)
+
+        dropped = {id(group) for group in groups[:max(0, len(groups) - self.max_notification_groups)]}
+        return [message for message in result if id(message) not in dropped]
+
+    def _summary(self, conversation_id: Hashable, turns: List[dict]) -> Optional[str]:
+        if not turns:
+            return None
+
+        with self._lock:
+            cached = self._summaries.get(conversation_id)
+
+        previous = None
+        start = 0
+        if cached is not None and cached.covered <= len(turns) and digest(turns[:cached.covered]) == cached.digest:
+            if cached.covered == len(turns):
+                return cached.summary
+            previous, start = cached.summary, cached.covered
+
+        summary = self.summarize(previous, turns[start:])
+
+        with self._lock:
+            self._summaries[conversation_id] = CachedSummary(covered=len(turns), digest=digest(turns), summary=summary)
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def forget(self, conversation_id: Hashable):
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+
+
+def _merge_notification(group: dict, content):
+    """Append a notification to a group, skipping repeats. List (multimodal) content is merged part by part."""
+    current = group['content']
+    if isinstance(current, str) and isinstance(content, str):
+        if content not in current.split("\n"):
+            group['content'] = f"{current}\n{content}"
+        return
+    parts = list(current) if isinstance(current, list) else [current]
+    parts.extend(part for part in (content if isinstance(content, list) else [content]) if part not in parts)
+    group['content'] = parts
+
+
+def digest(messages: List[dict]) -> str:
+    hasher = hashlib.sha256()
+    for message in messages:
+        hasher.update(f"{message['type']}\0{message['content']}\0".encode('utf-8'))
+    return hasher.hexdigest()
@@ -0,0 +1,346 @@
+"""
+LiteLLM-backed BaseChat with pooled sessions and token-windowed history.
+
+A `LiteLLMChat` is a light handle bound to a session id. The conversation state lives in a
+`SessionPool` shared by the process, stored compactly as (role, content, token count) tuples,
+and idle or least recently used sessions are evicted once the pool reaches its cap. Only the
+newest messages that fit in `history_token_budget` are sent to the model on each turn.
+
+Example:
+    chat = LiteLLMChat(system_prompt, MODEL_CONFIG.answer, session_id=chat_id, functions=tools)
+    chat.start_session(previous_messages)
+    reply = chat.send_message("What did I ask yesterday?")
+    for delta in chat.send_message("Tell me more", stream=True):
+        ...
+    reply = await chat.asend_message("And today?")
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Hashable, Iterator, List, Optional, Tuple, Union
+
+import litellm
+
+from pyframework.trace.deadline import bounded_timeout
+from pyframework.trace.disconnect import check_disconnected
+from .base import BaseChat, add_chat_usage, call_llm_completion, format_system_message, response_to_json, safety_settings
+from .streaming import account_stream_usage, chunk_text
+from .tools import ToolRegistry
+
+HistoryEntry = Tuple[str, Any, int]
+
+
+class ChatSession:
+    """Conversation state of one session: history entries, their running token total and last use time."""
+
+    __slots__ = ('entries', 'tokens', 'last_used', 'lock')
+
+    def __init__(self):
+        self.entries: List[HistoryEntry] = []
+        self.tokens = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def append(self, role: str, content: Any, tokens: int) -> HistoryEntry:
+        entry = (role, content, tokens)
+        self.entries.append(entry)
+        self.tokens += tokens
+        self.last_used = time.monotonic()
+        return entry
+
+    def remove(self, entry: HistoryEntry):
+        """Drop an entry added by append, e.g. the user turn of a failed call."""
+        for index in range(len(self.entries) - 1, -1, -1):
+            if self.entries[index] is entry:
+                del self.entries[index]
+                self.tokens -= entry[2]
+                return
+
+    def clear(self):
+        self.entries = []
+        self.tokens = 0
+
+    def window(self, budget: Optional[int]) -> List[dict]:
+        """Newest messages whose token counts fit in `budget`, oldest first. The last message is always kept."""
+        if budget is None or self.tokens <= budget:
+            selected = self.entries
+        else:
+            used = 0
+            start = len(self.entries)
+            for index in range(len(self.entries) - 1, -1, -1):
+                used += self.entries[index][2]
+                if used > budget and start < len(self.entries):
+                    break
+                start = index
+            selected = self.entries[start:]
+        return [{"role": role, "content": content} for role, content, _ in selected]
+
+
+class SessionPool:
+    """
+    Bounded, thread-safe map of session id -> ChatSession.
+
+    Sessions idle for longer than `idle_ttl` seconds are dropped, and when more than `max_sessions`
+    are held the least recently used ones are evicted.
+    """
+
+    def __init__(self, max_sessions: int = 50_000, idle_ttl: Optional[float] = 3600.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[Hashable, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Hashable, create: bool = True) -> Optional[ChatSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            elif create:
+                session = self._sessions[session_id] = ChatSession()
+                self._evict()
+            return session
+
+    def discard(self, session_id: Hashable):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        if self.idle_ttl is None:
+            return
+        expired_before = time.monotonic() - self.idle_ttl
+        # The oldest entries come first, so stop at the first session still in use
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= expired_before:
+                break
+            del self._sessions[session_id]
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+chat_sessions = SessionPool(
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', '50000')),
+    idle_ttl=float(os.getenv('CHAT_SESSION_IDLE_TTL', '3600')),
+)
+
+
+class LiteLLMChat(BaseChat):
+
+    def __init__(self,
+                 system_instruction: str,
+                 model_name: str,
+                 functions: Optional[Union[List, ToolRegistry]] = None,
+                 session_id: Optional[Hashable] = None,
+                 pool: Optional[SessionPool] = None,
+                 history_token_budget: Optional[int] = None,
+                 **completion_kwargs):
+        super().__init__(system_instruction, model_name, functions)
+        # A random id, never id(self): the pool outlives chats and ids of collected objects are reused
+        self.session_id = session_id if session_id is not None else uuid.uuid4().hex
+        self.pool = pool if pool is not None else chat_sessions
+        self.history_token_budget = history_token_budget
+        self.completion_kwargs = completion_kwargs
+
+    @property
+    def session(self) -> ChatSession:
+        return self.pool.get(self.session_id)
+
+    def count_tokens(self, role: str, content: Any) -> int:
+        try:
+            return litellm.token_counter(model=self.model_name, messages=[{"role": role, "content": content}])
+        except Exception:
+            return len(str(content)) // 4 + 4
+
+    def create_model(self, chat_history: List = None, add_tools=True):
+        """Return the completion parameters used for this chat (model, tools and extra kwargs)."""
+        tools = self.functions
+        if isinstance(tools, ToolRegistry):
+            tools = tools.tools()
+        return {
+            "target_model": self.model_name,
+            "tools": tools if add_tools and tools else None,
+            **self.completion_kwargs,
+        }
+
+    def start_session(self, chat_history: List = None):
+        """
+        (Re)load a session from previous messages in role format ({"role": ..., "content": ...}).
+        """
+        session = self.session
+        with session.lock:
+            session.clear()
+            for message in chat_history or []:
+                session.append(message["role"], message["content"],
+                               self.count_tokens(message["role"], message["content"]))
+        return session
+
+    def reset_chat(self):
+        self.pool.discard(self.session_id)
+
+    def _system_messages(self) -> List[dict]:
+        if not self.system_instruction:
+            return []
+        return [{"role": "system", "content": self.system_instruction}]
+
+    def _prepare_turn(self, message: str) -> Tuple[ChatSession, HistoryEntry, List[dict]]:
+        session = self.session
+        with session.lock:
+            entry = session.append("user", message, self.count_tokens("user", message))
+            return session, entry, self._system_messages() + session.window(self.history_token_budget)
+
+    @staticmethod
+    def _forget_turn(session: ChatSession, entry: HistoryEntry):
+        # A failed call must not leave a user message without a reply in the history
+        with session.lock:
+            session.remove(entry)
+
+    def _end_stream_turn(self, session: ChatSession, entry: HistoryEntry, parts: List[str]):
+        if parts:
+            self._remember_reply(session, entry, "".join(parts))
+        else:
+            self._forget_turn(session, entry)
+
+    def _remember_reply(self, session: ChatSession, entry: HistoryEntry, reply: Any):
+        content = reply.content if hasattr(reply, "content") else reply
+        if content is None:
+            # A reply made only of tool calls: the history holds no tool results to answer them, and
+            # providers reject an assistant tool_calls message without them, so the turn is dropped
+            self._forget_turn(session, entry)
+            return
+        with session.lock:
+            session.append("assistant", content, self.count_tokens("assistant", content))
+
+    @staticmethod
+    def _response_format(json_mode: bool, json_schema):
+        if json_schema is not None:
+            return json_schema
+        return {"type": "json_object"} if json_mode else None
+
+    def communicate(self, messages: List, stream: bool = False):
+        """Stateless call with an explicit message list."""
+        params = self.create_model()
+        return call_llm_completion(messages=self._system_messages() + list(messages), stream=stream, **params)
+
+    def send_message(self, message: str, json_mode: bool = False, json_schema: Optional[Any] = None,
+                     stream: bool = False):
+        """
+        Send a user message within the session and remember the reply.
+
+        Returns:
+            The assistant message (or the parsed `json_schema` model), or an iterator of text
+            deltas when `stream` is True
+        """
+        params = self.create_model()
+        response_format = self._response_format(json_mode, json_schema)
+
+        if stream:
+            return self._stream(message, params, response_format)
+
+        session, entry, messages = self._prepare_turn(message)
+        try:
+            response = call_llm_completion(messages=messages, response_format=response_format, **params)
+        except BaseException:
+            self._forget_turn(session, entry)
+            raise
+        if hasattr(response, "choices"):
+            reply = response.choices[0].message
+            self._remember_reply(session, entry, reply)
+            return reply
+        self._remember_reply(session, entry, response.model_dump_json() if hasattr(response, "model_dump_json") else response)
+        return response
+
+    def _stream(self, message: str, params: dict, response_format) -> Iterator[str]:
+        # The user turn is only added once the stream is consumed
+        session, entry, messages = self._prepare_turn(message)
+        chunks = []
+        parts = []
+        try:
+            for chunk in call_llm_completion(messages=messages, response_format=response_format, stream=True, **params):
+                chunks.append(chunk)
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception:
+            self._forget_turn(session, entry)
+            raise
+        except BaseException:
+            # Closed or cancelled by the consumer: keep the part of the reply it was shown
+            self._end_stream_turn(session, entry, parts)
+            raise
+        else:
+            self._end_stream_turn(session, entry, parts)
+        finally:
+            account_stream_usage(chunks, messages)
+
+    async def acommunicate(self, messages: List, stream: bool = False):
+        return await self._acompletion(self._system_messages() + list(messages), None, stream)
+
+    async def asend_message(self, message: str, json_mode: bool = False, json_schema: Optional[Any] = None,
+                            stream: bool = False):
+        """Async version of send_message. Cancelling the calling task cancels the provider request."""
+        response_format = self._response_format(json_mode, json_schema)
+
+        if stream:
+            return self._astream(message, response_format)
+
+        session, entry, messages = self._prepare_turn(message)
+        try:
+            response = await self._acompletion(messages, response_format, False)
+        except BaseException:
+            # Includes cancellation, e.g. by DisconnectMiddleware
+            self._forget_turn(session, entry)
+            raise
+        reply = response.choices[0].message
+        self._remember_reply(session, entry, reply)
+        if isinstance(response_format, type) and not getattr(reply, "tool_calls", None):
+            return response_format(**response_to_json(response))
+        return reply
+
+    async def _astream(self, message: str, response_format) -> AsyncIterator[str]:
+        session, entry, messages = self._prepare_turn(message)
+        chunks = []
+        parts = []
+        try:
+            async for chunk in await self._acompletion(messages, response_format, True):
+                chunks.append(chunk)
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception:
+            self._forget_turn(session, entry)
+            raise
+        except BaseException:
+            # Closed or cancelled by the consumer: keep the part of the reply it was shown
+            self._end_stream_turn(session, entry, parts)
+            raise
+        else:
+            self._end_stream_turn(session, entry, parts)
+        finally:
+            account_stream_usage(chunks, messages)
+
+    async def _acompletion(self, messages: List[dict], response_format, stream: bool):
+        params = self.create_model()
+        model = params.pop("target_model")
+        check_disconnected(f"calling {model}")
+        timeout = bounded_timeout(params.pop("timeout", None), f"calling {model}")
+        format_system_message(messages)
+
+        response = await litellm.acompletion(
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            stream=stream,
+            **({"timeout": timeout} if timeout is not None else {}),
+            **({"safety_settings": safety_settings} if model.startswith("gemini") else {}),
+            **params,
+        )
+        if not stream:
+            add_chat_usage(response)
+        return response
@@ -0,0 +1,264 @@
+"""
+Runtime-reloadable model routing table.
+
+Maps a role (e.g. ``answer``, ``summary``) to the model that should serve it, together with
+fallback models and per-role defaults for ``temperature`` and ``max_tokens``.
+
+Routes are resolved in this order (later wins):
+    1. The built-in defaults passed to the router.
+    2. The routes file pointed to by ``MODEL_ROUTES_FILE`` (JSON or YAML).
+    3. ``MODEL_ROUTE_<ROLE>`` environment variables, e.g. ``MODEL_ROUTE_ANSWER=gpt-4.1-mini,gemini/gemini-2.0-flash-exp``
+       (the first model is the primary, the rest are fallbacks).
+
+The routes file is re-checked at most every ``check_interval`` seconds when a route is read, and a
+new table is swapped in with a single reference assignment, so readers never observe a
+half-loaded table. A file that fails to parse keeps the previous table in place.
+
+Example routes file::
+
+    roles:
+      answer:
+        model: gpt-4.1-mini
+        fallbacks: [gemini/gemini-2.0-flash-exp]
+        temperature: 0.2
+        max_tokens: 800
+      summary: groq/llama-3.1-70b-versatile
+"""
+import collections
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+import yaml
+from pydantic import BaseModel
+
+from pyframework.jwt_util import logger
+
+ROUTES_FILE_ENV = 'MODEL_ROUTES_FILE'
+ROUTE_ENV_PREFIX = 'MODEL_ROUTE_'
+
+
+class ModelRoute(BaseModel):
+    model: str
+    fallbacks: List[str] = []
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @property
+    def candidates(self) -> List[str]:
+        return [self.model, *self.fallbacks]
+
+
+RouteSpec = Union[str, Mapping, ModelRoute]
+
+
+def to_route(spec: RouteSpec) -> ModelRoute:
+    """
+    Build a ModelRoute from a model name, a mapping or an existing route.
+
+    Args:
+        spec: ``"gpt-4.1"``, ``{"model": "gpt-4.1", "fallbacks": [...]}`` or a ModelRoute
+
+    Returns:
+        ModelRoute: The parsed route
+    """
+    if isinstance(spec, ModelRoute):
+        return spec
+    if isinstance(spec, str):
+        models = [model.strip() for model in spec.split(',') if model.strip()]
+        if not models:
+            raise ValueError("A model route needs at least one model")
+        return ModelRoute(model=models[0], fallbacks=models[1:])
+    return ModelRoute(**spec)
+
+
+def load_routes_file(path: str) -> Dict[str, ModelRoute]:
+    with open(path, 'r') as f:
+        payload = yaml.safe_load(f) if path.endswith(('.yaml', '.yml')) else json.load(f)
+
+    payload = payload or {}
+    roles = payload.get('roles', payload)
+    return {role: to_route(spec) for role, spec in roles.items()}
+
+
+def load_routes_env(environ: Mapping[str, str]) -> Dict[str, ModelRoute]:
+    return {
+        key[len(ROUTE_ENV_PREFIX):].lower(): to_route(value)
+        for key, value in environ.items()
+        if key.startswith(ROUTE_ENV_PREFIX) and value
+    }
+
+
+class ModelRouter:
+    """
+    Thread-safe role -> model registry with atomic hot reload.
+
+    Reading a route is a dictionary lookup on an immutable snapshot, plus a monotonic clock
+    comparison that decides whether the routes file should be re-checked.
+    """
+
+    def __init__(self,
+                 defaults: Mapping[str, RouteSpec],
+                 routes_file: Optional[str] = None,
+                 environ: Optional[Mapping[str, str]] = None,
+                 check_interval: float = 5.0):
+        self.defaults = {role: to_route(spec) for role, spec in defaults.items()}
+        self.routes_file = routes_file
+        self.environ = environ if environ is not None else os.environ
+        self.check_interval = check_interval
+
+        self._routes: Dict[str, ModelRoute] = dict(self.defaults)
+        self._file_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+        self.reload()
+
+    @classmethod
+    def from_env(cls, defaults: Mapping[str, RouteSpec], check_interval: float = 5.0) -> "ModelRouter":
+        return cls(defaults=defaults, routes_file=os.getenv(ROUTES_FILE_ENV), check_interval=check_interval)
+
+    def reload(self) -> bool:
+        """
+        Rebuild the routing table from defaults, the routes file and the environment.
+
+        Returns:
+            bool: True if a new table was installed, False if loading failed and the old one was kept
+        """
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self) -> bool:
+        routes = dict(self.defaults)
+        mtime = None
+        try:
+            if self.routes_file:
+                mtime = os.stat(self.routes_file).st_mtime
+                routes.update(load_routes_file(self.routes_file))
+            routes.update(load_routes_env(self.environ))
+        except Exception as e:
+            logger.warning(f"Keeping previous model routes, failed to load {self.routes_file}: {e}")
+            self._file_mtime = mtime
+            return False
+
+        self._file_mtime = mtime
+        self._routes = routes
+        logger.info(f"Loaded {len(routes)} model routes")
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if not self.routes_file or now < self._next_check:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.routes_file).st_mtime
+            except OSError:
+                return
+            if mtime != self._file_mtime:
+                self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def route(self, role: str) -> ModelRoute:
+        self._maybe_reload()
+        return self._routes[role]
+
+    def model(self, role: str) -> str:
+        return self.route(role).model
+
+    def update(self, role: str, spec: RouteSpec):
+        """Override a single route in memory, e.g. from an admin endpoint. Lost on the next reload."""
+        with self._reload_lock:
+            self._routes = {**self._routes, role: to_route(spec)}
+
+    def snapshot(self) -> Dict[str, ModelRoute]:
+        self._maybe_reload()
+        return dict(self._routes)
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll the routes file from a daemon thread, for processes that read routes rarely."""
+        if self._watcher is not None:
+            return
+        interval = interval or self.check_interval
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                self._next_check = 0.0
+                self._maybe_reload()
+
+        self._watcher = threading.Thread(target=watch, name='model-router-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+class ModelConfig:
+    """
+    Attribute view over a ModelRouter, e.g. ``MODEL_CONFIG.answer``.
+
+    Keeps the interface of the former import-time namedtuple (attribute access, indexing,
+    iteration, ``_fields``, ``_asdict`` and ``_replace``) while always returning the model
+    currently routed for the role. Positions follow the routing table order: the default roles
+    first, then roles added by the routes file or the environment.
+    """
+
+    __slots__ = ('_router',)
+
+    def __init__(self, router: ModelRouter):
+        object.__setattr__(self, '_router', router)
+
+    def __getattr__(self, role: str) -> str:
+        try:
+            return self._router.model(role)
+        except KeyError:
+            raise AttributeError(role) from None
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ModelConfig is read-only, use ModelRouter.update instead")
+
+    @property
+    def _fields(self) -> Tuple[str, ...]:
+        return tuple(self._router.snapshot().keys())
+
+    def _asdict(self) -> Dict[str, str]:
+        return {role: route.model for role, route in self._router.snapshot().items()}
+
+    def _snapshot(self) -> tuple:
+        models = self._asdict()
+        return collections.namedtuple('ModelConfig', models.keys(), rename=True)(*models.values())
+
+    def _replace(self, **changes) -> tuple:
+        """A static namedtuple of the current models with some roles replaced (the router is unchanged)"""
+        return self._snapshot()._replace(**changes)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._asdict().values())
+
+    def __len__(self) -> int:
+        return len(self._router.snapshot())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ModelConfig):
+            return tuple(self) == tuple(other)
+        return isinstance(other, tuple) and tuple(self) == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self._snapshot())
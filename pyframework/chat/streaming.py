@@ -0,0 +1,181 @@
+"""
+Bridge from LLM completion streams to ASGI streaming responses.
+
+Example:
+    stream = call_llm_completion(MODEL_CONFIG.answer, messages, stream=True)
+    return LLMStreamingResponse(stream, messages=messages)
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, List, Mapping, Optional, Union
+
+from litellm import stream_chunk_builder
+from starlette.concurrency import iterate_in_threadpool
+from starlette.responses import StreamingResponse
+
+from pyframework.jwt_util import logger
+from pyframework.trace.context import trace_id_var
+from .base import add_chat_usage, pending_chat_usages
+
+STREAM_HEADERS = {
+    "cache-control": "no-cache",
+    # Tells nginx and PayloadMiddleware not to buffer the body
+    "x-accel-buffering": "no",
+}
+
+ChunkStream = Union[Iterable[Any], AsyncIterable[Any]]
+
+
+def chunk_text(chunk) -> Optional[str]:
+    """Return the text delta carried by a litellm/OpenAI stream chunk (object or dict), if any."""
+    if isinstance(chunk, str):
+        return chunk
+    choices = chunk.get("choices") if isinstance(chunk, Mapping) else getattr(chunk, "choices", None)
+    if not choices:
+        return None
+    choice = choices[0]
+    delta = choice.get("delta") if isinstance(choice, Mapping) else getattr(choice, "delta", None)
+    if delta is None:
+        return None
+    return delta.get("content") if isinstance(delta, Mapping) else getattr(delta, "content", None)
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+async def with_heartbeat(chunks: AsyncIterator[Any], interval: Optional[float], heartbeat: Any) -> AsyncIterator[Any]:
+    """
+    Yield chunks as they arrive, and `heartbeat` whenever no chunk arrived for `interval` seconds.
+
+    The pending read is never cancelled by a heartbeat, so no chunk is lost.
+    """
+    if not interval:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    pending = asyncio.ensure_future(chunks.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield heartbeat
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+            pending = asyncio.ensure_future(chunks.__anext__())
+    finally:
+        if not pending.done():
+            pending.cancel()
+
+
+class LLMStreamingResponse(StreamingResponse):
+    """
+    Streams an LLM completion to the client as Server-Sent Events or as a plain chunked text body.
+
+    Accepts the iterator returned by `call_llm_completion(..., stream=True)` or the async iterator
+    returned by `litellm.acompletion(..., stream=True)`. Sync iterators are advanced in the
+    threadpool one chunk at a time, and the next chunk is only requested after the previous one has
+    been sent, so a slow client slows the provider read instead of growing a buffer.
+
+    SSE events:
+        message: {"content": "<delta>"} for every text delta
+        done: {"trace_id": ..., "usage": {...}} once, when the stream ends
+        error: {"trace_id": ..., "error": "..."} if the provider stream fails
+    A `: heartbeat` comment is sent whenever the model is silent for `heartbeat_interval` seconds
+    (SSE only).
+
+    Usage is rebuilt from the collected chunks and recorded with `add_chat_usage` exactly once,
+    when the stream ends or the client goes away.
+    """
+
+    def __init__(self,
+                 stream: ChunkStream,
+                 messages: Optional[List] = None,
+                 sse: bool = True,
+                 heartbeat_interval: Optional[float] = 15.0,
+                 transform: Optional[Callable[[Any], Optional[Any]]] = None,
+                 status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None):
+        self.stream = stream
+        self.messages = messages
+        self.sse = sse
+        self.heartbeat_interval = heartbeat_interval
+        self.transform = transform or chunk_text
+        self.chunks: List[Any] = []
+        self.usage = None
+        super().__init__(
+            self._events(),
+            status_code=status_code,
+            headers={**STREAM_HEADERS, **(headers or {})},
+            media_type="text/event-stream" if sse else "text/plain",
+        )
+
+    def _source(self) -> AsyncIterator[Any]:
+        if isinstance(self.stream, AsyncIterable):
+            return self.stream.__aiter__()
+        return iterate_in_threadpool(iter(self.stream))
+
+    async def _events(self) -> AsyncIterator[str]:
+        # A plain chunked body has no way to carry a heartbeat without corrupting the text
+        heartbeat = ": heartbeat\n\n"
+        interval = self.heartbeat_interval if self.sse else None
+        trace_id = trace_id_var.get()
+        try:
+            async for chunk in with_heartbeat(self._source(), interval, heartbeat):
+                if chunk is heartbeat:
+                    yield heartbeat
+                    continue
+
+                self.chunks.append(chunk)
+                data = self.transform(chunk)
+                if not data:
+                    continue
+                if self.sse:
+                    yield format_sse({"content": data} if isinstance(data, str) else data, event="message")
+                else:
+                    yield data if isinstance(data, str) else json.dumps(data)
+        except Exception as e:
+            logger.error(f"LLM stream failed: {e}")
+            if self.sse:
+                yield format_sse({"trace_id": trace_id, "error": str(e)}, event="error")
+            return
+        finally:
+            self._account_usage()
+
+        if self.sse:
+            usage = self.usage.model_dump() if self.usage is not None else None
+            yield format_sse({"trace_id": trace_id, "usage": usage}, event="done")
+
+    def _account_usage(self):
+        if self.usage is None:
+            self.usage = account_stream_usage(self.chunks, self.messages)
+
+
+def account_stream_usage(chunks: List[Any], messages: Optional[List] = None):
+    """
+    Rebuild the complete response from stream chunks and record its usage with `add_chat_usage`.
+
+    Returns:
+        ChatUsageModel: The recorded usage, or None if it could not be computed
+    """
+    if not chunks or isinstance(chunks[0], str):
+        return None
+    try:
+        response = stream_chunk_builder(chunks, messages=messages)
+    except Exception as e:
+        logger.warning(f"Could not rebuild usage from stream chunks: {e}")
+        return None
+    if response is None:
+        return None
+
+    count = len(pending_chat_usages)
+    add_chat_usage(response)
+    return pending_chat_usages[-1] if len(pending_chat_usages) > count else None
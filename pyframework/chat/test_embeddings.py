@@ -0,0 +1,78 @@
+"""Tests for the batched, cached embedding client"""
+import threading
+
+import numpy as np
+import pytest
+
+from pyframework.chat.embeddings import EmbeddingCache, EmbeddingClient, EmbeddingClientClosed, content_hash
+
+
+def _client(calls, **kwargs):
+    client = EmbeddingClient("test-embedding", **kwargs)
+
+    def call_provider(texts):
+        calls.append(list(texts))
+        return np.asarray([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+    client._call_provider = call_provider
+    return client
+
+
+def test_concurrent_calls_share_one_batch():
+    """Test that concurrent callers are coalesced into one provider call, with duplicates sent once"""
+    calls, results = [], {}
+    client = _client(calls, max_wait=0.2)
+    barrier = threading.Barrier(4)
+
+    def embed(name, texts):
+        barrier.wait()
+        results[name] = client.embed(texts)
+
+    threads = [threading.Thread(target=embed, args=(i, ["shared", f"text {i}"])) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    assert len(calls) == 1 and sorted(calls[0]) == sorted(["shared"] + [f"text {i}" for i in range(4)])
+    assert all(result.shape == (2, 2) and result.dtype == np.float32 for result in results.values())
+    assert len({result[0].tobytes() for result in results.values()}) == 1
+
+
+def test_cached_vectors_skip_the_provider(tmp_path):
+    """Test that vectors persisted on disk are reused by a new client"""
+    calls = []
+    with _client(calls, cache=EmbeddingCache(cache_dir=str(tmp_path)), max_wait=0) as client:
+        first = client.embed(["hello", "world"])
+
+    cache = EmbeddingCache(cache_dir=str(tmp_path))
+    with _client(calls, cache=cache) as client:
+        second = client.embed(["world", "hello"])
+
+    assert calls == [["hello", "world"]]
+    assert np.array_equal(second, first[::-1])
+    assert not cache.get(content_hash("test-embedding", "hello")).flags.writeable
+
+
+def test_close_flushes_pending_texts_and_rejects_new_ones():
+    """Test that close embeds what was already submitted, then refuses new texts"""
+    calls = []
+    client = _client(calls, max_wait=60)
+    futures = client._submit(["late"])
+
+    client.close()
+
+    assert futures[0].result(timeout=1)[0] == 4
+    assert not client._worker.is_alive()
+    with pytest.raises(EmbeddingClientClosed):
+        client.embed(["after close"])
+
+
+def test_short_provider_response_fails_the_whole_batch():
+    """Test that a provider returning fewer vectors than texts fails every caller instead of leaving some waiting"""
+    with EmbeddingClient("test-embedding", max_wait=0) as client:
+        client._call_provider = lambda texts: np.zeros((len(texts) - 1, 2), dtype=np.float32)
+
+        with pytest.raises(ValueError, match="vectors for"):
+            client.embed(["first", "second"])
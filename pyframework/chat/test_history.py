@@ -0,0 +1,61 @@
+"""Tests for conversation history compaction"""
+from pyframework.chat.base import ChatMessageType
+from pyframework.chat.history import HistoryCompactor
+
+
+def _message(type_, content, **kwargs):
+    return {"type": type_, "content": content, **kwargs}
+
+
+def test_superseded_reference_data_and_notifications():
+    """Test that only the newest reference data per key and the newest notification run are kept"""
+    messages = [
+        _message(ChatMessageType.REFERENCE_DATA, "balance: 10", key="balance"),
+        _message(ChatMessageType.NOTIFICATION, "old alert"),
+        _message(ChatMessageType.USER_INPUT, "hi"),
+        _message(ChatMessageType.REFERENCE_DATA, "balance: 20", key="balance"),
+        _message(ChatMessageType.NOTIFICATION, "alert"),
+        _message(ChatMessageType.NOTIFICATION, "alert"),
+        _message(ChatMessageType.NOTIFICATION, "other alert"),
+    ]
+
+    compacted = HistoryCompactor().compact(messages)
+
+    assert [m["content"] for m in compacted] == ["hi", "balance: 20", "alert\nother alert"]
+    assert messages[4]["content"] == "alert"
+
+
+def test_multimodal_notifications_are_merged_by_parts():
+    """Test that notifications with list content are collapsed without calling str methods on them"""
+    image = {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}
+    messages = [
+        _message(ChatMessageType.NOTIFICATION, "camera alert"),
+        _message(ChatMessageType.NOTIFICATION, [{"type": "text", "text": "snapshot"}, image]),
+        _message(ChatMessageType.NOTIFICATION, [image]),
+    ]
+
+    compacted = HistoryCompactor().compact(messages)
+
+    assert compacted == [_message(ChatMessageType.NOTIFICATION,
+                                  ["camera alert", {"type": "text", "text": "snapshot"}, image])]
+
+
+def test_summary_is_extended_incrementally():
+    """Test that turns leaving the window are summarized once and the summary is reused"""
+    calls = []
+
+    def summarize(previous, turns):
+        calls.append((previous, [turn["content"] for turn in turns]))
+        return f"{previous or ''}+{len(turns)}"
+
+    compactor = HistoryCompactor(window=2, summarize=summarize)
+    history = [_message(ChatMessageType.USER_INPUT, f"turn {i}") for i in range(4)]
+
+    first = compactor.compact(history, conversation_id="chat")
+    again = compactor.compact(history, conversation_id="chat")
+    history.append(_message(ChatMessageType.USER_INPUT, "turn 4"))
+    compactor.compact(history, conversation_id="chat")
+
+    assert first == again
+    assert first[0]["content"].endswith("+2") and [m["content"] for m in first[1:]] == ["turn 2", "turn 3"]
+    assert calls == [(None, ["turn 0", "turn 1"]), ("+2", ["turn 2"])]
@@ -0,0 +1,103 @@
+"""Tests for the pooled LiteLLM chat sessions"""
+import asyncio
+
+import litellm
+import pytest
+from pydantic import BaseModel
+
+from pyframework.chat import base
+from pyframework.chat.litellm_chat import LiteLLMChat, SessionPool
+
+
+def _response(content):
+    return litellm.ModelResponse(choices=[{"message": {"role": "assistant", "content": content}}])
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Replace the provider call; set `reply` to a content string or an exception"""
+    state = {"reply": "Hello", "calls": []}
+
+    def completion(**params):
+        state["calls"].append(params)
+        if isinstance(state["reply"], Exception):
+            raise state["reply"]
+        return _response(state["reply"])
+
+    async def acompletion(**params):
+        return completion(**params)
+
+    monkeypatch.setattr(base, "completion", completion)
+    monkeypatch.setattr(litellm, "acompletion", acompletion)
+    return state
+
+
+def _history(chat):
+    return [(role, content) for role, content, _ in chat.session.entries]
+
+
+def test_anonymous_chats_never_share_history(provider):
+    """Test that chats without a session id get distinct sessions, even once earlier chats are collected"""
+    pool = SessionPool()
+    seen = set()
+    for i in range(20):
+        chat = LiteLLMChat("system", "gpt-test", pool=pool)
+        assert chat.session.entries == []
+        chat.send_message(f"secret {i}")
+        seen.add(chat.session_id)
+        # Frees the chat, so the next one is usually allocated at the same address
+        del chat
+
+    assert len(seen) == 20
+
+
+def test_json_mode_returns_the_raw_reply(provider):
+    """Test that dict response formats are passed to the provider and not parsed as a class"""
+    provider["reply"] = '{"answer": 42}'
+    chat = LiteLLMChat("system", "gpt-test", pool=SessionPool())
+
+    reply = chat.send_message("answer as json", json_mode=True)
+
+    assert reply.content == '{"answer": 42}'
+    assert provider["calls"][0]["response_format"] == {"type": "json_object"}
+
+    class Answer(BaseModel):
+        answer: int
+
+    assert chat.send_message("again", json_schema=Answer) == Answer(answer=42)
+
+
+def test_failed_calls_do_not_leave_the_user_turn(provider):
+    """Test that the user message is rolled back when the sync, async or streamed call fails"""
+    chat = LiteLLMChat("system", "gpt-test", pool=SessionPool())
+    chat.send_message("hi")
+    provider["reply"] = RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        chat.send_message("lost")
+    with pytest.raises(RuntimeError):
+        asyncio.run(chat.asend_message("lost too"))
+    with pytest.raises(RuntimeError):
+        list(chat.send_message("streamed", stream=True))
+
+    assert _history(chat) == [("user", "hi"), ("assistant", "Hello")]
+    assert chat.session.tokens == sum(tokens for _, _, tokens in chat.session.entries)
+
+
+def test_tool_call_replies_and_unconsumed_streams_leave_no_turn(provider, monkeypatch):
+    """Test that a tool-calls-only reply drops its user turn and a stream adds its turn only once consumed"""
+    chat = LiteLLMChat("system", "gpt-test", pool=SessionPool())
+    tool_call = {"id": "call-1", "type": "function", "function": {"name": "get_weather", "arguments": "{}"}}
+    monkeypatch.setattr(base, "completion", lambda **params: litellm.ModelResponse(choices=[
+        {"message": {"role": "assistant", "content": None, "tool_calls": [tool_call]}}]))
+
+    reply = chat.send_message("weather?")
+
+    assert reply.tool_calls[0].function.name == "get_weather"
+    assert _history(chat) == []
+
+    stream = chat.send_message("never read", stream=True)
+    astream = asyncio.run(chat.asend_message("never read either", stream=True))
+
+    assert _history(chat) == []
+    del stream, astream
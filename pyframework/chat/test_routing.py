@@ -0,0 +1,117 @@
+"""Tests for the hot-reloadable model routing table"""
+import json
+import os
+
+import pytest
+
+from pyframework.chat.routing import ModelConfig, ModelRouter
+
+
+def _write_routes(path, roles, mtime):
+    path.write_text(json.dumps({"roles": roles}))
+    os.utime(path, (mtime, mtime))
+
+
+def test_env_overrides_file_and_defaults(tmp_path):
+    """Test that MODEL_ROUTE_<ROLE> wins over the routes file, which wins over the defaults"""
+    routes_file = tmp_path / "routes.json"
+    _write_routes(routes_file, {"answer": "file-model", "summary": {"model": "file-summary", "temperature": 0.2}}, 1)
+    router = ModelRouter({"answer": "default-model", "summary": "default-summary", "code": "default-code"},
+                         routes_file=str(routes_file),
+                         environ={"MODEL_ROUTE_ANSWER": "env-model, env-fallback"})
+
+    assert router.route("answer").candidates == ["env-model", "env-fallback"]
+    assert router.route("summary").model == "file-summary"
+    assert router.route("summary").temperature == 0.2
+    assert router.model("code") == "default-code"
+
+
+def test_routes_file_is_hot_reloaded(tmp_path):
+    """Test that a changed routes file replaces the table on the next read"""
+    routes_file = tmp_path / "routes.json"
+    _write_routes(routes_file, {"answer": "first"}, 1)
+    router = ModelRouter({"answer": "default"}, routes_file=str(routes_file), environ={}, check_interval=0)
+    assert router.model("answer") == "first"
+
+    _write_routes(routes_file, {"answer": "second"}, 2)
+
+    assert router.model("answer") == "second"
+
+
+def test_bad_routes_file_keeps_previous_table(tmp_path):
+    """Test that a routes file that fails to parse leaves the loaded routes in place"""
+    routes_file = tmp_path / "routes.json"
+    _write_routes(routes_file, {"answer": "first"}, 1)
+    router = ModelRouter({"answer": "default"}, routes_file=str(routes_file), environ={}, check_interval=0)
+
+    routes_file.write_text("{not json")
+    os.utime(routes_file, (2, 2))
+
+    assert router.model("answer") == "first"
+    assert router.reload() is False
+
+
+def test_model_config_behaves_like_the_former_namedtuple():
+    """Test attribute access, indexing, iteration and _replace on MODEL_CONFIG"""
+    router = ModelRouter({"answer": "gpt-answer", "code": "gpt-code"}, environ={})
+    config = ModelConfig(router)
+
+    assert config.answer == "gpt-answer"
+    assert config[1] == "gpt-code"
+    assert list(config) == ["gpt-answer", "gpt-code"]
+    assert config._fields == ("answer", "code")
+    assert config._replace(code="other") == ("gpt-answer", "other")
+
+    router.update("code", "routed-code")
+
+    assert config.code == "routed-code"
+    with pytest.raises(AttributeError):
+        config.answer = "x"
+
+
+def test_role_completion_does_not_fall_back_once_the_request_is_over(monkeypatch):
+    """Test that DeadlineExceeded stops at the first model while other errors fall back"""
+    from pyframework.chat import base
+    from pyframework.trace.deadline import DeadlineExceeded
+
+    calls = []
+
+    def completion(model, messages, **kwargs):
+        calls.append(model)
+        raise error
+
+    monkeypatch.setattr(base, "call_llm_completion", completion)
+    monkeypatch.setattr(base, "model_router", ModelRouter({"answer": "primary,fallback"}, environ={}))
+
+    error = DeadlineExceeded("answer")
+    with pytest.raises(DeadlineExceeded):
+        base.call_role_completion("answer", [])
+    assert calls == ["primary"]
+
+    calls.clear()
+    error = ValueError("provider down")
+    with pytest.raises(ValueError):
+        base.call_role_completion("answer", [])
+    assert calls == ["primary", "fallback"]
+
+
+def test_fallback_model_gets_the_unformatted_prompt(monkeypatch):
+    """Test that each attempt formats the caller's system prompt, not the one a failed attempt formatted"""
+    from pyframework.chat import base
+
+    prompts = []
+
+    def completion(model, messages, **kwargs):
+        base.format_system_message(messages)
+        prompts.append(messages[0]["content"])
+        if model == "primary":
+            raise ValueError("provider down")
+        return model
+
+    monkeypatch.setattr(base, "call_llm_completion", completion)
+    monkeypatch.setattr(base, "model_router", ModelRouter({"answer": "primary,fallback"}, environ={}))
+    messages = [{"role": "system", "content": "Reply with {{\"ok\": true}}"}]
+
+    assert base.call_role_completion("answer", messages) == "fallback"
+    assert prompts == ['Reply with {"ok": true}'] * 2
+    assert messages[0]["content"] == "Reply with {{\"ok\": true}}"
@@ -0,0 +1,55 @@
+"""Tests for streaming LLM completions to ASGI clients"""
+import asyncio
+
+from pyframework.chat.streaming import LLMStreamingResponse, chunk_text, format_sse, with_heartbeat
+
+
+async def _slow(chunks, delay):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_chunk_text_and_sse_format():
+    """Test text extraction from dict chunks and multi-line SSE framing"""
+    assert chunk_text({"choices": [{"delta": {"content": "Hi"}}]}) == "Hi"
+    assert chunk_text({"choices": []}) is None
+    assert format_sse("a\nb", event="message") == "event: message\ndata: a\ndata: b\n\n"
+
+
+def test_heartbeat_keeps_every_chunk():
+    """Test that heartbeats fill silences without dropping or reordering chunks"""
+    items = asyncio.run(_collect(with_heartbeat(_slow(["a", "b"], 0.08), 0.03, "HB")))
+
+    assert [item for item in items if item != "HB"] == ["a", "b"]
+    assert items.count("HB") >= 2
+    assert asyncio.run(_collect(with_heartbeat(_slow(["a"], 0), None, "HB"))) == ["a"]
+
+
+def test_sse_events_and_errors():
+    """Test message and done events for a sync stream, and an error event when the stream fails"""
+    def failing():
+        yield "partial"
+        raise RuntimeError("provider reset")
+
+    response = LLMStreamingResponse(iter(["Hel", "lo"]), heartbeat_interval=None)
+    events = asyncio.run(_collect(response.body_iterator))
+
+    assert events[:2] == [format_sse({"content": "Hel"}, "message"), format_sse({"content": "lo"}, "message")]
+    assert events[2].startswith("event: done\n")
+
+    events = asyncio.run(_collect(LLMStreamingResponse(failing(), heartbeat_interval=None).body_iterator))
+
+    assert events[-1].startswith("event: error\n") and "provider reset" in events[-1]
+
+
+def test_plain_text_stream_has_no_events():
+    """Test that sse=False streams the bare text deltas"""
+    response = LLMStreamingResponse(_slow(["Hel", "lo"], 0), sse=False)
+
+    assert asyncio.run(_collect(response.body_iterator)) == ["Hel", "lo"]
+    assert response.media_type == "text/plain"
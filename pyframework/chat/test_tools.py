@@ -0,0 +1,75 @@
+"""Tests for the tool schema registry"""
+import asyncio
+from typing import Literal
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from pyframework.chat.tools import ToolRegistry
+
+
+def _registry():
+    tools = ToolRegistry()
+
+    @tools.register
+    def get_weather(city: str, unit: Literal["C", "F"] = "C") -> dict:
+        """
+        Get the current weather for a city.
+
+        Args:
+            city: The city name
+            unit: Temperature unit
+        """
+        return {"city": city, "unit": unit}
+
+    @tools.register(name="wait")
+    async def wait_for(seconds: float) -> str:
+        """Wait a little."""
+        return f"waited {seconds}"
+
+    return tools
+
+
+def test_schema_is_derived_from_signature_and_docstring():
+    """Test names, descriptions, required arguments and enum values of the generated schema"""
+    tools = _registry()
+    function = tools.tools()[0]["function"]
+
+    assert function["name"] == "get_weather"
+    assert function["description"] == "Get the current weather for a city."
+    assert function["parameters"]["required"] == ["city"]
+    assert function["parameters"]["properties"]["city"]["description"] == "The city name"
+    assert function["parameters"]["properties"]["unit"]["enum"] == ["C", "F"]
+    assert [tool["function"]["name"] for tool in tools.tools()] == ["get_weather", "wait"]
+
+
+def test_payload_is_cached_until_a_tool_is_registered():
+    """Test that tools() returns the same list until the registry changes"""
+    tools = _registry()
+    payload = tools.tools()
+    assert tools.tools() is payload
+    assert tools.tools_json() is tools.tools_json()
+
+    class Reminder(BaseModel):
+        """Create a reminder."""
+        text: str
+
+    tools.register_model(Reminder)
+
+    assert tools.tools() is not payload and len(tools.tools()) == 3
+
+
+def test_dispatch_validates_arguments():
+    """Test sync and async dispatch of dict and object tool calls, and argument validation"""
+    tools = _registry()
+    call = {"id": "call-1", "function": {"name": "get_weather", "arguments": '{"city": "Lisbon"}'}}
+
+    assert tools.dispatch(call) == {"city": "Lisbon", "unit": "C"}
+    assert tools.tool_message(call, {"ok": True}) == {"role": "tool", "tool_call_id": "call-1", "content": '{"ok": true}'}
+    assert asyncio.run(tools.adispatch({"function": {"name": "wait", "arguments": '{"seconds": 1}'}})) == "waited 1.0"
+    with pytest.raises(TypeError):
+        tools.dispatch({"function": {"name": "wait", "arguments": '{"seconds": 1}'}})
+    with pytest.raises(ValidationError):
+        tools.dispatch({"function": {"name": "get_weather", "arguments": '{"city": "Lisbon", "unit": "K"}'}})
+    with pytest.raises(ValidationError):
+        tools.dispatch({"function": {"name": "get_weather", "arguments": '{"town": "Lisbon"}'}})
@@ -0,0 +1,49 @@
+"""Tests for vision-token-aware image preparation"""
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from pyframework.chat.vision import plan_image, prepare_image, prepare_images
+from pyframework.image import ImageDecodeError, ImageNotFound
+
+
+def _jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_plans_follow_provider_accounting():
+    """Test detail choice, target size and token estimates for OpenAI, Anthropic and Gemini"""
+    assert plan_image(400, 300, "gpt-4.1").model_dump() == {"detail": "low", "width": 400, "height": 300, "tokens": 85}
+    # Fit in 2048, short side to 768: 1536x768 is 3x2 tiles
+    assert plan_image(4000, 2000, "gpt-4.1").model_dump() == {"detail": "high", "width": 1536, "height": 768,
+                                                              "tokens": 85 + 170 * 6}
+    assert plan_image(4000, 2000, "gpt-4.1", max_tokens=500).detail == "low"
+    assert plan_image(1000, 750, "claude-3-5-sonnet-20241022").tokens == 1000
+    assert plan_image(1536, 768, "gemini/gemini-2.0-flash-exp").tokens == 258 * 2
+
+
+def test_prepare_images_respects_the_byte_budget():
+    """Test that quality and size are lowered until the shared payload budget is met"""
+    images = [_jpeg(1200, 900), _jpeg(800, 600)]
+
+    prepared = prepare_images(images, "gpt-4.1", max_bytes=120_000)
+
+    assert prepared.size <= 120_000
+    assert [part["image_url"]["detail"] for part in prepared.parts] == ["high", "high"]
+    assert Image.open(io.BytesIO(base64.b64decode(prepared.images[0].data))).size == (
+        prepared.images[0].width, prepared.images[0].height)
+    with pytest.raises(ValueError):
+        prepare_image(images[0], "gpt-4.1", max_bytes=100)
+
+
+def test_unreadable_images_raise_typed_errors(tmp_path):
+    """Test that missing files and invalid data raise ImageNotFound and ImageDecodeError"""
+    with pytest.raises(ImageNotFound):
+        prepare_image(str(tmp_path / "missing.jpg"), "gpt-4.1")
+    with pytest.raises(ImageDecodeError) as error:
+        prepare_image(b"not an image", "gpt-4.1")
+    assert "<12 bytes>" in str(error.value)
@@ -0,0 +1,61 @@
+"""Tests for provider connection warm-up"""
+import asyncio
+
+import httpx
+import litellm
+import pytest
+
+from pyframework.chat import warmup
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    """Route litellm's shared clients to a mock transport; requests to `down` hosts fail to connect"""
+    state = {"requests": [], "down": set()}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append((request.method, request.url.host))
+        if request.url.host in state["down"]:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(404)
+
+    mock = httpx.MockTransport(handler)
+    monkeypatch.setattr(litellm, "client_session", httpx.Client(transport=mock))
+    monkeypatch.setattr(litellm, "aclient_session", httpx.AsyncClient(transport=mock))
+    monkeypatch.setattr(warmup, "_resolve", lambda host: [host])
+    return state
+
+
+def test_model_provider():
+    """Test providers of prefixed, direct and unknown models"""
+    assert warmup.model_provider("gemini/gemini-2.0-flash-exp") == "gemini"
+    assert warmup.model_provider("deepseek-reasoner") == "deepseek"
+    assert warmup.model_provider("claude-3-5-haiku-20241022") == "anthropic"
+    assert warmup.model_provider("gpt-4.1-mini") == "openai"
+
+
+def test_warm_up_connects_once_per_pooled_provider(transport):
+    """Test that only providers using litellm's shared clients are connected, once each"""
+    report = warmup.warm_up_providers(["gpt-4.1", "gpt-4.1-mini", "groq/llama-3.1-70b-versatile",
+                                       "claude-3-5-haiku-20241022"])
+
+    assert transport["requests"] == [("HEAD", "api.openai.com")]
+    assert not report.failed
+    assert {step.step for step in report.steps} == {"litellm:model_info", "dns:openai", "connect:openai"}
+
+
+def test_warm_up_failures_are_reported(transport):
+    """Test that a provider that can't be reached is reported instead of raised"""
+    transport["down"].add("api.openai.com")
+
+    report = warmup.warm_up_providers(["gpt-4.1"])
+
+    assert [step.step for step in report.failed] == ["connect:openai"]
+
+
+def test_async_warm_up_uses_both_clients(transport):
+    """Test that the async warm-up opens connections in the sync and async pools"""
+    report = asyncio.run(warmup.awarm_up_providers(["gpt-4.1-mini", "gemini/gemini-2.0-flash-exp"]))
+
+    assert transport["requests"] == [("HEAD", "api.openai.com")] * 2
+    assert not report.failed
@@ -0,0 +1,224 @@
+"""
+Tool schema registry.
+
+Derives OpenAI-style tool schemas from typed Python functions (or pydantic models) once per
+process, keeps the serialized `tools` payload cached, and dispatches tool calls back to the
+callables through pre-built pydantic argument validators.
+
+Example:
+    tools = ToolRegistry()
+
+    @tools.register
+    def get_weather(city: str, unit: Literal["C", "F"] = "C") -> dict:
+        \"\"\"
+        Get the current weather for a city.
+
+        Args:
+            city: The city name
+            unit: Temperature unit
+        \"\"\"
+        ...
+
+    message = prepare_function_call(MODEL_CONFIG.utility, messages, tools)
+    for tool_call in message.tool_calls or []:
+        messages.append(tools.tool_message(tool_call, tools.dispatch(tool_call)))
+"""
+import asyncio
+import inspect
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Type, get_type_hints
+
+from pydantic import BaseModel, ConfigDict, Field, create_model
+
+ARGUMENT_SECTIONS = ('Args', 'Arguments', 'Parameters')
+_ARG_LINE = re.compile(r'^ {0,4}\*{0,2}(\w+)\s*(?:\([^)]*\))?\s*:\s*(.*)$')
+
+
+def parse_docstring(doc: Optional[str]):
+    """
+    Split a Google style docstring into its summary and per-argument descriptions.
+
+    Returns:
+        tuple: (description, {argument name: description})
+    """
+    if not doc:
+        return "", {}
+
+    summary: List[str] = []
+    arguments: Dict[str, str] = {}
+    section = None
+    current = None
+    for line in inspect.cleandoc(doc).splitlines():
+        stripped = line.strip()
+        if not line[:1].isspace() and stripped.endswith(':') and ' ' not in stripped:
+            section, current = stripped[:-1], None
+            continue
+        if section is None:
+            summary.append(stripped)
+        elif section in ARGUMENT_SECTIONS:
+            match = _ARG_LINE.match(line)
+            if match:
+                current = match.group(1)
+                arguments[current] = match.group(2).strip()
+            elif current and stripped:
+                arguments[current] = f"{arguments[current]} {stripped}"
+
+    paragraph = "\n".join(summary).strip().split("\n\n")[0]
+    return " ".join(paragraph.split()), arguments
+
+
+def arguments_model(func: Callable, name: str, argument_docs: Dict[str, str]) -> Type[BaseModel]:
+    hints = get_type_hints(func)
+    fields = {}
+    for parameter in inspect.signature(func).parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD) or parameter.name in ('self', 'cls'):
+            continue
+        annotation = hints.get(parameter.name, Any)
+        default = ... if parameter.default is parameter.empty else parameter.default
+        fields[parameter.name] = (annotation, Field(default, description=argument_docs.get(parameter.name)))
+    return create_model(f"{name}_arguments", __config__=ConfigDict(extra='forbid'), **fields)
+
+
+class Tool:
+    __slots__ = ('name', 'description', 'func', 'arguments', 'schema', 'is_async')
+
+    def __init__(self, name: str, description: str, func: Callable, arguments: Type[BaseModel]):
+        self.name = name
+        self.description = description
+        self.func = func
+        self.arguments = arguments
+        self.is_async = inspect.iscoroutinefunction(func)
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description,
+                "parameters": arguments.model_json_schema(),
+            },
+        }
+
+    def validate(self, arguments) -> Dict[str, Any]:
+        if isinstance(arguments, (str, bytes)):
+            validated = self.arguments.model_validate_json(arguments or '{}')
+        else:
+            validated = self.arguments.model_validate(arguments or {})
+        # Keep nested pydantic models as models, unlike model_dump()
+        return {field: getattr(validated, field) for field in self.arguments.model_fields}
+
+
+def _tool_call_parts(tool_call):
+    if isinstance(tool_call, dict):
+        function = tool_call.get('function', tool_call)
+        return tool_call.get('id'), function['name'], function.get('arguments')
+    return tool_call.id, tool_call.function.name, tool_call.function.arguments
+
+
+class ToolRegistry:
+    """
+    Registry of callable tools with cached schemas.
+
+    `tools()` returns the same list object until another tool is registered, so it can be passed
+    as `tools=` to `call_llm_completion` on every turn at no cost.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._payload: Optional[List[dict]] = None
+        self._payload_json: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def register(self, func: Optional[Callable] = None, *, name: Optional[str] = None, description: Optional[str] = None):
+        """
+        Register a function (usable as a bare decorator or with keyword arguments).
+
+        The tool name defaults to the function name and the description to the docstring summary;
+        argument descriptions are read from the docstring's Args section.
+        """
+        def decorator(target: Callable) -> Callable:
+            tool_name = name or target.__name__
+            doc_description, argument_docs = parse_docstring(target.__doc__)
+            tool = Tool(tool_name, description or doc_description, target,
+                        arguments_model(target, tool_name, argument_docs))
+            self._add(tool)
+            return target
+
+        return decorator(func) if func is not None else decorator
+
+    def register_model(self, model: Type[BaseModel], handler: Optional[Callable[[BaseModel], Any]] = None,
+                       name: Optional[str] = None, description: Optional[str] = None):
+        """
+        Register a pydantic model as a tool whose arguments are the model fields.
+
+        Dispatching returns the validated model instance, or `handler(instance)` when a handler is given.
+        """
+        tool_name = name or model.__name__
+        doc_description, _ = parse_docstring(model.__doc__)
+
+        def call(**kwargs):
+            instance = model(**kwargs)
+            return handler(instance) if handler is not None else instance
+
+        self._add(Tool(tool_name, description or doc_description, call, model))
+
+    def _add(self, tool: Tool):
+        with self._lock:
+            self._tools[tool.name] = tool
+            self._payload = None
+            self._payload_json = None
+
+    def tools(self) -> List[dict]:
+        payload = self._payload
+        if payload is None:
+            with self._lock:
+                payload = self._payload = [tool.schema for tool in self._tools.values()]
+        return payload
+
+    def tools_json(self) -> str:
+        payload_json = self._payload_json
+        if payload_json is None:
+            payload_json = self._payload_json = json.dumps(self.tools())
+        return payload_json
+
+    def get(self, name: str) -> Tool:
+        return self._tools[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self):
+        return len(self._tools)
+
+    def dispatch(self, tool_call) -> Any:
+        """
+        Validate the arguments of a tool call (OpenAI/litellm object or dict) and invoke its callable.
+
+        Raises:
+            KeyError: If the tool is not registered
+            pydantic.ValidationError: If the arguments do not match the tool schema
+        """
+        _, name, arguments = _tool_call_parts(tool_call)
+        tool = self._tools[name]
+        if tool.is_async:
+            raise TypeError(f"Tool {name} is async, use adispatch")
+        return tool.func(**tool.validate(arguments))
+
+    async def adispatch(self, tool_call) -> Any:
+        _, name, arguments = _tool_call_parts(tool_call)
+        tool = self._tools[name]
+        kwargs = tool.validate(arguments)
+        if tool.is_async:
+            return await tool.func(**kwargs)
+        return await asyncio.to_thread(tool.func, **kwargs)
+
+    def tool_message(self, tool_call, result: Any) -> dict:
+        """Build the `tool` role message answering a tool call."""
+        call_id, _, _ = _tool_call_parts(tool_call)
+        if isinstance(result, BaseModel):
+            content = result.model_dump_json()
+        elif isinstance(result, str):
+            content = result
+        else:
+            content = json.dumps(result, default=str)
+        return {"role": "tool", "tool_call_id": call_id, "content": content}
@@ -0,0 +1,214 @@
+"""
+Vision-token-aware image preparation.
+
+Chooses the resolution, detail level and JPEG quality of each image from the vision token
+accounting of the model that will consume it, estimates the token cost before the request is
+sent, and returns ready-to-send `image_url` content parts.
+
+    * OpenAI: "low" detail is a flat 85 tokens at 512px; "high" detail fits the image in
+      2048x2048, scales the short side down to 768 and costs 85 + 170 per 512px tile.
+    * Anthropic: the long side is capped at 1568px and cost is about width * height / 750.
+    * Gemini: 258 tokens per 768px tile.
+
+Example:
+    prepared = prepare_images(["receipt.jpg", "photo.png"], MODEL_CONFIG.answer, max_bytes=4_000_000)
+    messages.append({"role": "user", "content": [{"type": "text", "text": question}, *prepared.parts]})
+"""
+import base64
+import io
+import math
+import os
+from typing import List, Literal, Optional, Sequence, Tuple
+
+from PIL import Image
+from pydantic import BaseModel
+
+from pyframework.image import ImageSource, decode_image, image_size
+
+Detail = Literal["auto", "low", "high"]
+
+JPEG_QUALITY_STEPS = (85, 75, 65, 50)
+DOWNSCALE_STEP = 0.75
+DEFAULT_MAX_BYTES = int(os.getenv('VISION_MAX_BYTES', str(8 * 1024 * 1024)))
+
+
+class VisionProfile(BaseModel):
+    """Image sizing limits and token accounting of one provider."""
+    max_long_side: int
+    max_short_side: Optional[int] = None
+    max_pixels: Optional[int] = None
+    low_side: int = 512
+    low_tokens: Optional[int] = None
+    tile_size: int = 512
+    base_tokens: int = 0
+    tile_tokens: int = 0
+    pixels_per_token: Optional[float] = None
+
+    def fit(self, width: int, height: int, detail: str = "high") -> Tuple[int, int]:
+        """Size the provider would downscale the image to (images are never upscaled)."""
+        scale = 1.0
+        if detail == "low":
+            scale = min(scale, self.low_side / max(width, height))
+        else:
+            scale = min(scale, self.max_long_side / max(width, height))
+            if self.max_short_side:
+                scale = min(scale, self.max_short_side / min(width, height))
+            if self.max_pixels:
+                scale = min(scale, math.sqrt(self.max_pixels / (width * height)))
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def tokens(self, width: int, height: int, detail: str = "high") -> int:
+        if detail == "low" and self.low_tokens is not None:
+            return self.low_tokens
+        if self.pixels_per_token:
+            return math.ceil(width * height / self.pixels_per_token)
+        tiles = math.ceil(width / self.tile_size) * math.ceil(height / self.tile_size)
+        return self.base_tokens + self.tile_tokens * tiles
+
+
+VISION_PROFILES = {
+    "openai": VisionProfile(max_long_side=2048, max_short_side=768, low_tokens=85,
+                            tile_size=512, base_tokens=85, tile_tokens=170),
+    "anthropic": VisionProfile(max_long_side=1568, max_pixels=1_150_000, pixels_per_token=750),
+    "gemini": VisionProfile(max_long_side=3072, low_side=384, low_tokens=258, tile_size=768, tile_tokens=258),
+}
+
+# Model name prefixes mapped to the accounting their provider uses
+MODEL_PROFILE_PREFIXES = (
+    ("claude", "anthropic"),
+    ("anthropic/", "anthropic"),
+    ("gemini", "gemini"),
+    ("vertex_ai/gemini", "gemini"),
+)
+
+
+def vision_profile(model: str) -> VisionProfile:
+    """Vision accounting for a model, defaulting to OpenAI's (also used by OpenAI-compatible providers)."""
+    for prefix, provider in MODEL_PROFILE_PREFIXES:
+        if model.startswith(prefix):
+            return VISION_PROFILES[provider]
+    return VISION_PROFILES["openai"]
+
+
+class ImagePlan(BaseModel):
+    detail: Literal["low", "high"]
+    width: int
+    height: int
+    tokens: int
+
+
+def plan_image(width: int, height: int, model: str, detail: Detail = "auto",
+               max_tokens: Optional[int] = None) -> ImagePlan:
+    """
+    Pick the detail level and target size of an image for a model.
+
+    With detail="auto", images already within the low detail size are sent as low detail (same
+    pixels, fewer tokens), and larger images use high detail unless that would exceed `max_tokens`.
+    """
+    profile = vision_profile(model)
+    if detail == "auto":
+        detail = "low" if max(width, height) <= profile.low_side else "high"
+        if detail == "high" and max_tokens is not None:
+            high_width, high_height = profile.fit(width, height, "high")
+            if profile.tokens(high_width, high_height, "high") > max_tokens:
+                detail = "low"
+
+    target_width, target_height = profile.fit(width, height, detail)
+    return ImagePlan(detail=detail, width=target_width, height=target_height,
+                     tokens=profile.tokens(target_width, target_height, detail))
+
+
+class PreparedImage(BaseModel):
+    detail: Literal["low", "high"]
+    width: int
+    height: int
+    tokens: int
+    quality: int
+    data: str
+
+    @property
+    def part(self) -> dict:
+        return {"type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{self.data}", "detail": self.detail}}
+
+
+class PreparedImages(BaseModel):
+    images: List[PreparedImage] = []
+
+    @property
+    def parts(self) -> List[dict]:
+        return [image.part for image in self.images]
+
+    @property
+    def tokens(self) -> int:
+        return sum(image.tokens for image in self.images)
+
+    @property
+    def size(self) -> int:
+        """Total base64 payload bytes."""
+        return sum(len(image.data) for image in self.images)
+
+
+def _encode(img: Image.Image, size: Tuple[int, int], quality: int) -> str:
+    if img.size != size:
+        img = img.resize(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def prepare_image(source: ImageSource, model: str, detail: Detail = "auto", max_tokens: Optional[int] = None,
+                  max_bytes: Optional[int] = None) -> PreparedImage:
+    """
+    Resize and encode one image for `model`.
+
+    Args:
+        source: Image path or raw bytes
+        model: Model that will receive the image
+        detail: "low", "high" or "auto" (see plan_image)
+        max_tokens: Token budget for this image, used by detail="auto"
+        max_bytes: Base64 payload budget. JPEG quality is lowered first, then the image is downscaled.
+
+    Raises:
+        ImageEncodingError: If the image cannot be read
+        ValueError: If the image cannot fit in `max_bytes`
+    """
+    profile = vision_profile(model)
+    plan = plan_image(*image_size(source), model, detail, max_tokens)
+    img = decode_image(source, (plan.width, plan.height))
+    width, height = plan.width, plan.height
+    while True:
+        for quality in JPEG_QUALITY_STEPS:
+            data = _encode(img, (width, height), quality)
+            if max_bytes is None or len(data) <= max_bytes:
+                return PreparedImage(detail=plan.detail, width=width, height=height,
+                                     tokens=profile.tokens(width, height, plan.detail), quality=quality, data=data)
+        if max(width, height) <= 64:
+            raise ValueError(f"Image does not fit in {max_bytes} bytes")
+        width, height = max(1, int(width * DOWNSCALE_STEP)), max(1, int(height * DOWNSCALE_STEP))
+
+
+def prepare_images(sources: Sequence[ImageSource], model: str, detail: Detail = "auto",
+                   max_tokens: Optional[int] = None, max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> PreparedImages:
+    """
+    Prepare the images of one request.
+
+    Args:
+        sources: Image paths or raw bytes
+        model: Model that will receive the images
+        detail: "low", "high" or "auto" (see plan_image)
+        max_tokens: Vision token budget for all images, split evenly between them
+        max_bytes: Base64 payload budget for all images (VISION_MAX_BYTES by default). Bytes left
+            unused by an image are made available to the following ones.
+
+    Returns:
+        PreparedImages: The images, with their content `parts` and estimated `tokens`
+    """
+    prepared = PreparedImages()
+    per_image_tokens = max_tokens // len(sources) if max_tokens is not None and sources else None
+    for index, source in enumerate(sources):
+        budget = None
+        if max_bytes is not None:
+            budget = (max_bytes - prepared.size) // (len(sources) - index)
+        prepared.images.append(prepare_image(source, model, detail, per_image_tokens, budget))
+    return prepared
@@ -0,0 +1,205 @@
+"""
+Provider connection warm-up.
+
+Run at startup (e.g. from an ASGI lifespan hook) so the first request after a deploy or scale-up
+does not pay litellm's lazy initialization and the DNS/TLS/HTTP2 setup of the routed providers
+whose requests go through litellm's shared httpx clients (see POOLED_PROVIDERS).
+
+Example:
+    @asynccontextmanager
+    async def lifespan(app):
+        report = await awarm_up_providers()
+        yield
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+import litellm
+from pydantic import BaseModel
+
+from pyframework.jwt_util import logger
+from .base import model_router
+
+PROVIDER_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "gemini": "https://generativelanguage.googleapis.com",
+    "anthropic": "https://api.anthropic.com",
+    "groq": "https://api.groq.com/openai/v1",
+    "deepseek": "https://api.deepseek.com",
+}
+
+# Providers whose litellm handlers send requests through litellm.client_session / aclient_session.
+# Anthropic, Gemini, Groq and DeepSeek get their own clients per handler (deepseek-reasoner even a
+# new OpenAI client per call in base.py), so connections opened to them here would never be reused.
+POOLED_PROVIDERS = ("openai",)
+
+# Models without a litellm provider prefix that the framework calls directly
+MODEL_PREFIX_PROVIDERS = {
+    "deepseek": "deepseek",
+    "claude": "anthropic",
+}
+
+
+class WarmupStep(BaseModel):
+    step: str
+    seconds: float
+    ok: bool = True
+    error: Optional[str] = None
+
+
+class WarmupReport(BaseModel):
+    steps: List[WarmupStep] = []
+    seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[WarmupStep]:
+        return [step for step in self.steps if not step.ok]
+
+
+def routed_models() -> List[str]:
+    """All primary and fallback models currently referenced by the model router."""
+    models = []
+    for route in model_router.snapshot().values():
+        for model in route.candidates:
+            if model not in models:
+                models.append(model)
+    return models
+
+
+def model_provider(model: str) -> Optional[str]:
+    for prefix, provider in MODEL_PREFIX_PROVIDERS.items():
+        if model.startswith(prefix):
+            return provider
+    try:
+        _, provider, _, _ = litellm.get_llm_provider(model)
+        return provider
+    except Exception:
+        return None
+
+
+def shared_http_clients(http2: bool = True, max_connections: int = 100, keepalive_expiry: float = 120.0):
+    """
+    Install process wide httpx clients for litellm's OpenAI handler and return them.
+
+    Connections opened to POOLED_PROVIDERS while warming up stay in these pools and are reused by
+    later completions.
+    """
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        http2 = False
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                          keepalive_expiry=keepalive_expiry)
+    if litellm.client_session is None:
+        litellm.client_session = httpx.Client(http2=http2, limits=limits, timeout=600.0)
+    if litellm.aclient_session is None:
+        litellm.aclient_session = httpx.AsyncClient(http2=http2, limits=limits, timeout=600.0)
+    return litellm.client_session, litellm.aclient_session
+
+
+def _timed(report: WarmupReport, step: str, func, *args):
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        report.steps.append(WarmupStep(step=step, seconds=round(time.perf_counter() - started, 4)))
+        return result
+    except Exception as e:
+        report.steps.append(WarmupStep(step=step, seconds=round(time.perf_counter() - started, 4), ok=False, error=str(e)))
+        return None
+
+
+def _prime_model_info(models: Iterable[str]):
+    for model in models:
+        try:
+            litellm.get_model_info(model)
+        except Exception:
+            # Models missing from the pricing map are still callable
+            pass
+
+
+def _resolve(host: str):
+    return socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+
+
+def _connect(client: httpx.Client, base_url: str):
+    # Any response proves DNS, TCP, TLS and ALPN are done and leaves the connection pooled
+    client.head(base_url, timeout=10.0)
+
+
+async def _aconnect(client: httpx.AsyncClient, base_url: str):
+    await client.head(base_url, timeout=10.0)
+
+
+def _provider_urls(models: Iterable[str]) -> Dict[str, str]:
+    urls = {}
+    for model in models:
+        provider = model_provider(model)
+        if provider in POOLED_PROVIDERS:
+            urls[provider] = os.getenv(f"{provider.upper()}_API_BASE", PROVIDER_BASE_URLS[provider])
+    return urls
+
+
+def warm_up_providers(models: Optional[Iterable[str]] = None, http2: bool = True) -> WarmupReport:
+    """
+    Prime litellm's model/pricing maps and open pooled connections to the routed POOLED_PROVIDERS.
+
+    Args:
+        models: Models to warm up (defaults to every model referenced by MODEL_CONFIG routes)
+        http2: Negotiate HTTP/2 when the `h2` package is installed
+
+    Returns:
+        WarmupReport: Duration and outcome of each step. Failures are reported, never raised.
+    """
+    started = time.perf_counter()
+    report = WarmupReport()
+    models = list(models) if models is not None else routed_models()
+
+    _timed(report, "litellm:model_info", _prime_model_info, models)
+    client, _ = shared_http_clients(http2=http2)
+    for provider, base_url in _provider_urls(models).items():
+        _timed(report, f"dns:{provider}", _resolve, urlparse(base_url).hostname)
+        _timed(report, f"connect:{provider}", _connect, client, base_url)
+
+    report.seconds = round(time.perf_counter() - started, 4)
+    _log(report)
+    return report
+
+
+async def awarm_up_providers(models: Optional[Iterable[str]] = None, http2: bool = True) -> WarmupReport:
+    """Async version of warm_up_providers for ASGI lifespan hooks; providers are warmed concurrently."""
+    started = time.perf_counter()
+    report = WarmupReport()
+    models = list(models) if models is not None else routed_models()
+
+    await asyncio.to_thread(_timed, report, "litellm:model_info", _prime_model_info, models)
+    client, aclient = shared_http_clients(http2=http2)
+
+    async def warm(provider: str, base_url: str):
+        await asyncio.to_thread(_timed, report, f"dns:{provider}", _resolve, urlparse(base_url).hostname)
+        step_started = time.perf_counter()
+        try:
+            await _aconnect(aclient, base_url)
+            await asyncio.to_thread(_connect, client, base_url)
+            report.steps.append(WarmupStep(step=f"connect:{provider}", seconds=round(time.perf_counter() - step_started, 4)))
+        except Exception as e:
+            report.steps.append(WarmupStep(step=f"connect:{provider}", seconds=round(time.perf_counter() - step_started, 4),
+                                           ok=False, error=str(e)))
+
+    await asyncio.gather(*(warm(provider, base_url) for provider, base_url in _provider_urls(models).items()))
+
+    report.seconds = round(time.perf_counter() - started, 4)
+    _log(report)
+    return report
+
+
+def _log(report: WarmupReport):
+    steps = ", ".join(f"{step.step}={step.seconds:.3f}s{'' if step.ok else ' (failed)'}" for step in report.steps)
+    logger.info(f"Provider warm-up finished in {report.seconds:.3f}s: {steps}")
+    for step in report.failed:
+        logger.warning(f"Provider warm-up step {step.step} failed: {step.error}")
@@ -2,10 +2,12 @@ import os
 from contextlib import contextmanager
 from urllib.parse import quote_plus
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, Session
 
+from pyframework.trace.deadline import check_deadline, remaining_time
+
 
 def create_engine_parameters(user: str, password: str, host: str, db_name: str, **kwargs):
     """Create a SQLAlchemy engine with the given connection parameters.
@@ -39,18 +41,37 @@ engine = create_engine_parameters(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(SessionLocal, 'after_begin')
+def apply_deadline_statement_timeout(session, transaction, connection):
+    """Bound every statement of a new transaction by the time left before the request deadline.
+
+    SET LOCAL only lasts until the transaction ends, so pooled connections are not affected.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return
+    check_deadline("starting a database transaction")
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
 @contextmanager
 def get_db_session() -> Session:
     """Get a database session with context management.
     
     Yields:
         SQLAlchemy Session: A database session
-        
+
+    Raises:
+        DeadlineExceeded: If the current request deadline has already passed
+
+    Statements run through the session are bounded by the request deadline (see DeadlineMiddleware).
+
     Example:
         with get_db_session() as session:
             # Use the session
             result = session.query(User).all()
     """
+    check_deadline("opening a database session")
     session = SessionLocal()
     try:
         yield session
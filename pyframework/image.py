@@ -0,0 +1,198 @@
+"""
+Image encoding engine.
+
+JPEG files are decoded at reduced scale (Pillow draft mode lets libjpeg decode at 1/2, 1/4 or
+1/8 of the size directly), so a 12MP phone photo bound for a 1024px thumbnail is never fully
+decoded. Encoded results are cached per path, modification time, file size and target settings,
+and batches are encoded in a process pool so multi-image messages use all cores.
+
+Example:
+    data = image_encoder.encode("photo.jpg")                      # base64 JPEG
+    datas = image_encoder.encode_many(["a.jpg", "b.png", "c.heic"])
+"""
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image, UnidentifiedImageError
+
+ImageSource = Union[str, os.PathLike, bytes, BinaryIO]
+
+DEFAULT_MAX_SIZE = (1024, 1024)
+DEFAULT_QUALITY = 75
+
+
+class ImageEncodingError(Exception):
+    def __init__(self, source, message: str):
+        self.source = source
+        self.message = message
+        super().__init__(source, message)
+
+    def __str__(self):
+        return f"Error encoding image {self.source}: {self.message}"
+
+
+class ImageNotFound(ImageEncodingError):
+    pass
+
+
+class ImageDecodeError(ImageEncodingError):
+    pass
+
+
+def _describe(source: ImageSource) -> str:
+    return f"<{len(source)} bytes>" if isinstance(source, bytes) else source
+
+
+def image_size(source: ImageSource) -> Tuple[int, int]:
+    """Width and height read from the image header, without decoding pixels."""
+    with _open(source) as img:
+        return img.size
+
+
+def _open(source: ImageSource) -> Image.Image:
+    try:
+        return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except FileNotFoundError as e:
+        raise ImageNotFound(_describe(source), str(e)) from e
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageDecodeError(_describe(source), str(e)) from e
+
+
+def decode_image(source: ImageSource, max_size: Tuple[int, int] = DEFAULT_MAX_SIZE) -> Image.Image:
+    """
+    Decode an image to RGB, no larger than `max_size`, using reduced-scale decoding when possible.
+
+    Raises:
+        ImageNotFound: If the file does not exist
+        ImageDecodeError: If the data is not a readable image
+    """
+    with _open(source) as img:
+        try:
+            # Only JPEG supports draft; it picks the smallest scale still >= max_size
+            img.draft('RGB', max_size)
+            img.load()
+            img.thumbnail(max_size, Image.LANCZOS)
+            return img.convert('RGB') if img.mode != 'RGB' else img.copy()
+        except (OSError, ValueError, SyntaxError) as e:
+            raise ImageDecodeError(_describe(source), str(e)) from e
+
+
+def encode_jpeg(source: ImageSource, max_size: Tuple[int, int] = DEFAULT_MAX_SIZE, quality: int = DEFAULT_QUALITY) -> str:
+    """Decode, downscale and re-encode an image as base64 JPEG."""
+    img = decode_image(source, max_size)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+class ImageEncoder:
+    """
+    Cached base64 JPEG encoder with a lazily started process pool for batches.
+
+    Args:
+        max_items: Number of encoded images kept in memory
+        workers: Process pool size (IMAGE_ENCODE_WORKERS, or the CPU count)
+    """
+
+    def __init__(self, max_items: int = 256, workers: Optional[int] = None):
+        self.max_items = max_items
+        self.workers = workers or int(os.getenv('IMAGE_ENCODE_WORKERS', '0')) or os.cpu_count() or 1
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def _key(source: ImageSource, max_size: Tuple[int, int], quality: int) -> Optional[tuple]:
+        # Only paths are cached: bytes and streams have no identity to key on
+        if not isinstance(source, (str, os.PathLike)):
+            return None
+        try:
+            stat = os.stat(source)
+        except FileNotFoundError as e:
+            raise ImageNotFound(source, str(e)) from e
+        except (OSError, ValueError) as e:
+            raise ImageEncodingError(source, str(e)) from e
+        return os.path.realpath(source), stat.st_mtime_ns, stat.st_size, tuple(max_size), quality
+
+    def _get(self, key: Optional[tuple]) -> Optional[str]:
+        if key is None:
+            return None
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+            return data
+
+    def _put(self, key: Optional[tuple], data: str):
+        if key is None:
+            return
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_items:
+                self._cache.popitem(last=False)
+
+    def encode(self, source: ImageSource, max_size: Tuple[int, int] = DEFAULT_MAX_SIZE,
+               quality: int = DEFAULT_QUALITY) -> str:
+        """
+        Encode one image as base64 JPEG in the calling process.
+
+        Raises:
+            ImageEncodingError: ImageNotFound or ImageDecodeError
+        """
+        key = self._key(source, max_size, quality)
+        data = self._get(key)
+        if data is None:
+            data = encode_jpeg(source, max_size, quality)
+            self._put(key, data)
+        return data
+
+    def encode_many(self, sources: Sequence[ImageSource], max_size: Tuple[int, int] = DEFAULT_MAX_SIZE,
+                    quality: int = DEFAULT_QUALITY) -> List[str]:
+        """
+        Encode several images, in parallel worker processes when more than one is not cached.
+
+        Raises:
+            ImageEncodingError: For the first image that fails
+        """
+        keys = [self._key(source, max_size, quality) for source in sources]
+        results = [self._get(key) for key in keys]
+        missing = [index for index, data in enumerate(results) if data is None]
+
+        if len(missing) == 1:
+            index = missing[0]
+            results[index] = encode_jpeg(sources[index], max_size, quality)
+            self._put(keys[index], results[index])
+        elif missing:
+            pool = self._executor()
+            futures = [(index, pool.submit(encode_jpeg, sources[index], max_size, quality)) for index in missing]
+            for index, future in futures:
+                results[index] = future.result()
+                self._put(keys[index], results[index])
+        return results
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs threads (servers, litellm) is unsafe
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+            return self._pool
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+image_encoder = ImageEncoder()
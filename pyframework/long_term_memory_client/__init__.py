@@ -3,12 +3,11 @@ import os
 
 from .client import AuthenticatedClient, Client
 
-def create_client(base_url, token):
+def create_client(base_url, token, **kwargs):
     return AuthenticatedClient(
         base_url=base_url,
         token=token,
-        verify_ssl=False,
-        timeout=30.0
+        **{"verify_ssl": False, "timeout": 30.0, **kwargs}
     )
 
 __all__ = (
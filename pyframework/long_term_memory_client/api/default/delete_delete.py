@@ -4,6 +4,8 @@ from typing import Any, Dict, Optional, Union
 import httpx
 
 from ... import errors
+from ...cache import invalidate_delete
+from ...fingerprint import forget_delete
 from ...client import AuthenticatedClient, Client
 from ...models.delete_request import DeleteRequest
 from ...models.delete_response import DeleteResponse
@@ -88,12 +90,17 @@ def sync_detailed(
         json_body=json_body,
     )
 
-    return execute_request(
+    invalidate_delete(client, json_body)
+    forget_delete(client, json_body)
+    response = execute_request(
         client=client,
         kwargs=kwargs,
         parse_response_fn=_parse_response,
         build_response_fn=_build_response,
     )
+    # Again after the write, for queries that read the old data while it was in flight
+    invalidate_delete(client, json_body)
+    return response
 
 
 def sync(
@@ -147,12 +154,16 @@ async def asyncio_detailed(
         json_body=json_body,
     )
 
-    return await execute_request_async(
+    invalidate_delete(client, json_body)
+    forget_delete(client, json_body)
+    response = await execute_request_async(
         client=client,
         kwargs=kwargs,
         parse_response_fn=_parse_response,
         build_response_fn=_build_response,
     )
+    invalidate_delete(client, json_body)
+    return response
 
 
 async def asyncio(
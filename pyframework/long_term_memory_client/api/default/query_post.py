@@ -1,11 +1,14 @@
+from asyncio import to_thread
 from http import HTTPStatus
 from typing import Any, Dict, Optional, Union
 
 import httpx
 
 from ... import errors
+from ...cache import Uncacheable
 from ...client import AuthenticatedClient, Client
-from ...models import QueryRequest, HTTPValidationError, QueryResponse
+from ...models import Query, QueryRequest, HTTPValidationError, QueryResponse
+from ...models.fast_decode import decode_query_response_json
 from ...models.query_response import get_top_results_above_threshold
 from ...types import Response, UNSET
 from ...http_utils import execute_request, execute_request_async, get_parsed_or_raise
@@ -22,6 +25,8 @@ def _get_kwargs(
     cookies: Dict[str, Any] = client.get_cookies()
 
     json_json_body = json_body.to_dict()
+    if getattr(client, "query_embeddings", "list") == "drop":
+        json_json_body.setdefault("include_embeddings", False)
 
     return {
         "method": "post",
@@ -36,7 +41,7 @@ def _get_kwargs(
 
 def _parse_response(*, client: Client, response: httpx.Response) -> Optional[Union[HTTPValidationError, QueryResponse]]:
     if response.status_code == HTTPStatus.OK:
-        response_200 = QueryResponse.from_dict(response.json())
+        response_200 = decode_query_response_json(response.content, getattr(client, "query_embeddings", "list"))
 
         return response_200
     if response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY:
@@ -186,9 +191,8 @@ async def asyncio(
     ).parsed
 
 
-def query_long_term_memory(client, query, user_id=None, document_id=None, source_id=None, source=None,
-                           reference=None, doc_type=None,
-                           k=1) -> QueryResponse:
+def build_query(query, user_id=None, document_id=None, source_id=None, source=None, reference=None, doc_type=None,
+                k=1) -> Query:
     criteria = f"{query}".replace("_", " ")
 
     filter_dict = {}
@@ -205,22 +209,101 @@ def query_long_term_memory(client, query, user_id=None, document_id=None, source
     if doc_type is not None:
         filter_dict["doc_type"] = f"{doc_type}"
 
-    query_payload = {
-        "queries": [
-            {
-                "query": f"{criteria}",
-                "filter": filter_dict if filter_dict else UNSET,
-                "top_k": k
-            }
-        ]
-    }
+    return Query.from_dict({
+        "query": f"{criteria}",
+        "filter": filter_dict if filter_dict else UNSET,
+        "top_k": k
+    })
+
+
+def query_long_term_memory(client, query, user_id=None, document_id=None, source_id=None, source=None,
+                           reference=None, doc_type=None,
+                           k=1) -> QueryResponse:
+    query = build_query(query, user_id, document_id, source_id, source, reference, doc_type, k)
+    cache = getattr(client, "query_cache", None)
+    if cache is None:
+        return _query(client, query)
+
+    def load():
+        response = _query(client, query)
+        if not isinstance(response, QueryResponse) or len(response.results) != 1 or "detail" in response:
+            raise Uncacheable(response)
+        return response.results[0]
+
+    try:
+        return QueryResponse(results=[cache.get_or_load(query, load)])
+    except Uncacheable as e:
+        return e.response
 
-    query_request = QueryRequest.from_dict(query_payload)
-    response = sync_detailed(client=client, json_body=query_request)
+
+def _query(client, query: Query):
+    response = sync_detailed(client=client, json_body=QueryRequest(queries=[query]))
+    return get_parsed_or_raise(response)
+
+
+async def aquery_long_term_memory(client, query, user_id=None, document_id=None, source_id=None, source=None,
+                                  reference=None, doc_type=None,
+                                  k=1) -> QueryResponse:
+    """Async version of query_long_term_memory"""
+    query = build_query(query, user_id, document_id, source_id, source, reference, doc_type, k)
+    cache = getattr(client, "query_cache", None)
+    if cache is None:
+        return await _aquery(client, query)
+
+    async def load():
+        response = await _aquery(client, query)
+        if not isinstance(response, QueryResponse) or len(response.results) != 1 or "detail" in response:
+            raise Uncacheable(response)
+        return response.results[0]
+
+    try:
+        return QueryResponse(results=[await cache.aget_or_load(query, load)])
+    except Uncacheable as e:
+        return e.response
+
+
+async def _aquery(client, query: Query):
+    response = await asyncio_detailed(client=client, json_body=QueryRequest(queries=[query]))
     return get_parsed_or_raise(response)
 
 
 def query_long_term_top_results(client, query, user_id=None, document_id=None, source_id=None, source=None, reference=None,
-                                doc_type=None,threshold=0.3, k=3):
-    long_term_response = query_long_term_memory(client, query, user_id, document_id, source_id, source, reference, doc_type, k)
-    return get_top_results_above_threshold(long_term_response, threshold, k)
+                                doc_type=None,threshold=0.3, k=3, diversity_tradeoff=None, fetch_k=None, embedder=None):
+    """
+    Query long-term memory and keep the k best chunks scoring above threshold.
+
+    With diversity_tradeoff set, fetch_k candidates (4 * k by default) are retrieved and reranked
+    with Maximal Marginal Relevance (see rerank.mmr_rerank) down to k diverse chunks.
+    """
+    if diversity_tradeoff is None:
+        long_term_response = query_long_term_memory(client, query, user_id, document_id, source_id, source, reference, doc_type, k)
+        return get_top_results_above_threshold(long_term_response, threshold, k)
+
+    # NumPy is only imported when a query is reranked
+    from ...rerank import mmr_rerank
+
+    fetch_k = fetch_k or 4 * k
+    long_term_response = query_long_term_memory(client, query, user_id, document_id, source_id, source, reference, doc_type,
+                                                fetch_k)
+    candidates = get_top_results_above_threshold(long_term_response, threshold, fetch_k)
+    return mmr_rerank(candidates, k, diversity_tradeoff, embedder)
+
+
+async def aquery_long_term_top_results(client, query, user_id=None, document_id=None, source_id=None, source=None,
+                                       reference=None, doc_type=None, threshold=0.3, k=3, diversity_tradeoff=None,
+                                       fetch_k=None, embedder=None):
+    """Async version of query_long_term_top_results (the embedder, if any, runs in a worker thread)"""
+    if diversity_tradeoff is None:
+        long_term_response = await aquery_long_term_memory(client, query, user_id, document_id, source_id, source,
+                                                           reference, doc_type, k)
+        return get_top_results_above_threshold(long_term_response, threshold, k)
+
+    from ...rerank import mmr_rerank
+
+    fetch_k = fetch_k or 4 * k
+    long_term_response = await aquery_long_term_memory(client, query, user_id, document_id, source_id, source,
+                                                       reference, doc_type, fetch_k)
+    candidates = get_top_results_above_threshold(long_term_response, threshold, fetch_k)
+    if embedder is None:
+        return mmr_rerank(candidates, k, diversity_tradeoff)
+    return await to_thread(mmr_rerank, candidates, k, diversity_tradeoff, embedder)
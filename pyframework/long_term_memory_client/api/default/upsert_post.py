@@ -4,25 +4,30 @@ from typing import Any, Dict, Optional, Union
 import httpx
 
 from ... import errors
+from ...cache import invalidate_upsert
+from ...fingerprint import record_upsert, unchanged_response
 from ...client import AuthenticatedClient, Client
 from ...models.http_validation_error import HTTPValidationError
 from ...models.upsert_request import UpsertRequest
 from ...models.upsert_response import UpsertResponse
 from ...types import Response
 from ...http_utils import execute_request, execute_request_async
+from ...request_body import encode_upsert
 
 
 def _get_kwargs(
         *,
         client: AuthenticatedClient,
         json_body: UpsertRequest,
+        asynchronous: bool = False,
 ) -> Dict[str, Any]:
     url = "{}/upsert".format(client.base_url)
 
     headers: Dict[str, str] = client.get_headers()
     cookies: Dict[str, Any] = client.get_cookies()
 
-    json_json_body = json_body.to_dict()
+    content, content_headers = encode_upsert(client, json_body, asynchronous)
+    headers.update(content_headers)
 
     return {
         "method": "post",
@@ -31,7 +36,7 @@ def _get_kwargs(
         "cookies": cookies,
         "timeout": client.get_timeout(),
         "follow_redirects": client.follow_redirects,
-        "json": json_json_body,
+        "content": content,
     }
 
 
@@ -90,12 +95,17 @@ def sync_detailed(
         json_body=json_body,
     )
 
-    return execute_request(
+    invalidate_upsert(client, json_body)
+    response = execute_request(
         client=client,
         kwargs=kwargs,
         parse_response_fn=_parse_response,
         build_response_fn=_build_response,
     )
+    # Again after the write, for queries that read the old data while it was in flight
+    invalidate_upsert(client, json_body)
+    record_upsert(client, json_body, response)
+    return response
 
 
 def sync(
@@ -151,14 +161,19 @@ async def asyncio_detailed(
     kwargs = _get_kwargs(
         client=client,
         json_body=json_body,
+        asynchronous=True,
     )
 
-    return await execute_request_async(
+    invalidate_upsert(client, json_body)
+    response = await execute_request_async(
         client=client,
         kwargs=kwargs,
         parse_response_fn=_parse_response,
         build_response_fn=_build_response,
     )
+    invalidate_upsert(client, json_body)
+    record_upsert(client, json_body, response)
+    return response
 
 
 async def asyncio(
@@ -191,7 +206,8 @@ async def asyncio(
     ).parsed
 
 
-def upsert_information(client, document_id, text, source_id, created_at, author, source="chat", reference=None):
+def upsert_information(client, document_id, text, source_id, created_at, author, source="chat", reference=None,
+                       force=False):
     upsert_payload = {
         "documents": [
             {
@@ -214,4 +230,7 @@ def upsert_information(client, document_id, text, source_id, created_at, author,
         upsert_payload["documents"][0]["metadata"]["reference"] = reference
 
     upsert_request = UpsertRequest.from_dict(upsert_payload)
+    skipped = None if force else unchanged_response(client, upsert_request)
+    if skipped is not None:
+        return skipped
     return sync(client=client, json_body=upsert_request)
@@ -0,0 +1,308 @@
+"""Multi-query batching for the /query endpoint
+
+`query_batch` packs many queries into as few requests as possible, splitting batches that exceed
+`max_batch_size` or that the server rejects as too large, and returns one QueryResult per input
+query, in input order. `QueryBatcher` coalesces concurrent single-query calls (from threads or
+asyncio tasks) issued within `max_wait` seconds into one request; `close()` sends the queries still
+pending and stops its threads.
+
+Example:
+    results = query_batch(client, [
+        build_query("travel plans", user_id=user_id, k=5),
+        ("favourite food", {"user_id": user_id}, 3),
+    ])
+
+    batcher = QueryBatcher(client)
+    result = batcher.query(build_query("travel plans", user_id=user_id))
+    batcher.close()
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pyframework.trace.deadline import DeadlineExceeded, check_deadline, remaining_time
+
+from .api.default.query_post import asyncio_detailed, sync_detailed
+from .client import Client
+from .errors import APIError
+from .http_utils import get_parsed_or_raise
+from .models import Query, QueryRequest, QueryResponse, QueryResult
+from .types import UNSET
+
+logger = logging.getLogger(__name__)
+
+QuerySpec = Union[Query, Dict[str, Any], Tuple[str, Optional[Dict[str, Any]], int]]
+
+DEFAULT_MAX_BATCH_SIZE = 32
+
+
+class BatcherClosed(RuntimeError):
+    """Raised when a query is submitted to a closed QueryBatcher"""
+
+
+def to_query(spec: QuerySpec) -> Query:
+    """Normalize a Query, a /query payload dict or a (query, filter, top_k) tuple to a Query"""
+    if isinstance(spec, Query):
+        return spec
+    if isinstance(spec, dict):
+        return Query.from_dict(spec)
+    query, filter_, top_k = spec
+    return Query.from_dict({"query": query, "filter": filter_ or UNSET, "top_k": top_k})
+
+
+def _too_large(response: QueryResponse) -> bool:
+    detail = response.additional_properties.get("detail")
+    return detail is not None and "toolarge" in str(detail).replace("_", "").replace(" ", "").lower()
+
+
+def _results(response, queries: Sequence[Query]) -> List[QueryResult]:
+    if not isinstance(response, QueryResponse):
+        raise APIError(status_code=422, content=json.dumps(response.to_dict()).encode("utf-8"),
+                       message=f"Query batch rejected: {response.to_dict()}")
+    if len(response.results) != len(queries):
+        detail = response.additional_properties.get("detail")
+        raise APIError(status_code=200, content=json.dumps(response.to_dict()).encode("utf-8"),
+                       message=f"Expected {len(queries)} query results, got {len(response.results)}"
+                               + (f": {detail}" if detail else ""))
+    return response.results
+
+
+def _split(queries: Sequence[Query]) -> Tuple[Sequence[Query], Sequence[Query]]:
+    middle = len(queries) // 2
+    logger.info(f"Query batch of {len(queries)} too large, splitting")
+    return queries[:middle], queries[middle:]
+
+
+def _chunks(queries: List[Query], max_batch_size: int) -> List[List[Query]]:
+    return [queries[start:start + max_batch_size] for start in range(0, len(queries), max_batch_size)]
+
+
+def _send(client: Client, queries: Sequence[Query]) -> List[QueryResult]:
+    try:
+        response = get_parsed_or_raise(sync_detailed(client=client, json_body=QueryRequest(queries=list(queries))))
+    except APIError as e:
+        if e.status_code != 413 or len(queries) == 1:
+            raise
+        response = None
+
+    if len(queries) > 1 and (response is None or (isinstance(response, QueryResponse) and _too_large(response))):
+        first, second = _split(queries)
+        return _send(client, first) + _send(client, second)
+    return _results(response, queries)
+
+
+async def _asend(client: Client, queries: Sequence[Query]) -> List[QueryResult]:
+    try:
+        response = get_parsed_or_raise(await asyncio_detailed(client=client, json_body=QueryRequest(queries=list(queries))))
+    except APIError as e:
+        if e.status_code != 413 or len(queries) == 1:
+            raise
+        response = None
+
+    if len(queries) > 1 and (response is None or (isinstance(response, QueryResponse) and _too_large(response))):
+        first, second = _split(queries)
+        first_results, second_results = await asyncio.gather(_asend(client, first), _asend(client, second))
+        return first_results + second_results
+    return _results(response, queries)
+
+
+def _cached(client: Client, queries: List[Query]):
+    """Split queries into cached results (None for misses) and the misses to send"""
+    cache = getattr(client, "query_cache", None)
+    if cache is None:
+        return None, [None] * len(queries), queries
+    generation = cache.generation()
+    cached = [cache.get(query) for query in queries]
+    return generation, cached, [query for query, result in zip(queries, cached) if result is None]
+
+
+def _merge(client: Client, generation: Optional[int], cached: List[Optional[QueryResult]],
+           missing: List[Query], results: List[QueryResult]) -> List[QueryResult]:
+    cache = getattr(client, "query_cache", None)
+    fetched = iter(results)
+    merged = []
+    for result in cached:
+        if result is None:
+            result = next(fetched)
+        merged.append(result)
+    if cache is not None:
+        for query, result in zip(missing, results):
+            cache.put(query, result, generation)
+    return merged
+
+
+def query_batch(client: Client, queries: Sequence[QuerySpec],
+                max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> List[QueryResult]:
+    """
+    Run many queries with as few /query requests as possible.
+
+    Args:
+        client: The API client
+        queries: Query objects, /query payload dicts or (query, filter, top_k) tuples
+        max_batch_size: Maximum number of queries per request. Batches the server reports as too
+            large (HTTP 413 or a ResponseTooLargeError detail) are split in half and retried.
+
+    Returns:
+        One QueryResult per input query, in input order
+
+    Raises:
+        APIError: If a request fails
+    """
+    generation, cached, missing = _cached(client, [to_query(spec) for spec in queries])
+    results: List[QueryResult] = []
+    for chunk in _chunks(missing, max_batch_size):
+        results.extend(_send(client, chunk))
+    return _merge(client, generation, cached, missing, results)
+
+
+async def aquery_batch(client: Client, queries: Sequence[QuerySpec],
+                       max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> List[QueryResult]:
+    """Async version of query_batch; the requests of a large batch are sent concurrently"""
+    generation, cached, missing = _cached(client, [to_query(spec) for spec in queries])
+    chunk_results = await asyncio.gather(*(_asend(client, chunk) for chunk in _chunks(missing, max_batch_size)))
+    return _merge(client, generation, cached, missing, [result for results in chunk_results for result in results])
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent single-query calls into batched /query requests.
+
+    Identical queries waiting at the same time share one result. Batches are sent from a small
+    thread pool, so a slow batch does not hold back the next one.
+
+    Args:
+        client: The API client
+        max_batch_size: Maximum number of queries per request
+        max_wait: Seconds to wait for more queries before sending a partial batch
+        max_concurrency: Maximum number of batch requests in flight
+    """
+
+    def __init__(self, client: Client, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = 0.005,
+                 max_concurrency: int = 4):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: "OrderedDict[str, Tuple[Query, Future]]" = OrderedDict()
+        self._first_pending_at = 0.0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="query-batch")
+
+    def submit(self, spec: QuerySpec) -> Future:
+        """
+        Queue one query for the next batch.
+
+        Raises:
+            BatcherClosed: If the batcher has been closed
+        """
+        if self._closed:
+            raise BatcherClosed("QueryBatcher is closed")
+        query = to_query(spec)
+        cache = getattr(self.client, "query_cache", None)
+        cached = cache.get(query) if cache is not None else None
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        key = json.dumps(query.to_dict(), sort_keys=True)
+        with self._condition:
+            if self._closed:
+                raise BatcherClosed("QueryBatcher is closed")
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending[1]
+            future = Future()
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending[key] = (query, future)
+            self._ensure_worker()
+            self._condition.notify()
+            return future
+
+    def query(self, spec: QuerySpec) -> QueryResult:
+        """
+        Run one query as part of the next batch.
+
+        Raises:
+            APIError: If the batch request fails
+            DeadlineExceeded: If the current request deadline passes while waiting
+        """
+        check_deadline("long-term memory query")
+        future = self.submit(spec)
+        try:
+            return future.result(timeout=remaining_time())
+        except FutureTimeoutError:
+            raise DeadlineExceeded("Deadline exceeded waiting for long-term memory query") from None
+
+    async def aquery(self, spec: QuerySpec) -> QueryResult:
+        check_deadline("long-term memory query")
+        # shield: cancelling one caller must not cancel a result shared with other callers
+        return await asyncio.shield(asyncio.wrap_future(self.submit(spec)))
+
+    def close(self):
+        """Send the pending queries, wait for every batch in flight and stop the threads"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            self._condition.notify_all()
+        if worker is not None:
+            worker.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "QueryBatcher":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[Query, Future]]:
+        with self._condition:
+            while True:
+                while not self._pending:
+                    if self._closed:
+                        return []
+                    self._condition.wait()
+                wait = self._first_pending_at + self.max_wait - time.monotonic()
+                # Once closed, pending queries are sent without waiting for more
+                if len(self._pending) >= self.max_batch_size or wait <= 0 or self._closed:
+                    break
+                self._condition.wait(wait)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                _, item = self._pending.popitem(last=False)
+                batch.append(item)
+            self._first_pending_at = time.monotonic()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._executor.submit(self._send_batch, batch)
+
+    def _send_batch(self, batch: List[Tuple[Query, Future]]):
+        try:
+            results = query_batch(self.client, [query for query, _ in batch], self.max_batch_size)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"Query batch of {len(batch)} queries failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
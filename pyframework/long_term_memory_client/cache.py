@@ -0,0 +1,254 @@
+"""Client-side query result cache
+
+Caches one QueryResult per (normalized query text, filter, top_k) with a TTL and LRU eviction, and
+lets concurrent identical queries share a single request. Attach a cache to a client to use it:
+
+    client = create_client(base_url, token, query_cache=QueryCache(ttl=60))
+
+Queries sent with `query_long_term_memory` and `query_batch` are then answered from the cache,
+and upserts/deletes sent through the same client drop the entries whose filters may match the
+written or deleted documents. Cached results are shared between callers and must not be mutated.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from .models import DeleteRequest, Query, QueryResult, UpsertRequest
+from .types import Unset
+
+# Filter keys that select a range rather than a value, never used to rule out invalidation
+RANGE_FILTER_KEYS = ("start_date", "end_date")
+
+CacheKey = Tuple[str, str, Any]
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _filter_dict(filter_) -> Dict[str, str]:
+    if filter_ is None or isinstance(filter_, Unset):
+        return {}
+    values = filter_.to_dict() if hasattr(filter_, "to_dict") else dict(filter_)
+    return {key: str(value) for key, value in values.items() if value is not None and key not in RANGE_FILTER_KEYS}
+
+
+def query_key(query: Query) -> CacheKey:
+    filter_ = query.filter_.to_dict() if not isinstance(query.filter_, Unset) else {}
+    top_k = None if isinstance(query.top_k, Unset) else query.top_k
+    return _normalize_text(query.query), json.dumps(filter_, sort_keys=True, default=str), top_k
+
+
+class Uncacheable(Exception):
+    """Raised by a get_or_load loader to hand a response that must not be cached back to every waiting caller"""
+
+    def __init__(self, response: Any):
+        self.response = response
+        super().__init__("Response not cacheable")
+
+
+class _LoadAbandoned(Exception):
+    """Set on an in-flight load whose loading caller was cancelled or interrupted; a waiting caller loads instead"""
+
+
+class _Entry:
+    __slots__ = ("expires_at", "result", "filter", "ids")
+
+    def __init__(self, expires_at: float, result: QueryResult, filter_: Dict[str, str]):
+        self.expires_at = expires_at
+        self.result = result
+        self.filter = filter_
+        self.ids = {chunk.id for chunk in result.results if not isinstance(chunk.id, Unset)}
+        self.ids.update(chunk.metadata.document_id for chunk in result.results
+                        if not isinstance(chunk.metadata.document_id, Unset))
+
+
+def _may_match(entry_filter: Dict[str, str], written: Dict[str, str]) -> bool:
+    """False only when a key present in both filters has different values"""
+    return all(written[key] == value for key, value in entry_filter.items() if key in written)
+
+
+class QueryCache:
+    """
+    TTL + LRU cache of query results with single-flight loading.
+
+    Args:
+        ttl: Seconds a result stays valid
+        max_entries: Maximum number of cached results
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, Future] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, query: Query) -> Optional[QueryResult]:
+        key = query_key(query)
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: CacheKey) -> Optional[QueryResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.result
+
+    def put(self, query: Query, result: QueryResult, generation: Optional[int] = None):
+        """Store a result, unless the cache was invalidated since `generation` (from `generation()`)"""
+        key = query_key(query)
+        with self._lock:
+            self._put(key, query, result, generation)
+
+    def _put(self, key: CacheKey, query: Query, result: QueryResult, generation: Optional[int]):
+        if generation is not None and generation != self._generation:
+            return
+        self._entries[key] = _Entry(time.monotonic() + self.ttl, result, _filter_dict(query.filter_))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def _claim(self, key: CacheKey):
+        """(cached result, in-flight future, whether the caller loads, generation)"""
+        with self._lock:
+            result = self._get(key)
+            if result is not None:
+                return result, None, False, None
+            future = self._in_flight.get(key)
+            if future is not None:
+                return None, future, False, None
+            future = self._in_flight[key] = Future()
+            return None, future, True, self._generation
+
+    def _loaded(self, key: CacheKey, query: Query, future: Future, generation: int,
+                result: Optional[QueryResult] = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if error is None:
+                self._put(key, query, result, generation)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Cancellation of the loading caller is not an outcome of the load: don't pass it on to waiters
+            future.set_exception(_LoadAbandoned())
+
+    def get_or_load(self, query: Query, load: Callable[[], QueryResult]) -> QueryResult:
+        """
+        Return the cached result, or call `load` once for all concurrent callers of the same query.
+        If the loading caller is cancelled or interrupted, one of the waiting callers loads instead.
+
+        Raises:
+            Uncacheable: Raised by `load` (to the loading caller and every waiting one)
+        """
+        key = query_key(query)
+        while True:
+            result, future, owner, generation = self._claim(key)
+            if result is not None:
+                return result
+            if owner:
+                break
+            try:
+                return future.result()
+            except _LoadAbandoned:
+                continue
+
+        try:
+            result = load()
+        except BaseException as e:
+            self._loaded(key, query, future, generation, error=e)
+            raise
+        self._loaded(key, query, future, generation, result)
+        return result
+
+    async def aget_or_load(self, query: Query, load: Callable[[], Awaitable[QueryResult]]) -> QueryResult:
+        """Async version of get_or_load: `load` is awaited, and waiting callers don't block the event loop"""
+        key = query_key(query)
+        while True:
+            result, future, owner, generation = self._claim(key)
+            if result is not None:
+                return result
+            if owner:
+                break
+            try:
+                # shield: cancelling one waiter must not cancel the future shared with the others
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LoadAbandoned:
+                continue
+
+        try:
+            result = await load()
+        except BaseException as e:
+            self._loaded(key, query, future, generation, error=e)
+            raise
+        self._loaded(key, query, future, generation, result)
+        return result
+
+    def invalidate_matching(self, written: Iterable[Dict[str, str]] = (), ids: Iterable[str] = ()):
+        """
+        Drop results that may include documents with the given metadata or ids.
+
+        Args:
+            written: Metadata (as filter dicts) of documents that were written or deleted
+            ids: Ids of documents that were written or deleted
+        """
+        written = list(written)
+        ids = set(ids)
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if (ids and (entry.ids & ids or entry.filter.get("document_id") in ids))
+                or any(_may_match(entry.filter, metadata) for metadata in written)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def invalidate_upsert(client, request: UpsertRequest):
+    cache: Optional[QueryCache] = getattr(client, "query_cache", None)
+    if cache is None:
+        return
+    written = []
+    ids = []
+    for document in request.documents:
+        metadata = _filter_dict(document.metadata)
+        if not isinstance(document.id, Unset):
+            metadata.setdefault("document_id", document.id)
+            ids.append(document.id)
+        written.append(metadata)
+    cache.invalidate_matching(written, ids)
+
+
+def invalidate_delete(client, request: DeleteRequest):
+    cache: Optional[QueryCache] = getattr(client, "query_cache", None)
+    if cache is None:
+        return
+    if request.delete_all:
+        cache.clear()
+        return
+    ids = [] if isinstance(request.ids, Unset) else list(request.ids)
+    written = [] if isinstance(request.filter_, Unset) else [_filter_dict(request.filter_)]
+    cache.invalidate_matching(written, ids)
@@ -0,0 +1,84 @@
+"""Token-aware text chunking
+
+Splits documents the way the long-term memory service does before embedding them: windows of
+about `chunk_tokens` tokens, cut back to the last sentence end when that keeps at least
+`min_chunk_chars` characters. Tokens are counted with tiktoken's cl100k_base encoding when it is
+available; otherwise (tiktoken not installed, or its encoding file cannot be downloaded) each
+whitespace-delimited word counts as one token.
+"""
+import logging
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_TOKENS = 200
+MIN_CHUNK_CHARS = 350
+MAX_CHUNKS = 10_000
+
+_WORD = re.compile(r"\S+\s*|\s+")
+_SENTENCE_END = re.compile(r"[.?!\n]")
+
+_codec: Optional[Tuple[Callable[[str], List], Callable[[List], str]]] = None
+_codec_lock = threading.Lock()
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text)
+
+
+def _get_codec() -> Tuple[Callable[[str], List], Callable[[List], str]]:
+    global _codec
+    if _codec is None:
+        with _codec_lock:
+            if _codec is None:
+                try:
+                    import tiktoken
+
+                    encoding = tiktoken.get_encoding("cl100k_base")
+                    _codec = (lambda text: encoding.encode(text, disallowed_special=()), encoding.decode)
+                except Exception as e:
+                    logger.info(f"tiktoken unavailable ({type(e).__name__}), counting words as tokens")
+                    _codec = (_words, "".join)
+    return _codec
+
+
+def count_tokens(text: str) -> int:
+    encode, _ = _get_codec()
+    return len(encode(text))
+
+
+def chunk_text(text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, min_chunk_chars: int = MIN_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into chunks of at most `chunk_tokens` tokens.
+
+    Args:
+        text: The text
+        chunk_tokens: Maximum tokens per chunk
+        min_chunk_chars: A window is only cut back to its last sentence end if at least this many characters remain
+
+    Returns:
+        The non-empty chunks, stripped, in order
+    """
+    if not text or not text.strip():
+        return []
+    encode, decode = _get_codec()
+    tokens = encode(text)
+    chunks = []
+    start = 0
+    while start < len(tokens) and len(chunks) < MAX_CHUNKS:
+        window = tokens[start:start + chunk_tokens]
+        chunk = decode(window)
+        cut = len(chunk)
+        if start + chunk_tokens < len(tokens):
+            sentence_ends = [match.end() for match in _SENTENCE_END.finditer(chunk)]
+            if sentence_ends and sentence_ends[-1] >= min_chunk_chars:
+                cut = sentence_ends[-1]
+        piece = chunk[:cut]
+        # Tokens of the cut off tail start the next window
+        used = len(encode(piece)) if cut < len(chunk) else len(window)
+        start += max(used, 1)
+        if piece.strip():
+            chunks.append(piece.strip())
+    return chunks
@@ -1,7 +1,38 @@
+import asyncio
 import ssl
-from typing import Dict, Union
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 
 import attr
+import httpx
+
+if TYPE_CHECKING:
+    from .cache import QueryCache
+    from .fingerprint import FingerprintIndex
+
+
+class _HTTPClients:
+    """Lazily created httpx clients shared by a Client and the copies made by its with_* methods"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client: Optional[httpx.Client] = None
+        # One AsyncClient per event loop, dropped with its loop
+        self.async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Set by set_async_httpx_client outside a running loop, adopted by the next loop using the client
+        self.unbound_async_client: Optional[httpx.AsyncClient] = None
+
+    def discard_closed_loops(self):
+        """Drop the clients of event loops that have been closed (e.g. by asyncio.run).
+
+        Their connections can no longer be closed asynchronously; dropping the last reference
+        lets the sockets be released instead of staying pooled until the Client goes away.
+        """
+        for loop in [loop for loop in self.async_clients.keys() if loop.is_closed()]:
+            self.async_clients.pop(loop, None)
 
 
 @attr.s(auto_attribs=True)
@@ -19,6 +50,25 @@ class Client:
         raise_on_unexpected_status: Whether or not to raise an errors.UnexpectedStatus if the API returns a
             status code that was not documented in the source OpenAPI document.
         follow_redirects: Whether or not to follow redirects. Default value is False.
+        max_connections: Maximum number of concurrent connections to the API server.
+        max_keepalive_connections: Maximum number of idle connections kept open for reuse.
+        keepalive_expiry: Seconds an idle connection is kept open.
+        http2: Whether or not to negotiate HTTP/2. Only used when the `h2` package is installed.
+        httpx_args: Additional arguments for the httpx.Client / httpx.AsyncClient constructors (e.g. transport).
+        query_embeddings: How chunk embeddings in query results are decoded: "list" (floats), "drop" (not
+            requested from the server and discarded) or "float32" (lazily parsed read-only float32 arrays).
+        query_cache: Optional QueryCache answering repeated queries; upserts and deletes sent through this
+            client invalidate the matching entries.
+        fingerprints: Optional FingerprintIndex recording what upserts sent through this client wrote, so
+            unchanged documents are not upserted again; deletes sent through this client update it.
+        request_compression: "gzip" or "zstd" to compress upsert request bodies (sent with Content-Encoding;
+            the server must accept it). None sends them uncompressed.
+        stream_upload_min_size: Upserts estimated at least this many bytes are encoded incrementally and sent
+            with chunked transfer encoding instead of as one buffer. None never streams.
+
+    The underlying httpx clients are created on first use and reused for every request, so
+    connections (and their TLS sessions) are kept alive between calls. Close them with `close()` /
+    `aclose()` or by using the client as a (async) context manager.
     """
 
     base_url: str
@@ -28,6 +78,119 @@ class Client:
     verify_ssl: Union[str, bool, ssl.SSLContext] = attr.ib(True, kw_only=True)
     raise_on_unexpected_status: bool = attr.ib(False, kw_only=True)
     follow_redirects: bool = attr.ib(False, kw_only=True)
+    max_connections: int = attr.ib(100, kw_only=True)
+    max_keepalive_connections: int = attr.ib(20, kw_only=True)
+    keepalive_expiry: float = attr.ib(30.0, kw_only=True)
+    http2: bool = attr.ib(False, kw_only=True)
+    httpx_args: Dict[str, Any] = attr.ib(factory=dict, kw_only=True)
+    query_embeddings: str = attr.ib("list", kw_only=True)
+    query_cache: Optional["QueryCache"] = attr.ib(None, kw_only=True, eq=False)
+    fingerprints: Optional["FingerprintIndex"] = attr.ib(None, kw_only=True, eq=False)
+    request_compression: Optional[str] = attr.ib(None, kw_only=True)
+    stream_upload_min_size: Optional[int] = attr.ib(1024 * 1024, kw_only=True)
+    _http: _HTTPClients = attr.ib(factory=_HTTPClients, init=False, repr=False, eq=False)
+
+    def _evolve(self, **changes) -> "Client":
+        evolved = attr.evolve(self, **changes)
+        # Copies differ only in per-request settings, so they share the connection pools
+        evolved._http = self._http
+        return evolved
+
+    def _client_args(self) -> Dict[str, Any]:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+        return {
+            "verify": self.verify_ssl,
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            **self.httpx_args,
+        }
+
+    def get_httpx_client(self) -> httpx.Client:
+        """Get the underlying httpx.Client, constructing a new one if not previously set"""
+        http = self._http
+        if http.client is None:
+            with http.lock:
+                if http.client is None:
+                    http.client = httpx.Client(**self._client_args())
+        return http.client
+
+    def set_httpx_client(self, client: httpx.Client) -> "Client":
+        """Manually set the underlying httpx.Client
+
+        **NOTE**: This will override any other settings on the client, including cookies, headers, and timeout.
+        """
+        self._http.client = client
+        return self
+
+    def get_async_httpx_client(self) -> httpx.AsyncClient:
+        """Get the underlying httpx.AsyncClient, constructing a new one if not previously set
+
+        An httpx.AsyncClient is bound to the event loop it is first used on, so each event loop gets
+        its own. Clients of loops that have been closed are dropped when another loop creates one.
+        """
+        http = self._http
+        loop = asyncio.get_running_loop()
+        async_client = http.async_clients.get(loop)
+        if async_client is None or async_client.is_closed:
+            with http.lock:
+                async_client = http.async_clients.get(loop)
+                if async_client is None or async_client.is_closed:
+                    http.discard_closed_loops()
+                    async_client, http.unbound_async_client = http.unbound_async_client, None
+                    if async_client is None or async_client.is_closed:
+                        async_client = httpx.AsyncClient(**self._client_args())
+                    http.async_clients[loop] = async_client
+        return async_client
+
+    def set_async_httpx_client(self, async_client: httpx.AsyncClient) -> "Client":
+        """Manually set the underlying httpx.AsyncClient
+
+        **NOTE**: This will override any other settings on the client, including cookies, headers, and timeout.
+        """
+        with self._http.lock:
+            try:
+                self._http.async_clients[asyncio.get_running_loop()] = async_client
+            except RuntimeError:
+                self._http.unbound_async_client = async_client
+        return self
+
+    def close(self) -> None:
+        """Close the underlying httpx.Client and its connections"""
+        with self._http.lock:
+            client, self._http.client = self._http.client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close the httpx.AsyncClient of the running event loop and its connections"""
+        with self._http.lock:
+            async_client = self._http.async_clients.pop(asyncio.get_running_loop(), None)
+            self._http.discard_closed_loops()
+        if async_client is not None:
+            await async_client.aclose()
+
+    def __enter__(self) -> "Client":
+        self.get_httpx_client()
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "Client":
+        self.get_async_httpx_client()
+        return self
+
+    async def __aexit__(self, *args: Any, **kwargs: Any) -> None:
+        await self.aclose()
 
     def get_headers(self) -> Dict[str, str]:
         """Get headers to be used in all endpoints"""
@@ -35,21 +198,21 @@ class Client:
 
     def with_headers(self, headers: Dict[str, str]) -> "Client":
         """Get a new client matching this one with additional headers"""
-        return attr.evolve(self, headers={**self.headers, **headers})
+        return self._evolve(headers={**self.headers, **headers})
 
     def get_cookies(self) -> Dict[str, str]:
         return {**self.cookies}
 
     def with_cookies(self, cookies: Dict[str, str]) -> "Client":
         """Get a new client matching this one with additional cookies"""
-        return attr.evolve(self, cookies={**self.cookies, **cookies})
+        return self._evolve(cookies={**self.cookies, **cookies})
 
     def get_timeout(self) -> float:
         return self.timeout
 
     def with_timeout(self, timeout: float) -> "Client":
         """Get a new client matching this one with a new timeout (in seconds)"""
-        return attr.evolve(self, timeout=timeout)
+        return self._evolve(timeout=timeout)
 
 
 @attr.s(auto_attribs=True)
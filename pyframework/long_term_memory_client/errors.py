@@ -1,4 +1,7 @@
 """ Contains shared errors types that can be raised from API functions """
+import httpx
+
+_RETRY_STATUSES = frozenset((408, 425, 429))
 
 
 class UnexpectedStatus(Exception):
@@ -21,4 +24,12 @@ class APIError(Exception):
         super().__init__(self.message)
 
 
-__all__ = ["UnexpectedStatus", "APIError"]
+def is_retriable(error: Exception) -> bool:
+    """Whether a failed request may succeed if sent again (transport errors, 408 / 425 / 429 and 5xx statuses)"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code >= 500 or status_code in _RETRY_STATUSES)
+
+
+__all__ = ["UnexpectedStatus", "APIError", "is_retriable"]
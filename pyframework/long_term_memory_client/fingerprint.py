@@ -0,0 +1,249 @@
+"""Content fingerprints of upserted documents, to skip re-upserting unchanged ones
+
+`FingerprintIndex` maps document ids to a 16-byte BLAKE2b hash of the document text and metadata,
+and to the document's source_id. Set one as `Client.fingerprints`, and:
+
+    * every successful upsert sent through the client records the fingerprints of its documents
+    * `upsert_information` and `IngestPipeline` skip documents whose fingerprint is unchanged
+      (pass `force=True` to send them anyway)
+    * deletes sent through the client forget the deleted ids; deletes by a filter naming a
+      source_id forget that source's documents (and those recorded without a source_id); deletes
+      by any other filter, or delete_all, clear the index, since it can't tell which documents matched
+
+Documents without an id always go to the service, which assigns one.
+
+With `path`, the index is an append-only binary log replayed on open: one record per change,
+`op (1 byte) | id length (2 bytes) | id (utf-8)`, followed for set records by
+`hash (16 bytes) | source_id length (2 bytes) | source_id (utf-8)`. Logs of the first format, whose
+set records end after the hash, are still read (their entries have no known source). The log is rewritten
+with the live entries when it grows to more than twice their number. Writes are flushed but not
+fsynced; losing the tail in a crash only means those documents are sent once more.
+
+Example:
+    client = create_client(base_url, token, fingerprints=FingerprintIndex("memory.fingerprints"))
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models import DeleteRequest, Document, UpsertRequest, UpsertResponse
+from .types import Unset
+
+logger = logging.getLogger(__name__)
+
+_HEADER = b"PFFP2\n"
+_HEADER_V1 = b"PFFP1\n"
+_RECORD = struct.Struct(">BH")
+_LENGTH = struct.Struct(">H")
+_SET, _FORGET, _CLEAR = 1, 2, 3
+DIGEST_SIZE = 16
+
+
+def fingerprint(document: Document) -> bytes:
+    """Hash of the text and metadata of a document"""
+    metadata = document.metadata.to_dict() if not isinstance(document.metadata, Unset) else {}
+    content = json.dumps({"text": document.text, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def _document_id(document: Document) -> Optional[str]:
+    return document.id if not isinstance(document.id, Unset) and document.id else None
+
+
+def _source_id(document: Document) -> Optional[str]:
+    if isinstance(document.metadata, Unset) or isinstance(document.metadata.source_id, Unset):
+        return None
+    return document.metadata.source_id or None
+
+
+class FingerprintIndex:
+    """
+    Args:
+        path: File persisting the index (memory only when omitted)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # document id -> (fingerprint, source_id or None when unknown)
+        self._fingerprints: Dict[str, Tuple[bytes, Optional[str]]] = {}
+        self._records = 0
+        self._lock = threading.Lock()
+        self._log = None
+        if path:
+            self._open()
+
+    def _open(self):
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if data.startswith(_HEADER):
+                self._replay(data)
+            elif data.startswith(_HEADER_V1):
+                self._replay(data, with_sources=False)
+            else:
+                logger.warning(f"Ignoring fingerprint index {self.path} with an unknown format")
+            self._compact()
+        else:
+            self._log = open(self.path, "ab")
+            self._log.write(_HEADER)
+            self._log.flush()
+
+    def _replay(self, data: bytes, with_sources: bool = True):
+        offset = len(_HEADER)
+        while offset + _RECORD.size <= len(data):
+            op, length = _RECORD.unpack_from(data, offset)
+            id_end = offset + _RECORD.size + length
+            end = id_end + (DIGEST_SIZE if op == _SET else 0)
+            source_id = None
+            if op == _SET and with_sources:
+                if end + _LENGTH.size > len(data):
+                    break
+                source_length, = _LENGTH.unpack_from(data, end)
+                source_id = data[end + _LENGTH.size:end + _LENGTH.size + source_length].decode("utf-8") or None
+                end += _LENGTH.size + source_length
+            if end > len(data):
+                break  # Partially written last record
+            document_id = data[offset + _RECORD.size:id_end].decode("utf-8")
+            if op == _SET:
+                self._fingerprints[document_id] = (data[id_end:id_end + DIGEST_SIZE], source_id)
+            elif op == _FORGET:
+                self._fingerprints.pop(document_id, None)
+            elif op == _CLEAR:
+                self._fingerprints.clear()
+            offset = end
+        self._records = len(self._fingerprints)
+
+    def _encode(self, op: int, document_id: str = "", digest: bytes = b"", source_id: Optional[str] = None) -> bytes:
+        encoded = document_id.encode("utf-8")
+        record = _RECORD.pack(op, len(encoded)) + encoded
+        if op == _SET:
+            source = (source_id or "").encode("utf-8")
+            record += digest + _LENGTH.pack(len(source)) + source
+        return record
+
+    def _write(self, records: List[bytes]):
+        if self.path is None or not records:
+            return
+        self._log.write(b"".join(records))
+        self._log.flush()
+        self._records += len(records)
+        if self._records > 2 * len(self._fingerprints) + 10_000:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the log with one record per live entry"""
+        if self._log is not None:
+            self._log.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER)
+            f.write(b"".join(self._encode(_SET, document_id, digest, source_id)
+                             for document_id, (digest, source_id) in self._fingerprints.items()))
+        os.replace(tmp_path, self.path)
+        self._log = open(self.path, "ab")
+        self._records = len(self._fingerprints)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._fingerprints
+
+    def unchanged(self, document: Document) -> bool:
+        """Whether the document was upserted before with the same text and metadata"""
+        document_id = _document_id(document)
+        if document_id is None:
+            return False
+        digest = fingerprint(document)
+        with self._lock:
+            entry = self._fingerprints.get(document_id)
+        return entry is not None and entry[0] == digest
+
+    def changed(self, documents: Sequence[Document]) -> Tuple[List[Document], List[Document]]:
+        """Split documents into (changed or new, unchanged)"""
+        changed, unchanged = [], []
+        for document in documents:
+            (unchanged if self.unchanged(document) else changed).append(document)
+        return changed, unchanged
+
+    def record(self, documents: Iterable[Document], ids: Optional[Sequence[str]] = None):
+        """Record the fingerprints of upserted documents (ids: the ids the service returned, in order)"""
+        documents = list(documents)
+        ids = list(ids) if ids is not None and len(ids) == len(documents) else [_document_id(d) for d in documents]
+        with self._lock:
+            records = []
+            for document, document_id in zip(documents, ids):
+                if not document_id:
+                    continue
+                entry = (fingerprint(document), _source_id(document))
+                if self._fingerprints.get(document_id) != entry:
+                    self._fingerprints[document_id] = entry
+                    records.append(self._encode(_SET, document_id, *entry))
+            self._write(records)
+
+    def forget(self, ids: Iterable[str]):
+        with self._lock:
+            records = [self._encode(_FORGET, document_id) for document_id in ids
+                       if self._fingerprints.pop(document_id, None) is not None]
+            self._write(records)
+
+    def forget_source(self, source_id: str):
+        """Forget the documents of a source, and those recorded without a known source_id"""
+        with self._lock:
+            ids = [document_id for document_id, (_, source) in self._fingerprints.items() if source in (source_id, None)]
+            for document_id in ids:
+                del self._fingerprints[document_id]
+            self._write([self._encode(_FORGET, document_id) for document_id in ids])
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints.clear()
+            self._write([self._encode(_CLEAR)])
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+                self.path = None
+
+
+def unchanged_response(client, request: UpsertRequest) -> Optional[UpsertResponse]:
+    """The response to an upsert whose documents are all unchanged, None when it has to be sent"""
+    index: Optional[FingerprintIndex] = getattr(client, "fingerprints", None)
+    if index is None or not request.documents or not all(index.unchanged(d) for d in request.documents):
+        return None
+    logger.debug(f"Skipping upsert of {len(request.documents)} unchanged documents")
+    return UpsertResponse(ids=[document.id for document in request.documents])
+
+
+def record_upsert(client, request: UpsertRequest, response):
+    index: Optional[FingerprintIndex] = getattr(client, "fingerprints", None)
+    if index is not None and isinstance(response.parsed, UpsertResponse):
+        index.record(request.documents, response.parsed.ids)
+
+
+def forget_delete(client, request: DeleteRequest):
+    index: Optional[FingerprintIndex] = getattr(client, "fingerprints", None)
+    if index is None:
+        return
+    filter_ = {} if isinstance(request.filter_, Unset) else request.filter_.to_dict()
+    ids = [] if isinstance(request.ids, Unset) else list(request.ids)
+    if request.delete_all:
+        index.clear()
+        return
+    if filter_.get("source_id"):
+        # Every document matching the filter has this source_id, whatever its other fields
+        index.forget(ids)
+        index.forget_source(filter_["source_id"])
+        return
+    if set(filter_) - {"document_id"}:
+        index.clear()
+        return
+    if "document_id" in filter_:
+        ids.append(filter_["document_id"])
+    index.forget(ids)
@@ -4,6 +4,9 @@ from typing import Any, Callable, Dict, Optional, TypeVar
 
 import httpx
 
+from pyframework.trace.deadline import bounded_timeout
+from pyframework.trace.disconnect import check_disconnected
+
 from . import errors
 from .client import Client
 from .errors import APIError
@@ -12,6 +15,24 @@ from .types import Response
 T = TypeVar("T")
 
 
+def _with_deadline(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Clamp the request timeout to the time left before the current request deadline"""
+    operation = f"{kwargs.get('method', 'request').upper()} {kwargs.get('url')}"
+    check_disconnected(operation)
+    timeout = bounded_timeout(kwargs.get("timeout"), operation)
+    if timeout == kwargs.get("timeout"):
+        return kwargs
+    return {**kwargs, "timeout": timeout}
+
+
+def _request_kwargs(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = _with_deadline(kwargs)
+    if "cookies" in kwargs and not kwargs["cookies"]:
+        # httpx deprecates per-request cookies on a shared client; only pass them when set
+        kwargs = {key: value for key, value in kwargs.items() if key != "cookies"}
+    return kwargs
+
+
 def execute_request(
     *,
     client: Client,
@@ -35,11 +56,10 @@ def execute_request(
         errors.UnexpectedStatus: If the server returns an unexpected status code
         httpx.TimeoutException: If the request times out
         APIError: If the request fails with a non-200 status
+        DeadlineExceeded: If the current request deadline has already passed
+        ClientDisconnected: If the HTTP client of the current request has disconnected
     """
-    response = httpx.request(
-        verify=client.verify_ssl,
-        **kwargs,
-    )
+    response = client.get_httpx_client().request(**_request_kwargs(kwargs))
     
     return build_response_fn(client=client, response=response)
 
@@ -67,9 +87,10 @@ async def execute_request_async(
         errors.UnexpectedStatus: If the server returns an unexpected status code
         httpx.TimeoutException: If the request times out
         APIError: If the request fails with a non-200 status
+        DeadlineExceeded: If the current request deadline has already passed
+        ClientDisconnected: If the HTTP client of the current request has disconnected
     """
-    async with httpx.AsyncClient(verify=client.verify_ssl) as _client:
-        response = await _client.request(**kwargs)
+    response = await client.get_async_httpx_client().request(**_request_kwargs(kwargs))
     
     return build_response_fn(client=client, response=response)
 
@@ -0,0 +1,479 @@
+"""Concurrent bulk ingestion into long-term memory
+
+Backfills files and chat archives with as few round-trips as possible:
+
+    records (generators: read_files / read_jsonl)
+      -> token-aware chunking (chunking.chunk_text)
+      -> content-hash dedup (identical chunk text within the same document is sent once, and
+         with a FingerprintIndex on the client, records unchanged since their last upsert are skipped)
+      -> multi-document UpsertRequest batches (max_batch_size documents / max_batch_chars characters)
+      -> a bounded pool of worker threads sending the batches
+
+Retriable failures are retried with exponential backoff; a batch the service rejects is split to
+isolate the bad documents, which are counted as failed. With `checkpoint_path`, the number of
+records whose chunks have all been written is saved periodically, and a later run over the same
+(ordered) records resumes after them. The checkpoint never moves past a batch with failed
+documents, so the next run sends that batch again.
+
+Every chunk of a record carries the record id as its metadata document_id, so the chunks can be
+filtered, deleted and deduplicated as one document. When the FingerprintIndex shows that a record
+was ingested before and has changed, its old chunks are deleted before the new ones are sent: a
+new version with fewer chunks would otherwise leave stale ones behind.
+
+Example:
+    pipeline = IngestPipeline(client, checkpoint_path="backfill.checkpoint.json")
+    stats = pipeline.run(read_jsonl(["chats/2023.jsonl", "chats/2024.jsonl"], source="chat"))
+
+Usage:
+    python -m pyframework.long_term_memory_client.ingest docs/ --base-url http://memory:8080 --token ...
+    python -m pyframework.long_term_memory_client.ingest chats.jsonl --jsonl --local /tmp/memory
+"""
+import argparse
+import fnmatch
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import attr
+
+from .api.default import delete_delete
+from .api.default.upsert_post import sync_detailed
+from .chunking import DEFAULT_CHUNK_TOKENS, chunk_text
+from .client import Client
+from .errors import APIError, is_retriable
+from .http_utils import get_parsed_or_raise
+from .models import DeleteRequest, DeleteResponse, Document, DocumentMetadataFilter, UpsertRequest, UpsertResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+METADATA_FIELDS = ("source", "source_id", "url", "created_at", "author", "doc_type", "reference")
+
+
+@attr.s(auto_attribs=True, slots=True)
+class SourceRecord:
+    """
+    Attributes:
+        document_id (str): Id of the document; chunks of long texts get the ids "<document_id>#<n>", and
+            all chunks keep document_id as their metadata document_id
+        text (str): The full text
+        metadata (Dict[str, Any]): DocumentMetadata fields (source, source_id, created_at, author, ...)
+    """
+
+    document_id: str
+    text: str
+    metadata: Dict[str, Any] = attr.ib(factory=dict)
+
+
+@attr.s(auto_attribs=True, slots=True)
+class IngestStats:
+    """
+    Attributes:
+        records (int): Records read
+        chunks (int): Chunks produced
+        duplicates (int): Chunks skipped as duplicates
+        unchanged (int): Documents skipped as unchanged since their last upsert (see fingerprint.py)
+        replaced (int): Changed records whose previous chunks were deleted before sending the new ones
+        documents (int): Documents written by the service
+        batches (int): Upsert requests that succeeded
+        retries (int): Requests sent again after a retriable failure
+        failed (int): Documents that could not be written
+        elapsed (float): Seconds spent
+    """
+
+    records: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    unchanged: int = 0
+    replaced: int = 0
+    documents: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.records} records, {self.chunks} chunks ({self.duplicates} duplicates, {self.unchanged} unchanged, "
+                f"{self.replaced} records replaced), "
+                f"{self.documents} written in {self.batches} batches, {self.failed} failed, "
+                f"{self.elapsed:.1f}s ({self.documents_per_second:.0f} documents/s)")
+
+
+def _iso_mtime(path: str) -> str:
+    return datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
+
+
+def _expand(paths: Sequence[str], patterns: Sequence[str]) -> Iterator[Tuple[str, str]]:
+    """(file path, document id) of every file, directories walked recursively in sorted order"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, path
+            continue
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    file_path = os.path.join(root, name)
+                    yield file_path, os.path.relpath(file_path, path)
+
+
+def read_files(paths: Sequence[str], patterns: Sequence[str] = DEFAULT_PATTERNS, source: str = "file",
+               author: Optional[str] = None) -> Iterator[SourceRecord]:
+    """
+    One record per text file, in a stable order.
+
+    Args:
+        paths: Files and directories (searched recursively for `patterns`)
+        patterns: File name patterns matched in directories
+        source: Metadata source of the records
+        author: Metadata author of the records
+
+    The document id is the path relative to the directory given (the path itself for files), and
+    the file modification time is the created_at.
+    """
+    for file_path, document_id in _expand(paths, patterns):
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        metadata = {"source": source, "source_id": document_id, "created_at": _iso_mtime(file_path)}
+        if author is not None:
+            metadata["author"] = author
+        yield SourceRecord(document_id=document_id, text=text, metadata=metadata)
+
+
+def read_jsonl(paths: Sequence[str], text_field: str = "text", id_field: str = "id", source: str = "chat",
+               field_map: Optional[Dict[str, str]] = None) -> Iterator[SourceRecord]:
+    """
+    One record per JSON line with a non-empty text, e.g. exported chat messages.
+
+    Args:
+        paths: JSON lines files
+        text_field: Key of the text
+        id_field: Key of the document id ("<file name>:<line number>" when missing)
+        source: Metadata source, unless the line has a "source"
+        field_map: Metadata field -> key in the line, for the metadata fields named differently
+            (e.g. {"source_id": "chat_id", "author": "role"})
+    """
+    field_map = {**{field: field for field in METADATA_FIELDS}, **(field_map or {})}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    logger.warning(f"Skipping invalid JSON at {path}:{line_number}: {e}")
+                    continue
+                text = item.get(text_field)
+                if not isinstance(text, str) or not text.strip():
+                    continue
+                metadata = {"source": source}
+                metadata.update({field: str(item[key]) for field, key in field_map.items() if item.get(key) is not None})
+                document_id = item.get(id_field)
+                yield SourceRecord(
+                    document_id=str(document_id) if document_id is not None else f"{os.path.basename(path)}:{line_number}",
+                    text=text,
+                    metadata=metadata,
+                )
+
+
+def _content_key(document_id: str, text: str) -> int:
+    digest = hashlib.blake2b(f"{document_id}\0{text}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class _Batch:
+    __slots__ = ("seq", "documents", "end_position")
+
+    def __init__(self, seq: int, documents: List[Document], end_position: int):
+        self.seq = seq
+        self.documents = documents
+        # Every record before this position has all its chunks in this batch or earlier ones
+        self.end_position = end_position
+
+
+class IngestPipeline:
+    """
+    Args:
+        client: The API client
+        chunk_tokens: Maximum tokens per chunk
+        max_batch_size: Maximum documents per UpsertRequest
+        max_batch_chars: Maximum characters of text per UpsertRequest
+        max_workers: Number of concurrent upsert requests
+        max_retries: Retries of a batch after retriable failures
+        retry_initial: Seconds before the first retry
+        checkpoint_path: JSON file recording progress, to resume an interrupted run
+        checkpoint_interval: Seconds between checkpoint saves
+        progress: Called with the IngestStats every `progress_interval` seconds and at the end (logs by default)
+        progress_interval: Seconds between progress reports
+        dedup: Skip chunks whose text was already sent for the same document id in this run
+        force: Send documents even when the client's FingerprintIndex has them unchanged
+    """
+
+    def __init__(self, client: Client, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, max_batch_size: int = 64,
+                 max_batch_chars: int = 500_000, max_workers: int = 8, max_retries: int = 5,
+                 retry_initial: float = 0.5, checkpoint_path: Optional[str] = None, checkpoint_interval: float = 5.0,
+                 progress: Optional[Callable[[IngestStats], None]] = None, progress_interval: float = 10.0,
+                 dedup: bool = True, force: bool = False):
+        self.client = client
+        self.chunk_tokens = chunk_tokens
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_initial = retry_initial
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.progress = progress or (lambda stats: logger.info(f"Ingestion progress: {stats}"))
+        self.progress_interval = progress_interval
+        self.dedup = dedup
+        self.force = force
+
+        self._lock = threading.Lock()
+        self._stats = IngestStats()
+        self._seen: set = set()
+        self._done: Dict[int, int] = {}
+        self._next_seq = 0
+        self._confirmed_seq = 0
+        self._failed_seq: Optional[int] = None
+        self._position = 0
+
+    # Checkpoints
+
+    def _load_checkpoint(self) -> int:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        self._stats = IngestStats(**checkpoint.get("stats", {}))
+        logger.info(f"Resuming ingestion after {checkpoint['position']} records")
+        return checkpoint["position"]
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            checkpoint = {"position": self._position, "stats": attr.asdict(self._stats)}
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _confirm(self, batch: _Batch, succeeded: bool = True):
+        """Advance the checkpoint position over the batches written without gaps, stopping at a failed one"""
+        with self._lock:
+            if not succeeded and (self._failed_seq is None or batch.seq < self._failed_seq):
+                self._failed_seq = batch.seq
+            if self._failed_seq is not None and batch.seq >= self._failed_seq:
+                return
+            self._done[batch.seq] = batch.end_position
+            while self._confirmed_seq in self._done:
+                self._position = self._done.pop(self._confirmed_seq)
+                self._confirmed_seq += 1
+
+    # Sending
+
+    def _with_retries(self, description: str, request: Callable[[], None]):
+        delay = self.retry_initial
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request()
+            except Exception as e:
+                if not is_retriable(e) or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self._stats.retries += 1
+                logger.warning(f"{description} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+    def _upsert(self, documents: List[Document]):
+        def request():
+            response = get_parsed_or_raise(sync_detailed(client=self.client, json_body=UpsertRequest(documents=documents)))
+            if not isinstance(response, UpsertResponse):
+                raise APIError(status_code=422, content=b"", message=f"Upsert rejected: {response.to_dict()}")
+
+        self._with_retries(f"Upsert of {len(documents)} documents", request)
+
+    def _delete_record(self, document_id: str):
+        """Delete every chunk stored for a record"""
+        def request():
+            response = get_parsed_or_raise(delete_delete.sync_detailed(client=self.client, json_body=DeleteRequest(
+                filter_=DocumentMetadataFilter(document_id=document_id))))
+            if not isinstance(response, DeleteResponse):
+                raise APIError(status_code=422, content=b"", message=f"Delete rejected: {response.to_dict()}")
+
+        try:
+            self._with_retries(f"Delete of the chunks of {document_id}", request)
+        except Exception as e:
+            # The new chunks are still sent: they overwrite the old ones with the same ids
+            logger.error(f"Could not delete the previous chunks of {document_id}: {e}")
+
+    def _send(self, documents: List[Document]) -> int:
+        """Send documents, splitting rejected batches; returns the number that failed"""
+        try:
+            self._upsert(documents)
+        except Exception as e:
+            if len(documents) > 1 and not is_retriable(e):
+                middle = len(documents) // 2
+                return self._send(documents[:middle]) + self._send(documents[middle:])
+            logger.error(f"Could not ingest {len(documents)} documents ({documents[0].id}...): {e}")
+            return len(documents)
+        return 0
+
+    def _process(self, batch: _Batch):
+        failed = self._send(batch.documents)
+        with self._lock:
+            self._stats.failed += failed
+            self._stats.documents += len(batch.documents) - failed
+            self._stats.batches += 1
+        self._confirm(batch, succeeded=not failed)
+
+    # Pipeline
+
+    def _documents(self, record: SourceRecord) -> List[Document]:
+        chunks = chunk_text(record.text, self.chunk_tokens)
+        documents = []
+        for position, text in enumerate(chunks):
+            self._stats.chunks += 1
+            if self.dedup:
+                key = _content_key(record.document_id, text)
+                if key in self._seen:
+                    self._stats.duplicates += 1
+                    continue
+                self._seen.add(key)
+            documents.append(Document.from_dict({
+                "id": record.document_id if len(chunks) == 1 else f"{record.document_id}#{position}",
+                "text": text,
+                "metadata": {**record.metadata, "document_id": record.document_id},
+            }))
+
+        fingerprints = getattr(self.client, "fingerprints", None)
+        if fingerprints is None or not documents:
+            return documents
+        if not self.force:
+            changed, unchanged = fingerprints.changed(documents)
+            if not changed:
+                self._stats.unchanged += len(unchanged)
+                return []
+        # Ids the record's chunks had with one chunk, with several, and now
+        known_ids = {record.document_id, f"{record.document_id}#0"} | {document.id for document in documents}
+        if any(document_id in fingerprints for document_id in known_ids):
+            self._delete_record(record.document_id)
+            self._stats.replaced += 1
+        return documents
+
+    def _batches(self, records: Iterable[SourceRecord], start: int) -> Iterator[_Batch]:
+        documents: List[Document] = []
+        chars = 0
+        position = start
+        for position, record in enumerate(records, start=start):
+            with self._lock:
+                self._stats.records += 1
+            for document in self._documents(record):
+                if documents and (len(documents) >= self.max_batch_size or chars + len(document.text) > self.max_batch_chars):
+                    yield self._seal(documents, position)
+                    documents, chars = [], 0
+                documents.append(document)
+                chars += len(document.text)
+            position += 1
+        yield self._seal(documents, position)
+
+    def _seal(self, documents: List[Document], end_position: int) -> _Batch:
+        batch = _Batch(self._next_seq, documents, end_position)
+        self._next_seq += 1
+        return batch
+
+    def run(self, records: Iterable[SourceRecord]) -> IngestStats:
+        """
+        Ingest records, resuming from the checkpoint when there is one.
+
+        Returns:
+            IngestStats: Totals of this run and of the runs it resumes
+        """
+        start = self._load_checkpoint()
+        self._position = start
+        elapsed_before = self._stats.elapsed
+        started = time.monotonic()
+        last_report = last_checkpoint = started
+        in_flight = threading.BoundedSemaphore(2 * self.max_workers)
+
+        def process(batch: _Batch):
+            try:
+                self._process(batch)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="memory-ingest") as executor:
+            for batch in self._batches(itertools.islice(records, start, None), start):
+                in_flight.acquire()
+                if batch.documents:
+                    executor.submit(process, batch)
+                else:
+                    self._confirm(batch)
+                    in_flight.release()
+
+                now = time.monotonic()
+                self._stats.elapsed = elapsed_before + now - started
+                if now - last_checkpoint >= self.checkpoint_interval:
+                    self._save_checkpoint()
+                    last_checkpoint = now
+                if now - last_report >= self.progress_interval:
+                    self.progress(self._stats)
+                    last_report = now
+
+        self._stats.elapsed = elapsed_before + time.monotonic() - started
+        self._save_checkpoint()
+        self.progress(self._stats)
+        return self._stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion of files or chat archives into long-term memory")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--jsonl", action="store_true", help="Inputs are JSON lines files (one record per line)")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--base-url", default=os.getenv("LONG_TERM_MEMORY_URL"))
+    parser.add_argument("--token", default=os.getenv("LONG_TERM_MEMORY_TOKEN"))
+    parser.add_argument("--local", default=None, help="Ingest into an embedded LocalVectorStore in this directory")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.local:
+        from .local_transport import create_local_client
+
+        client = create_local_client(args.local)
+    else:
+        from . import create_client
+
+        if not args.base_url:
+            parser.error("--base-url (or LONG_TERM_MEMORY_URL) is required without --local")
+        client = create_client(args.base_url, args.token)
+
+    if args.jsonl:
+        records = read_jsonl(args.paths, text_field=args.text_field, source=args.source or "chat")
+    else:
+        records = read_files(args.paths, source=args.source or "file")
+    pipeline = IngestPipeline(client, max_batch_size=args.batch_size, max_workers=args.workers,
+                              checkpoint_path=args.checkpoint)
+    logger.info(f"Ingestion finished: {pipeline.run(records)}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
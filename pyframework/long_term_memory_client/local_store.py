@@ -0,0 +1,541 @@
+"""Embedded, in-process vector store with the semantics of the long-term memory service
+
+For tests, local development and small single-tenant deployments. Documents are chunked (see
+chunking.py), embedded and kept as unit-norm rows of a float32 matrix; a query scores chunks by
+cosine similarity, so scores are comparable to the service's. Like the service:
+
+    * upsert replaces every chunk of a document id and returns the document ids (generated when missing)
+    * chunk ids are "<document id>_<n>", and chunk metadata carries the document_id: the
+      document's id, unless its metadata names another one (e.g. the record several documents
+      were split from, see ingest.py)
+    * query filters with DocumentMetadataFilter: equality on every field (including additional
+      properties such as user_id) and an inclusive created_at range for start_date / end_date
+    * delete removes by document ids, by filter or everything
+
+Search is brute force over the matrix, or, with `index="ivf"` and at least `index_min_rows` live
+chunks, an inverted-file approximate index (k-means cells, probing the `nprobe` closest cells).
+Filtered queries that find fewer than top_k chunks in the probed cells fall back to brute force.
+
+With `path`, the matrix is a memory-mapped .npy file and chunk records go to an append-only JSON
+lines log next to it; both are replayed on open. Dead rows are compacted away when they outnumber
+live ones: the compacted vectors and log are written to temporary files, then the vectors file is
+replaced and the log last. A compaction interrupted between the two replacements is completed on
+the next open.
+
+`LocalMemoryTransport` (local_transport.py) puts this store behind the regular Client.
+
+Example:
+    store = LocalVectorStore("/tmp/memory")  # HashingEmbedder by default, no network needed
+    store.upsert([Document(text="Going to Lisbon in May", metadata=DocumentMetadata(source_id="chat-1"))])
+    results = store.query([Query(query="travel plans", top_k=3)])
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .chunking import DEFAULT_CHUNK_TOKENS, chunk_text
+from .models import Document, DocumentChunkMetadata, DocumentChunkWithScore, DocumentMetadataFilter, Query, QueryResult
+from .types import Unset
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+
+_WORD = re.compile(r"\w+")
+_RANGE_KEYS = ("start_date", "end_date")
+
+
+class HashingEmbedder:
+    """
+    Deterministic offline embedder: signed feature hashing of lowercased words and word bigrams.
+
+    Texts sharing words get similar vectors, which is enough for tests and local development.
+    Use an EmbeddingClient for real semantic search.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _feature(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+                column, sign = self._feature(feature)
+                vectors[row, column] += sign
+        return vectors
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _timestamp(value: Any) -> float:
+    """Seconds since the epoch of an ISO date / datetime (or a number), NaN when unparseable"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value:
+        return float("nan")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return float("nan")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _chunk_document(chunk: Dict[str, Any]) -> str:
+    """Id of the document a chunk was stored for (its metadata document_id may differ)"""
+    return chunk["id"].rsplit("_", 1)[0]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index over unit-norm vectors.
+
+    Args:
+        nlist: Number of k-means cells
+        nprobe: Number of closest cells searched per query
+    """
+
+    def __init__(self, nlist: int, nprobe: int = 8, iterations: int = 10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None
+        self.cells: List[List[np.ndarray]] = []
+        self.size = 0
+
+    def build(self, vectors: np.ndarray, rows: np.ndarray):
+        rng = np.random.default_rng(0)
+        nlist = max(1, min(self.nlist, len(rows)))
+        # k-means on a sample, enough to place the centroids
+        sample = vectors[rng.choice(len(rows), min(len(rows), 64 * nlist), replace=False)]
+        centroids = sample[:nlist]
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assignment, minlength=nlist)
+            order = np.argsort(assignment, kind="stable")
+            sums = np.zeros_like(centroids)
+            filled = np.flatnonzero(counts)
+            sums[filled] = np.add.reduceat(sample[order], np.r_[0, np.cumsum(counts)[:-1]][filled])
+            # Empty cells keep their centroid
+            centroids = np.where(counts[:, None] > 0, _normalize(sums), centroids)
+        self.centroids = centroids
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.cells = [[rows[order[bounds[cell]:bounds[cell + 1]]]] for cell in range(nlist)]
+        self.size = len(rows)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for cell in np.unique(assignment).tolist():
+            self.cells[cell].append(rows[assignment == cell])
+        self.size += len(rows)
+
+    def candidates(self, vector: np.ndarray) -> np.ndarray:
+        closeness = self.centroids @ vector
+        probe = np.argpartition(-closeness, min(self.nprobe, len(closeness)) - 1)[:self.nprobe]
+        return np.concatenate([rows for cell in probe.tolist() for rows in self.cells[cell]])
+
+
+class LocalVectorStore:
+    """
+    In-process vector store answering the long-term memory upsert / query / delete operations.
+
+    Args:
+        path: Directory persisting the store (memory only when omitted)
+        embedder: Object with an `embed(texts) -> np.ndarray` method (e.g. an EmbeddingClient);
+            defaults to a HashingEmbedder
+        chunk_tokens: Maximum tokens per chunk
+        index: None for brute force search, "ivf" for the approximate index
+        index_min_rows: Live chunks needed before the approximate index is used
+        nlist: Number of IVF cells (2 * sqrt(chunks) by default)
+        nprobe: Number of IVF cells searched per query
+    """
+
+    def __init__(self, path: Optional[str] = None, embedder=None, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                 index: Optional[str] = None, index_min_rows: int = 10_000, nlist: Optional[int] = None,
+                 nprobe: int = 8):
+        if index not in (None, "ivf"):
+            raise ValueError(f"Unknown index {index!r}")
+        self.path = path
+        self.embedder = embedder if embedder is not None else HashingEmbedder()
+        self.chunk_tokens = chunk_tokens
+        self.index = index
+        self.index_min_rows = index_min_rows
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.ndarray] = None
+        self._count = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._created = np.zeros(0, dtype=np.float64)
+        self._chunks: List[Optional[Dict[str, Any]]] = []
+        self._documents: Dict[str, List[int]] = {}
+        self._postings: Dict[Tuple[str, str], Set[int]] = {}
+        self._ivf: Optional[IVFIndex] = None
+        self._log = None
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._open()
+
+    # Storage
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, VECTORS_FILE)
+
+    def _allocate(self, capacity: int, dim: int) -> np.ndarray:
+        if not self.path:
+            return np.zeros((capacity, dim), dtype=np.float32)
+        tmp_path = f"{self._vectors_path()}.tmp"
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if self._count:
+            vectors[:self._count] = self._vectors[:self._count]
+        vectors.flush()
+        del vectors
+        os.replace(tmp_path, self._vectors_path())
+        return np.lib.format.open_memmap(self._vectors_path(), mode="r+")
+
+    def _reserve(self, rows: int, dim: int):
+        if self._vectors is None:
+            self._vectors = self._allocate(max(1024, rows), dim)
+        elif self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store ({self._vectors.shape[1]})")
+        elif self._count + rows > len(self._vectors):
+            self._vectors = self._allocate(max(2 * len(self._vectors), self._count + rows), dim)
+        capacity = len(self._vectors)
+        if len(self._alive) < capacity:
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+            self._created = np.concatenate([self._created, np.full(capacity - len(self._created), np.nan)])
+
+    def _recover(self, log_path: str):
+        """Finish or discard a compaction interrupted by a crash"""
+        vectors_tmp, log_tmp = f"{self._vectors_path()}.tmp", f"{log_path}.tmp"
+        if os.path.exists(log_tmp):
+            if os.path.exists(vectors_tmp):
+                # The compacted vectors were never committed: the old files are still consistent
+                os.remove(log_tmp)
+            else:
+                logger.warning(f"Completing an interrupted compaction of {self.path}")
+                os.replace(log_tmp, log_path)
+        if os.path.exists(vectors_tmp):
+            os.remove(vectors_tmp)
+
+    def _open(self):
+        log_path = os.path.join(self.path, CHUNKS_FILE)
+        self._recover(log_path)
+        if os.path.exists(self._vectors_path()):
+            self._vectors = np.lib.format.open_memmap(self._vectors_path(), mode="r+")
+            capacity = len(self._vectors)
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._created = np.full(capacity, np.nan)
+
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A partially written last line: the write it belongs to never completed
+                        logger.warning(f"Skipping corrupt record in {log_path}")
+                        continue
+                    if "delete" in record:
+                        for row in record["delete"]:
+                            self._remove(row)
+                    else:
+                        self._add(record.pop("row"), record)
+        self._log = open(log_path, "ab")
+
+    def _check_writable(self):
+        # A persisted store never falls back to memory only: changes would silently be lost on reopen
+        if self.path and self._log is None:
+            raise RuntimeError(f"LocalVectorStore at {self.path} is closed")
+
+    def _append(self, records: List[Dict[str, Any]]):
+        if not self.path:
+            return
+        self._check_writable()
+        self._log.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+        self._log.flush()
+
+    def flush(self):
+        """Persist the vectors and the chunk log to disk"""
+        with self._lock:
+            if self._log is None:
+                return
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._log is None:
+                return
+            self.flush()
+            self._log.close()
+            self._log = None
+
+    def __enter__(self) -> "LocalVectorStore":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        """Number of live chunks"""
+        return int(self._alive[:self._count].sum())
+
+    # Bookkeeping
+
+    def _add(self, row: int, chunk: Dict[str, Any]):
+        self._count = max(self._count, row + 1)
+        while len(self._chunks) < self._count:
+            self._chunks.append(None)
+        self._chunks[row] = chunk
+        self._alive[row] = True
+        metadata = chunk["metadata"]
+        self._created[row] = _timestamp(metadata.get("created_at"))
+        self._documents.setdefault(_chunk_document(chunk), []).append(row)
+        for key, value in metadata.items():
+            if value is not None:
+                self._postings.setdefault((key, str(value)), set()).add(row)
+
+    def _remove(self, row: int):
+        chunk = self._chunks[row]
+        if chunk is None:
+            return
+        self._chunks[row] = None
+        self._alive[row] = False
+        metadata = chunk["metadata"]
+        document_id = _chunk_document(chunk)
+        rows = self._documents.get(document_id)
+        if rows is not None:
+            rows.remove(row)
+            if not rows:
+                del self._documents[document_id]
+        for key, value in metadata.items():
+            if value is not None:
+                self._postings[(key, str(value))].discard(row)
+
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        for row in rows:
+            self._remove(row)
+        self._append([{"delete": rows}])
+
+    def compact(self):
+        """Rewrite the store without deleted rows"""
+        with self._lock:
+            self._check_writable()
+            alive = np.flatnonzero(self._alive[:self._count])
+            chunks = [self._chunks[row] for row in alive.tolist()]
+            if self.path:
+                self._write_compacted(alive, chunks)
+            elif self._vectors is not None:
+                self._vectors[:len(alive)] = self._vectors[alive]
+
+            self._count = 0
+            self._chunks, self._documents, self._postings, self._ivf = [], {}, {}, None
+            self._alive[:] = False
+            self._created[:] = np.nan
+            for row, chunk in enumerate(chunks):
+                self._add(row, chunk)
+
+    def _write_compacted(self, alive: np.ndarray, chunks: List[Dict[str, Any]]):
+        """Replace the files of the store with their compacted version, never editing them in place"""
+        self.flush()
+        vectors_path, log_path = self._vectors_path(), os.path.join(self.path, CHUNKS_FILE)
+        # Written in this order so that _recover can tell how far an interrupted compaction got
+        if self._vectors is not None:
+            vectors = np.lib.format.open_memmap(f"{vectors_path}.tmp", mode="w+", dtype=np.float32,
+                                                shape=self._vectors.shape)
+            vectors[:len(alive)] = self._vectors[alive]
+            vectors.flush()
+            del vectors
+        with open(f"{log_path}.tmp", "wb") as f:
+            f.write(b"".join(json.dumps({"row": row, **chunk}).encode("utf-8") + b"\n"
+                             for row, chunk in enumerate(chunks)))
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Until the vectors are replaced the old files stay consistent and the old log in use
+        if self._vectors is not None:
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+        try:
+            os.replace(f"{log_path}.tmp", log_path)
+            log = open(log_path, "ab")
+        except BaseException:
+            # The compacted vectors are on disk but not their log: only _recover, on the next open,
+            # can finish the compaction, so the store refuses further changes
+            self._log.close()
+            self._log = None
+            raise
+        self._log.close()
+        self._log = log
+        if self._vectors is not None:
+            self._vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+
+    def _maybe_compact(self):
+        dead = self._count - len(self)
+        if dead > max(1024, self._count - dead):
+            self.compact()
+
+    # Operations
+
+    def upsert(self, documents: Sequence[Document]) -> List[str]:
+        """
+        Chunk, embed and store documents, replacing the chunks of documents with the same id.
+
+        Returns:
+            The document ids, in input order
+        """
+        ids: List[str] = []
+        chunks: List[Dict[str, Any]] = []
+        for document in documents:
+            document_id = document.id if not isinstance(document.id, Unset) and document.id else str(uuid.uuid4())
+            ids.append(document_id)
+            metadata = document.metadata.to_dict() if not isinstance(document.metadata, Unset) else {}
+            metadata.setdefault("document_id", document_id)
+            for position, text in enumerate(chunk_text(document.text, self.chunk_tokens)):
+                chunks.append({"id": f"{document_id}_{position}", "text": text, "metadata": metadata})
+
+        vectors = _normalize(self.embedder.embed([chunk["text"] for chunk in chunks])) if chunks else None
+        with self._lock:
+            self._check_writable()
+            replaced = [row for document_id in dict.fromkeys(ids) for row in self._documents.get(document_id, ())]
+            self._delete_rows(list(replaced))
+            if chunks:
+                self._reserve(len(chunks), vectors.shape[1])
+                start = self._count
+                self._vectors[start:start + len(chunks)] = vectors
+                if isinstance(self._vectors, np.memmap):
+                    # Vectors reach the disk before the log records pointing at them
+                    self._vectors.flush()
+                for offset, chunk in enumerate(chunks):
+                    self._add(start + offset, chunk)
+                self._append([{"row": start + offset, **chunk} for offset, chunk in enumerate(chunks)])
+                if self._ivf is not None:
+                    self._ivf.add(vectors, np.arange(start, start + len(chunks)))
+            self._maybe_compact()
+        return ids
+
+    def _filter_rows(self, filter_: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Mask of the rows matching a filter, None when the filter matches every live row"""
+        mask = None
+        for key, value in filter_.items():
+            if key in _RANGE_KEYS or value is None:
+                continue
+            rows = self._postings.get((key, str(value)), ())
+            key_mask = np.zeros(self._count, dtype=bool)
+            key_mask[list(rows)] = True
+            mask = key_mask if mask is None else mask & key_mask
+
+        start, end = _timestamp(filter_.get("start_date")), _timestamp(filter_.get("end_date"))
+        if not np.isnan(start) or not np.isnan(end):
+            created = self._created[:self._count]
+            with np.errstate(invalid="ignore"):
+                range_mask = (created >= start if not np.isnan(start) else True) & \
+                             (created <= end if not np.isnan(end) else True)
+            mask = range_mask if mask is None else mask & range_mask
+        return mask
+
+    def _use_index(self, live: int) -> bool:
+        if self.index != "ivf" or live < self.index_min_rows:
+            return False
+        if self._ivf is None or live > 2 * self._ivf.size:
+            rows = np.flatnonzero(self._alive[:self._count])
+            self._ivf = IVFIndex(self.nlist or int(2 * np.sqrt(live)), self.nprobe)
+            self._ivf.build(np.asarray(self._vectors[rows]), rows)
+        return True
+
+    def _search(self, vector: np.ndarray, top_k: int, mask: Optional[np.ndarray], use_index: bool) -> Tuple[np.ndarray, np.ndarray]:
+        alive = self._alive[:self._count]
+        mask = alive if mask is None else mask & alive
+        rows = None
+        if use_index:
+            candidates = self._ivf.candidates(vector)
+            candidates = candidates[mask[candidates]]
+            if len(candidates) >= top_k:
+                rows = candidates
+        if rows is None:
+            rows = np.flatnonzero(mask)
+        if not len(rows):
+            return rows, np.empty(0, dtype=np.float32)
+
+        scores = self._vectors[rows] @ vector if len(rows) < self._count else (self._vectors[:self._count] @ vector)[rows]
+        if top_k < len(rows):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return rows[best], scores[best]
+
+    def query(self, queries: Sequence[Query], include_embeddings: bool = True) -> List[QueryResult]:
+        """
+        Run queries.
+
+        Returns:
+            One QueryResult per query, chunks best first
+        """
+        if not queries:
+            return []
+        vectors = _normalize(self.embedder.embed([query.query for query in queries]))
+        results = []
+        with self._lock:
+            use_index = self._vectors is not None and self._use_index(len(self))
+            for query, vector in zip(queries, vectors):
+                top_k = query.top_k if not isinstance(query.top_k, Unset) else 3
+                if self._vectors is None or top_k <= 0:
+                    results.append(QueryResult(query=query.query, results=[]))
+                    continue
+                filter_ = query.filter_.to_dict() if not isinstance(query.filter_, Unset) else {}
+                rows, scores = self._search(vector, top_k, self._filter_rows(filter_), use_index)
+                chunks = []
+                for row, score in zip(rows.tolist(), scores.tolist()):
+                    chunk = self._chunks[row]
+                    result = DocumentChunkWithScore(text=chunk["text"], score=score, id=chunk["id"],
+                                                    metadata=DocumentChunkMetadata.from_dict(chunk["metadata"]))
+                    if include_embeddings:
+                        result.embedding = self._vectors[row].tolist()
+                    chunks.append(result)
+                results.append(QueryResult(query=query.query, results=chunks))
+        return results
+
+    def delete(self, ids: Optional[Sequence[str]] = None, filter_: Optional[DocumentMetadataFilter] = None,
+               delete_all: bool = False) -> bool:
+        """Delete every chunk, the chunks of the given document ids and / or the chunks matching a filter"""
+        with self._lock:
+            self._check_writable()
+            if delete_all:
+                rows = np.flatnonzero(self._alive[:self._count]).tolist()
+            else:
+                rows = [row for document_id in (ids or ()) for row in self._documents.get(document_id, ())]
+                if filter_ is not None and filter_.to_dict():
+                    mask = self._filter_rows(filter_.to_dict())
+                    if mask is not None:
+                        rows += np.flatnonzero(mask & self._alive[:self._count]).tolist()
+            self._delete_rows(sorted(set(rows)))
+            self._maybe_compact()
+        return True
@@ -0,0 +1,107 @@
+"""httpx transport serving the long-term memory API from a LocalVectorStore
+
+Plugs the embedded store in behind the regular Client, so every operation, batcher, writer and
+cache of this package works unchanged against it (and can be benchmarked without a server):
+
+    client = create_local_client("/tmp/memory")
+    upsert_information(client, None, "Going to Lisbon in May", "chat-1", "2024-05-01", "user")
+    query_long_term_top_results(client, "travel plans", source_id="chat-1")
+
+Routes: POST /query, POST /upsert and DELETE /delete. Request bodies that don't match the API
+models are answered with a 422 HTTPValidationError, like the service does. Compressed request
+bodies (Client.request_compression) are decoded; unsupported encodings get a 415.
+"""
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import create_client
+from .client import AuthenticatedClient
+from .local_store import LocalVectorStore
+from .models import DeleteRequest, QueryRequest, UpsertRequest
+from .request_body import decode_body
+from .types import Unset
+
+logger = logging.getLogger(__name__)
+
+LOCAL_BASE_URL = "http://local-memory"
+
+
+def _json_response(status_code: int, content: Dict[str, Any]) -> httpx.Response:
+    return httpx.Response(status_code, content=json.dumps(content).encode("utf-8"),
+                          headers={"content-type": "application/json"})
+
+
+def _validation_error(error: Exception) -> httpx.Response:
+    return _json_response(422, {"detail": [{"loc": ["body"], "msg": str(error), "type": type(error).__name__}]})
+
+
+class LocalMemoryTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Transport answering long-term memory requests from a LocalVectorStore.
+
+    Pass it to a Client with `httpx_args={"transport": LocalMemoryTransport(store)}`; it serves
+    both the sync and the async httpx clients.
+    """
+
+    def __init__(self, store: LocalVectorStore):
+        self.store = store
+
+    def _handle(self, method: str, path: str, content: bytes, encoding: Optional[str] = None) -> httpx.Response:
+        route = (method, path.rstrip("/").rsplit("/", 1)[-1])
+        if route not in (("POST", "query"), ("POST", "upsert"), ("DELETE", "delete")):
+            return _json_response(404, {"detail": "Not Found"})
+        try:
+            content = decode_body(content, encoding)
+        except (ValueError, zlib.error) as e:
+            logger.info(f"Undecodable {method} {path} request body: {e}")
+            return _json_response(415, {"detail": str(e)})
+
+        try:
+            body = json.loads(content or b"{}")
+            if route[1] == "query":
+                request = QueryRequest.from_dict(body)
+                include_embeddings = request.include_embeddings if not isinstance(request.include_embeddings, Unset) else True
+                results = self.store.query(request.queries, include_embeddings)
+                return _json_response(200, {"results": [result.to_dict() for result in results]})
+            if route[1] == "upsert":
+                return _json_response(200, {"ids": self.store.upsert(UpsertRequest.from_dict(body).documents)})
+
+            request = DeleteRequest.from_dict(body)
+            success = self.store.delete(
+                ids=request.ids if not isinstance(request.ids, Unset) else None,
+                filter_=request.filter_ if not isinstance(request.filter_, Unset) else None,
+                delete_all=bool(request.delete_all),
+            )
+            return _json_response(200, {"success": success})
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.info(f"Invalid {method} {path} request: {e}")
+            return _validation_error(e)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._handle(request.method, request.url.path, request.read(),
+                            request.headers.get("content-encoding"))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        content = await request.aread()
+        return await asyncio.to_thread(self._handle, request.method, request.url.path, content,
+                                       request.headers.get("content-encoding"))
+
+
+def create_local_client(path: Optional[str] = None, store: Optional[LocalVectorStore] = None,
+                        **kwargs) -> AuthenticatedClient:
+    """
+    Create a Client backed by an embedded LocalVectorStore.
+
+    Args:
+        path: Directory persisting the store (memory only when omitted); ignored when store is given
+        store: An existing store to serve
+        **kwargs: Passed to create_client (query_cache, query_embeddings, ...)
+    """
+    store = store if store is not None else LocalVectorStore(path)
+    httpx_args = {**kwargs.pop("httpx_args", {}), "transport": LocalMemoryTransport(store)}
+    return create_client(LOCAL_BASE_URL, "local", httpx_args=httpx_args, **kwargs)
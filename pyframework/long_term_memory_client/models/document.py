@@ -11,7 +11,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="Document")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class Document:
     """
     Attributes:
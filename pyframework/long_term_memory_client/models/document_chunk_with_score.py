@@ -11,7 +11,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="DocumentChunkWithScore")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class DocumentChunkWithScore:
     """
     Attributes:
@@ -37,7 +37,7 @@ class DocumentChunkWithScore:
         id = self.id
         embedding: Union[Unset, List[float]] = UNSET
         if not isinstance(self.embedding, Unset):
-            embedding = self.embedding
+            embedding = self.embedding.tolist() if hasattr(self.embedding, "tolist") else self.embedding
 
         field_dict: Dict[str, Any] = {}
         field_dict.update(self.additional_properties)
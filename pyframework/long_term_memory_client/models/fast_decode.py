@@ -0,0 +1,187 @@
+"""Fast decode path for /query responses
+
+Builds the slotted response models straight from parsed JSON: instances are allocated without
+running __init__, known keys are read with dict.get instead of copying each source dict and
+popping keys one by one, and an additional_properties dict is only filled when the payload has
+unknown keys. `decode_query_response_json` parses raw bytes with orjson when it is installed.
+
+Chunk embeddings are decoded according to `embeddings`:
+    * "list": a list of floats, as `from_dict` does
+    * "drop": left UNSET. The vectors are cut out of the raw bytes before parsing, so they are
+      never turned into Python floats.
+    * "float32": a LazyEmbedding keeping the raw JSON of the vector, parsed into a read-only
+      float32 NumPy array on first use
+
+With "list", the result is equal to `QueryResponse.from_dict(json.loads(content))`.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from ..types import UNSET
+from .document_chunk_metadata import DocumentChunkMetadata
+from .document_chunk_with_score import DocumentChunkWithScore
+from .query_response import QueryResponse
+from .query_result import QueryResult
+from .source import Source
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    loads = json.loads
+
+EmbeddingMode = Literal["list", "drop", "float32"]
+
+_EMBEDDING = re.compile(rb'"embedding"\s*:\s*(\[[^\]]*\])')
+
+_new = object.__new__
+_SOURCES = {source.value: source for source in Source}
+
+_METADATA_KEYS = frozenset(("source", "source_id", "url", "created_at", "author", "document_id", "doc_type", "reference"))
+_CHUNK_KEYS = frozenset(("text", "metadata", "score", "id", "embedding"))
+_RESULT_KEYS = frozenset(("query", "results"))
+_RESPONSE_KEYS = frozenset(("results",))
+
+
+def _extra(d: Dict[str, Any], known: frozenset) -> Dict[str, Any]:
+    if d.keys() <= known:
+        return {}
+    return {key: value for key, value in d.items() if key not in known}
+
+
+class LazyEmbedding:
+    """Embedding kept as its raw JSON array until it is used"""
+
+    __slots__ = ("_raw", "_array")
+
+    def __init__(self, raw: bytes):
+        self._raw = raw
+        self._array = None
+
+    @property
+    def array(self):
+        """The vector as a read-only float32 NumPy array"""
+        if self._array is None:
+            import numpy as np
+
+            array = np.asarray(loads(self._raw), dtype=np.float32)
+            array.setflags(write=False)
+            self._array, self._raw = array, None
+        return self._array
+
+    def __array__(self, dtype=None, copy=None):
+        return self.array if dtype is None else self.array.astype(dtype)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def tolist(self) -> List[float]:
+        return self.array.tolist()
+
+
+def decode_document_chunk_metadata(d: Dict[str, Any]) -> DocumentChunkMetadata:
+    get = d.get
+    metadata = _new(DocumentChunkMetadata)
+    source = get("source", UNSET)
+    metadata.source = source if source is UNSET else (_SOURCES.get(source) or Source(source))
+    metadata.source_id = get("source_id", UNSET)
+    metadata.url = get("url", UNSET)
+    metadata.created_at = get("created_at", UNSET)
+    metadata.author = get("author", UNSET)
+    metadata.document_id = get("document_id", UNSET)
+    metadata.doc_type = get("doc_type", UNSET)
+    metadata.reference = get("reference", UNSET)
+    metadata.additional_properties = _extra(d, _METADATA_KEYS)
+    return metadata
+
+
+def decode_document_chunk_with_score(d: Dict[str, Any],
+                                     embedding: Optional[Callable[[Any], Any]] = None) -> DocumentChunkWithScore:
+    """
+    Args:
+        d: The parsed chunk
+        embedding: Converts the parsed embedding value (None keeps it as parsed)
+    """
+    get = d.get
+    chunk = _new(DocumentChunkWithScore)
+    chunk.text = d["text"]
+    chunk.metadata = decode_document_chunk_metadata(d["metadata"])
+    chunk.score = d["score"]
+    chunk.id = get("id", UNSET)
+    chunk.embedding = get("embedding", UNSET) if embedding is None else embedding(get("embedding", UNSET))
+    chunk.additional_properties = _extra(d, _CHUNK_KEYS)
+    return chunk
+
+
+def decode_query_result(d: Dict[str, Any], embedding: Optional[Callable[[Any], Any]] = None) -> QueryResult:
+    result = _new(QueryResult)
+    result.query = d["query"]
+    result.results = [decode_document_chunk_with_score(chunk, embedding) for chunk in d["results"]]
+    result.additional_properties = _extra(d, _RESULT_KEYS)
+    return result
+
+
+def decode_query_response(d: Dict[str, Any], embedding: Optional[Callable[[Any], Any]] = None) -> QueryResponse:
+    response = _new(QueryResponse)
+    if "detail" in d:
+        # Error payloads carry no results, same as QueryResponse.from_dict
+        response.results = []
+        response.additional_properties = dict(d)
+        return response
+    response.results = [decode_query_result(result, embedding) for result in d["results"]]
+    response.additional_properties = _extra(d, _RESPONSE_KEYS)
+    return response
+
+
+def decode_query_response_json(content: bytes, embeddings: EmbeddingMode = "list") -> QueryResponse:
+    """Decode a raw /query response body"""
+    if embeddings == "list" or b'"embedding"' not in content:
+        return decode_query_response(loads(content))
+
+    raw_vectors: List[bytes] = []
+
+    def placeholder(match) -> bytes:
+        # Chunk embeddings are arrays, so an integer can only be one of these placeholders
+        raw_vectors.append(match.group(1))
+        return b'"embedding":%d' % (len(raw_vectors) - 1)
+
+    used = 0
+
+    def convert(value):
+        nonlocal used
+        if type(value) is int:
+            used += 1
+            value = raw_vectors[value]
+        elif isinstance(value, list):
+            value = json.dumps(value).encode("utf-8")
+        if embeddings == "drop":
+            return UNSET
+        return LazyEmbedding(value) if isinstance(value, bytes) else value
+
+    response = decode_query_response(loads(_EMBEDDING.sub(placeholder, content)), convert)
+    if used != len(raw_vectors):
+        # An "embedding" array outside the chunks was replaced too: decode the original payload
+        response = decode_query_response(loads(content), convert)
+    return response
+
+
+__all__: List[str] = [
+    "decode_document_chunk_metadata",
+    "decode_document_chunk_with_score",
+    "decode_query_result",
+    "decode_query_response",
+    "decode_query_response_json",
+    "EmbeddingMode",
+    "LazyEmbedding",
+]
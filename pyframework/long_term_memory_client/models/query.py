@@ -11,7 +11,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="Query")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class Query:
     """
     Attributes:
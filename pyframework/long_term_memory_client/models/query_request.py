@@ -1,7 +1,9 @@
-from typing import TYPE_CHECKING, Any, Dict, List, Type, TypeVar
+from typing import TYPE_CHECKING, Any, Dict, List, Type, TypeVar, Union
 
 import attr
 
+from ..types import UNSET, Unset
+
 if TYPE_CHECKING:
     from ..models.query import Query
 
@@ -9,14 +11,16 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="QueryRequest")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class QueryRequest:
     """
     Attributes:
         queries (List['Query']):
+        include_embeddings (Union[Unset, bool]): Whether result chunks carry their embedding.
     """
 
     queries: List["Query"]
+    include_embeddings: Union[Unset, bool] = UNSET
     additional_properties: Dict[str, Any] = attr.ib(init=False, factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
@@ -33,6 +37,8 @@ class QueryRequest:
                 "queries": queries,
             }
         )
+        if self.include_embeddings is not UNSET:
+            field_dict["include_embeddings"] = self.include_embeddings
 
         return field_dict
 
@@ -48,8 +54,11 @@ class QueryRequest:
 
             queries.append(queries_item)
 
+        include_embeddings = d.pop("include_embeddings", UNSET)
+
         query_request = cls(
             queries=queries,
+            include_embeddings=include_embeddings,
         )
 
         query_request.additional_properties = d
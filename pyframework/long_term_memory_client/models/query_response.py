@@ -11,7 +11,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="QueryResponse")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class QueryResponse:
     """
     Attributes:
@@ -116,17 +116,7 @@ def create_json_payload_from_results(results: List[DocumentChunkWithScore]):
 
 
 def get_top_results_above_threshold(query_response: QueryResponse, threshold: float, n: 100) -> List[DocumentChunkWithScore]:
-    # Combine all results from all queries
-    combined_results = [result for query_result in query_response.results for result in query_result.results]
+    # Threshold filter and partial top-n selection on the score array, best first
+    from ..postprocess import select_results
 
-    # Filter results with scores above the threshold
-    filtered_results = [result for result in combined_results if result.score > threshold]
-
-    # Sort the filtered results by score (in descending order)
-    sorted_results = sorted(filtered_results, key=lambda result: result.score, reverse=True)
-    # sorted_results = sorted(filtered_results, key=lambda result: result.id)
-
-    # Get the top N results
-    top_results = sorted_results[:n]
-
-    return top_results
+    return select_results(query_response, threshold, n, dedup=False).chunks
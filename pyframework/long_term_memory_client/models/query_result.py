@@ -9,7 +9,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="QueryResult")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class QueryResult:
     """
     Attributes:
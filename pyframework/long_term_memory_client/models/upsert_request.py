@@ -9,7 +9,7 @@ if TYPE_CHECKING:
 T = TypeVar("T", bound="UpsertRequest")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class UpsertRequest:
     """
     Attributes:
@@ -5,7 +5,7 @@ import attr
 T = TypeVar("T", bound="UpsertResponse")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class UpsertResponse:
     """
     Attributes:
@@ -5,7 +5,7 @@ import attr
 T = TypeVar("T", bound="ValidationError")
 
 
-@attr.s(auto_attribs=True)
+@attr.s(auto_attribs=True, slots=True)
 class ValidationError:
     """
     Attributes:
@@ -1,9 +1,25 @@
-from typing import Optional
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
 
-from pyframework.long_term_memory_client.api.default.query_post import query_long_term_memory
+from pyframework.long_term_memory_client.api.default import upsert_post
+from pyframework.long_term_memory_client.api.default.query_post import aquery_long_term_memory, query_long_term_memory
 from pyframework.long_term_memory_client.api.default.upsert_post import sync
-from pyframework.long_term_memory_client.models import UpsertRequest
+from pyframework.long_term_memory_client.fingerprint import unchanged_response
+from pyframework.long_term_memory_client.models import Document, QueryResponse, QueryResult, UpsertRequest
 from pyframework.long_term_memory_client.models.query_response import get_top_results_above_threshold
+from pyframework.long_term_memory_client.postprocess import Fusion, Selection, select_results
+from pyframework.long_term_memory_client.spool import MemorySpool
+from pyframework.long_term_memory_client.writer import UpsertWriter
+
+logger = logging.getLogger(__name__)
+
+QUERY_SOURCES_MAX_WORKERS = 8
+
+# Shared by every query_sources call, so concurrent calls can't start an unbounded number of threads
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_SOURCES_MAX_WORKERS, thread_name_prefix="memory-query")
 
 
 def query_information(
@@ -23,18 +39,26 @@ def query_information(
         return get_top_results_above_threshold(query_response, threshold, 100)
 
 
-def upsert_information(client,
-        document_id,
-        text,
-        source_id,
-        created_at,
-        author,
-        source="chat",
-        url=None,
-        doc_type=None,
-        reference=None
+async def aquery_information(
+    client,
+    query: str, user_id=None,  document_id=None, source_id=None, source=None, k=10,
+    threshold: Optional[float] = None,
 ):
+    """Async version of query_information"""
+    query_response = await aquery_long_term_memory(client=client,
+                                                   user_id=user_id,
+                                                   query=query,
+                                                   document_id=document_id,
+                                                   source_id=source_id,
+                                                   source=source, k=k)
+    if threshold is None:
+        return query_response
+    else:
+        return get_top_results_above_threshold(query_response, threshold, 100)
+
 
+def build_document(document_id, text, source_id, created_at, author, source="chat", url=None, doc_type=None,
+                   reference=None) -> Document:
     document = {
         "text": text,
         "metadata": {
@@ -58,7 +82,124 @@ def upsert_information(client,
     if reference is not None:
         document["metadata"]["reference"] = reference
 
-    upsert_payload = {"documents": [document]}
+    return Document.from_dict(document)
+
 
-    upsert_request = UpsertRequest.from_dict(upsert_payload)
+def upsert_information(client,
+        document_id,
+        text,
+        source_id,
+        created_at,
+        author,
+        source="chat",
+        url=None,
+        doc_type=None,
+        reference=None,
+        force=False
+):
+    """Upsert one document. With a FingerprintIndex on the client, an unchanged document is not sent again unless force is set."""
+    document = build_document(document_id, text, source_id, created_at, author, source, url, doc_type, reference)
+    upsert_request = UpsertRequest(documents=[document])
+    skipped = None if force else unchanged_response(client, upsert_request)
+    if skipped is not None:
+        return skipped
     return sync(client=client, json_body=upsert_request)
+
+
+async def aupsert_information(client,
+        document_id,
+        text,
+        source_id,
+        created_at,
+        author,
+        source="chat",
+        url=None,
+        doc_type=None,
+        reference=None,
+        force=False
+):
+    """Async version of upsert_information"""
+    document = build_document(document_id, text, source_id, created_at, author, source, url, doc_type, reference)
+    upsert_request = UpsertRequest(documents=[document])
+    skipped = None if force else unchanged_response(client, upsert_request)
+    if skipped is not None:
+        return skipped
+    return await upsert_post.asyncio(client=client, json_body=upsert_request)
+
+
+def queue_information(writer: UpsertWriter,
+        document_id,
+        text,
+        source_id,
+        created_at,
+        author,
+        source="chat",
+        url=None,
+        doc_type=None,
+        reference=None
+) -> Future:
+    """Same as upsert_information, but queued on a background UpsertWriter. The future resolves to the document id."""
+    document = build_document(document_id, text, source_id, created_at, author, source, url, doc_type, reference)
+    return writer.submit(document)
+
+
+def spool_information(spool: MemorySpool,
+        document_id,
+        text,
+        source_id,
+        created_at,
+        author,
+        source="chat",
+        url=None,
+        doc_type=None,
+        reference=None
+) -> Future:
+    """Same as upsert_information, but written to a durable MemorySpool. The future resolves once the upsert is on disk."""
+    document = build_document(document_id, text, source_id, created_at, author, source, url, doc_type, reference)
+    return spool.upsert(document)
+
+
+def _merge_sources(query: str, filters: Sequence[Dict[str, Any]], responses: Sequence[Any]) -> List[QueryResult]:
+    results = []
+    for filter_, response in zip(filters, responses):
+        if isinstance(response, QueryResponse):
+            results.extend(response.results)
+        else:
+            logger.warning(f"Query {query!r} with {filter_} failed: {response.to_dict()}")
+    return results
+
+
+def query_sources(client, query: str, filters: Sequence[Dict[str, Any]], k=10, threshold: Optional[float] = None,
+                  n: Optional[int] = None, dedup=True, fusion: Fusion = "max") -> Selection:
+    """
+    Run a query with several filter combinations concurrently and merge the results into one top-n.
+
+    Args:
+        client: The API client
+        query: The query text
+        filters: query_long_term_memory filter arguments per combination, e.g.
+            [{"source": "chat"}, {"source": "email"}, {"source": "file"}] or
+            [{"user_id": user_id}, {"document_id": shared_document_id}]
+        k: Results per combination
+        threshold: Keep only chunks scoring above this score
+        n: Size of the merged result (k by default)
+        dedup: Keep one chunk per document
+        fusion: How scores of a document found by several combinations are merged ("max" or "rrf")
+
+    Returns:
+        Selection: The merged chunks, best first (see postprocess.select_results)
+    """
+    if not filters:
+        return select_results([], threshold, n or k, dedup=dedup, fusion=fusion)
+    # Each query runs in a copy of the caller's context, so it sees the request deadline and trace ids
+    futures = [_query_executor.submit(contextvars.copy_context().run, query_long_term_memory, client, query, k=k, **filter_)
+               for filter_ in filters]
+    responses = [future.result() for future in futures]
+    return select_results(_merge_sources(query, filters, responses), threshold, n or k, dedup=dedup, fusion=fusion)
+
+
+async def aquery_sources(client, query: str, filters: Sequence[Dict[str, Any]], k=10, threshold: Optional[float] = None,
+                         n: Optional[int] = None, dedup=True, fusion: Fusion = "max") -> Selection:
+    """Async version of query_sources; the combinations are queried concurrently on the event loop"""
+    responses = await asyncio.gather(*(aquery_long_term_memory(client, query, k=k, **filter_) for filter_ in filters))
+    return select_results(_merge_sources(query, filters, responses), threshold, n or k, dedup=dedup, fusion=fusion)
@@ -0,0 +1,164 @@
+"""Vectorized post-processing of /query results
+
+`select_results` flattens every QueryResult of a response into NumPy arrays once, then does the
+threshold filter, cross-query fusion, per-document dedup and partial top-k selection on those
+arrays. The returned Selection renders both output formats used by callers (the JSON payload of
+`create_json_payload_from_results` and the text of `concatenate_query_response_texts`) without
+sorting again.
+
+Fusion:
+    * "max": a document scores the best score of any of its chunks in any query
+    * "rrf": reciprocal-rank fusion, sum over queries of 1 / (rrf_k + rank), with the rank of
+      the document's chunk within that query's results (1 = best)
+
+Example:
+    selection = select_results(query_response, threshold=0.3, n=10, fusion="rrf")
+    payload = selection.payload()
+"""
+from typing import List, Literal, Optional, Sequence, Union
+
+import numpy as np
+
+from .models import DocumentChunkWithScore, QueryResponse, QueryResult
+from .types import Unset
+
+Fusion = Literal["max", "rrf"]
+
+
+def _document_key(chunk: DocumentChunkWithScore):
+    document_id = chunk.metadata.document_id
+    if isinstance(document_id, Unset):
+        return chunk.id if not isinstance(chunk.id, Unset) else id(chunk)
+    return document_id
+
+
+class Selection:
+    """Chunks selected by select_results, best first, with the score used to rank them"""
+
+    __slots__ = ("chunks", "scores")
+
+    def __init__(self, chunks: List[DocumentChunkWithScore], scores: np.ndarray):
+        self.chunks = chunks
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def payload(self) -> List[dict]:
+        """Same format as create_json_payload_from_results, with `score` set to the ranking score"""
+        return [
+            {
+                'document_id': chunk.metadata.document_id,
+                'text': chunk.text,
+                'created_at': chunk.metadata.created_at,
+                'source_id': chunk.metadata.source_id,
+                'doc_type': chunk.metadata.doc_type,
+                'reference': chunk.metadata.reference,
+                'score': float(score),
+            }
+            for chunk, score in zip(self.chunks, self.scores)
+        ]
+
+    def text(self) -> str:
+        """Same format as concatenate_query_response_texts (ordered by chunk id)"""
+        return '\n'.join(
+            f"{chunk.text}   Stored at {chunk.metadata.created_at}"
+            for chunk in sorted(self.chunks, key=lambda chunk: chunk.id)
+        )
+
+
+def _flatten(results: Sequence[QueryResult]):
+    chunks = [chunk for result in results for chunk in result.results]
+    scores = np.fromiter((chunk.score for chunk in chunks), dtype=np.float64, count=len(chunks))
+    query_index = np.repeat(np.arange(len(results)), [len(result.results) for result in results])
+    return chunks, scores, query_index
+
+
+def _document_codes(chunks: List[DocumentChunkWithScore], indices: np.ndarray) -> np.ndarray:
+    """Integer code of each chunk's document, numbered in order of first appearance"""
+    keys = [_document_key(chunks[index]) for index in indices.tolist()]
+    codes = {key: code for code, key in enumerate(dict.fromkeys(keys))}
+    return np.fromiter(map(codes.__getitem__, keys), dtype=np.int64, count=len(keys))
+
+
+def _top(scores: np.ndarray, n: Optional[int], positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """Positions of the n best scores, best first; ties are ordered by `positions` (default: their index)"""
+    if n is not None and n < len(scores):
+        # Partial selection, keeping every element tied with the n-th best so ties resolve stably
+        cutoff = np.partition(-scores, n - 1)[n - 1]
+        candidates = np.flatnonzero(-scores <= cutoff)
+    else:
+        candidates = np.arange(len(scores))
+    tie_break = candidates if positions is None else positions[candidates]
+    order = candidates[np.lexsort((tie_break, -scores[candidates]))]
+    return order[:n] if n is not None else order
+
+
+def select_results(response: Union[QueryResponse, Sequence[QueryResult]],
+                   threshold: Optional[float] = None,
+                   n: Optional[int] = None,
+                   dedup: bool = True,
+                   fusion: Fusion = "max",
+                   rrf_k: int = 60) -> Selection:
+    """
+    Select the best chunks of a query response.
+
+    Args:
+        response: A QueryResponse or its QueryResult list
+        threshold: Keep only chunks scoring strictly above this score
+        n: Maximum number of chunks returned
+        dedup: Keep one chunk per document (its best scoring one) and rank documents by `fusion`
+        fusion: "max" or "rrf" (only used with dedup)
+        rrf_k: Rank offset of reciprocal-rank fusion
+
+    Returns:
+        Selection: The chunks, best first, and their ranking scores
+    """
+    if fusion not in ("max", "rrf"):
+        raise ValueError(f"Unknown fusion {fusion!r}")
+    results = response.results if isinstance(response, QueryResponse) else response
+    chunks, scores, query_index = _flatten(results)
+
+    kept = np.flatnonzero(scores > threshold) if threshold is not None else np.arange(len(chunks))
+    if not dedup:
+        top = kept[_top(scores[kept], n)]
+        return Selection([chunks[index] for index in top.tolist()], scores[top])
+
+    if not len(kept):
+        return Selection([], scores[kept])
+
+    kept_scores = scores[kept]
+    if fusion == "max":
+        # Walking chunks best first, the first chunk seen of each document is its best one and
+        # documents appear in ranking order, so only a prefix of the chunks needs a document code.
+        # The prefix grows until it holds n documents.
+        size = len(kept) if n is None else min(len(kept), 4 * n)
+        while True:
+            order = _top(kept_scores, size)
+            _, first = np.unique(_document_codes(chunks, kept[order]), return_index=True)
+            if n is None or len(first) >= n or size == len(kept):
+                break
+            size = min(len(kept), 4 * size)
+        top = kept[order[first[:n]]]
+        return Selection([chunks[index] for index in top.tolist()], scores[top])
+
+    codes = _document_codes(chunks, kept)
+    # Best chunk of each document: sort by document, then score descending, take group heads
+    by_document = np.lexsort((kept, -kept_scores, codes))
+    heads = by_document[np.flatnonzero(np.r_[True, np.diff(codes[by_document]) != 0])]
+    representative = np.empty(len(heads), dtype=np.int64)
+    representative[codes[heads]] = heads
+
+    queries = query_index[kept]
+    by_query = np.lexsort((kept, -kept_scores, queries))
+    group_start = np.flatnonzero(np.r_[True, np.diff(queries[by_query]) != 0])
+    ranks = np.empty(len(kept), dtype=np.int64)
+    ranks[by_query] = np.arange(len(kept)) - np.repeat(group_start, np.diff(np.r_[group_start, len(kept)]))
+    document_scores = np.bincount(codes, weights=1.0 / (rrf_k + ranks + 1), minlength=len(heads))
+
+    # Ties rank like a stable sort of the flattened chunks would
+    top = _top(document_scores, n, kept[representative])
+    return Selection([chunks[kept[representative[document]]] for document in top.tolist()], document_scores[top])
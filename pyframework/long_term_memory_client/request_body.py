@@ -0,0 +1,192 @@
+"""Upsert request bodies: incremental JSON encoding and optional compression
+
+`UpsertBody` serializes an UpsertRequest one document at a time into chunks of about
+`chunk_size` bytes, compressing them on the fly, so a bulk upsert never holds the full dict
+produced by `to_dict()` or the full JSON text in memory. It can be iterated more than once (each
+pass encodes the request again), so httpx can replay it on redirects.
+
+Configured on the Client:
+    * `request_compression`: "gzip" or "zstd" compresses upsert bodies of at least
+      COMPRESSION_MIN_SIZE bytes and sets Content-Encoding. Only enable it for servers that decode
+      compressed request bodies. "zstd" needs Python 3.14 or the `zstandard` package, and falls
+      back to gzip without them.
+    * `stream_upload_min_size`: upserts estimated at least this large are sent with chunked
+      transfer encoding instead of as one buffer (0 streams every upsert, None never streams).
+
+`decode_body` reverses the compression on the receiving side (see LocalMemoryTransport).
+"""
+import json
+import logging
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from .models import UpsertRequest
+
+try:
+    import orjson
+
+    dumps: Callable[[Any], bytes] = orjson.dumps
+except ImportError:  # pragma: no cover - orjson is optional
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+try:
+    from compression import zstd as _zstd  # Python 3.14+
+
+    def _zstd_compressor():
+        return _zstd.ZstdCompressor()
+
+    def _zstd_decompress(content: bytes) -> bytes:
+        return _zstd.decompress(content)
+except ImportError:
+    try:
+        import zstandard as _zstd
+
+        def _zstd_compressor():
+            return _zstd.ZstdCompressor().compressobj()
+
+        def _zstd_decompress(content: bytes) -> bytes:
+            # Streamed frames don't record their size, which ZstdDecompressor.decompress requires
+            return _zstd.ZstdDecompressor().decompressobj().decompress(content)
+    except ImportError:
+        _zstd_compressor = _zstd_decompress = None
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("gzip", "zstd")
+CHUNK_SIZE = 64 * 1024
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Rough JSON size of a document besides its text: keys, metadata and quoting
+_DOCUMENT_OVERHEAD = 256
+
+_warned_zstd = False
+
+
+def resolve_encoding(encoding: Optional[str]) -> Optional[str]:
+    """The Content-Encoding to use for a configured request_compression"""
+    global _warned_zstd
+    if encoding is None:
+        return None
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported request compression {encoding!r}, expected one of {ENCODINGS}")
+    if encoding == "zstd" and _zstd_compressor is None:
+        if not _warned_zstd:
+            logger.warning("zstd request compression needs the zstandard package, using gzip")
+            _warned_zstd = True
+        return "gzip"
+    return encoding
+
+
+def _compressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _zstd_compressor()
+
+
+def decode_body(content: bytes, encoding: Optional[str]) -> bytes:
+    """Decompress a request body sent with the given Content-Encoding"""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return content
+    if encoding == "gzip":
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd" and _zstd_decompress is not None:
+        return _zstd_decompress(content)
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+def estimated_size(request: UpsertRequest) -> int:
+    """Approximate size in bytes of the JSON body of an upsert, without encoding it"""
+    return sum(len(document.text) + _DOCUMENT_OVERHEAD for document in request.documents)
+
+
+class UpsertBody:
+    """
+    Incrementally encoded (and compressed) JSON body of an UpsertRequest.
+
+    Args:
+        request: The upsert to encode
+        encoding: "gzip", "zstd" or None for plain JSON
+        chunk_size: Approximate size of the uncompressed pieces handed to the compressor
+    """
+
+    def __init__(self, request: UpsertRequest, encoding: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        self.request = request
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+    def _json(self) -> Iterator[bytes]:
+        """Pieces of the JSON text, equal once joined to the encoding of request.to_dict()"""
+        yield b'{'
+        for key, value in self.request.additional_properties.items():
+            if key != "documents":
+                yield dumps(key) + b':' + dumps(value) + b','
+        yield b'"documents":['
+        for i, document in enumerate(self.request.documents):
+            yield (b',' if i else b'') + dumps(document.to_dict())
+        yield b']}'
+
+    def _chunks(self) -> Iterator[bytes]:
+        buffer, size = [], 0
+        for piece in self._json():
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.chunk_size:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.encoding is None:
+            yield from self._chunks()
+            return
+        compressor = _compressor(self.encoding)
+        for chunk in self._chunks():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.encoding is not None:
+            headers["Content-Encoding"] = self.encoding
+        return headers
+
+
+class _AsyncUpsertBody:
+    """An UpsertBody as an async iterable only, as httpx.AsyncClient requires"""
+
+    def __init__(self, body: UpsertBody):
+        self.body = body
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return _async_chunks(self.body)
+
+
+async def _async_chunks(body: UpsertBody) -> AsyncIterator[bytes]:
+    for chunk in body:
+        yield chunk
+
+
+def encode_upsert(client, request: UpsertRequest, asynchronous: bool = False
+                  ) -> Tuple[Union[bytes, UpsertBody, _AsyncUpsertBody], Dict[str, str]]:
+    """
+    The content and headers of an upsert request, following the client configuration.
+
+    Returns:
+        The body (bytes, or an iterable streamed with chunked transfer encoding when the
+        upsert is large) and the Content-Type / Content-Encoding headers to send with it
+    """
+    size = estimated_size(request)
+    encoding = resolve_encoding(getattr(client, "request_compression", None))
+    if size < COMPRESSION_MIN_SIZE:
+        encoding = None
+    body = UpsertBody(request, encoding)
+    stream_min_size = getattr(client, "stream_upload_min_size", None)
+    if stream_min_size is None or size < stream_min_size:
+        return b''.join(body), body.headers()
+    return (_AsyncUpsertBody(body) if asynchronous else body), body.headers()
@@ -0,0 +1,107 @@
+"""Maximal Marginal Relevance (MMR) reranking of retrieved chunks
+
+Query results often hold several near-identical chunks of the same conversation. `mmr_rerank`
+picks chunks one at a time, each maximizing
+
+    diversity_tradeoff * relevance - (1 - diversity_tradeoff) * max cosine similarity to the chunks already picked
+
+where relevance is the score returned by the memory service. Chunk vectors come from the
+`embedding` of each chunk (a list or a LazyEmbedding) or, when some chunks were returned without
+one, all from an embedder such as `pyframework.chat.embeddings.EmbeddingClient`, whose cache makes
+repeated chunks free. The pairwise similarities are one matrix product; each pick is a vector update.
+
+Example:
+    chunks = query_long_term_top_results(client, "travel plans", user_id=user_id, k=5, diversity_tradeoff=0.5)
+    chunks = mmr_rerank(chunks, k=5, diversity_tradeoff=0.7, embedder=embedding_client)
+"""
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .models import DocumentChunkWithScore
+from .types import Unset
+
+logger = logging.getLogger(__name__)
+
+
+def mmr(relevance: np.ndarray, embeddings: np.ndarray, k: int, diversity_tradeoff: float = 0.5) -> np.ndarray:
+    """
+    Greedy MMR selection.
+
+    Args:
+        relevance: Relevance of each candidate, shape (n,)
+        embeddings: Candidate vectors, shape (n, dim); they don't need to be normalized
+        k: Number of candidates to pick
+        diversity_tradeoff: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        np.ndarray: Indices of the picked candidates, in pick order
+    """
+    count = min(k, len(relevance))
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    similarity = vectors @ vectors.T
+
+    relevance = diversity_tradeoff * np.asarray(relevance, dtype=np.float32)
+    redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    picked = np.empty(count, dtype=np.int64)
+    for position in range(count):
+        if position == 0:
+            marginal = relevance
+        else:
+            marginal = relevance - (1 - diversity_tradeoff) * redundancy
+        best = int(np.argmax(np.where(available, marginal, -np.inf)))
+        picked[position] = best
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def chunk_embeddings(chunks: Sequence[DocumentChunkWithScore], embedder=None) -> Optional[np.ndarray]:
+    """
+    Vectors of the chunks as a float32 matrix, or None when some are missing and there is no embedder.
+
+    Args:
+        chunks: The chunks
+        embedder: Object with an `embed(texts) -> np.ndarray` method. When some chunks have no
+            embedding, every chunk is embedded with it: vectors of the service's model and of the
+            embedder's are not comparable, and may not even have the same dimension.
+    """
+    if not chunks:
+        return np.empty((0, 0), dtype=np.float32)
+    if any(isinstance(chunk.embedding, Unset) for chunk in chunks):
+        if embedder is None:
+            return None
+        return np.asarray(embedder.embed([chunk.text for chunk in chunks]), dtype=np.float32)
+    return np.stack([np.asarray(chunk.embedding, dtype=np.float32) for chunk in chunks])
+
+
+def mmr_rerank(chunks: Sequence[DocumentChunkWithScore], k: Optional[int] = None, diversity_tradeoff: float = 0.5,
+               embedder=None) -> List[DocumentChunkWithScore]:
+    """
+    Rerank chunks with Maximal Marginal Relevance.
+
+    Args:
+        chunks: Retrieved chunks, e.g. from get_top_results_above_threshold
+        k: Number of chunks returned (all by default)
+        diversity_tradeoff: 1 keeps the service ranking, lower values favour diverse chunks
+        embedder: Embeds all the chunks when some were returned without an embedding (e.g. an EmbeddingClient)
+
+    Returns:
+        The picked chunks, in pick order. When vectors are missing and there is no embedder, the
+        first k chunks by score.
+    """
+    k = len(chunks) if k is None else k
+    embeddings = chunk_embeddings(chunks, embedder)
+    if embeddings is None:
+        logger.warning("Chunks without embeddings and no embedder, skipping MMR rerank")
+        return sorted(chunks, key=lambda chunk: chunk.score, reverse=True)[:k]
+
+    relevance = np.fromiter((chunk.score for chunk in chunks), dtype=np.float32, count=len(chunks))
+    return [chunks[index] for index in mmr(relevance, embeddings, k, diversity_tradeoff).tolist()]
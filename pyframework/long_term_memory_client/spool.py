@@ -0,0 +1,385 @@
+"""Durable write-ahead spool for long-term memory upserts and deletes
+
+`MemorySpool` decouples writers from the memory service: `upsert` and `delete` append the
+operation to a local SQLite database and return at once. Appends are group-committed by a
+background thread (one transaction, so one fsync, per `commit_interval`), and the Future each call
+returns resolves once its operation is on disk.
+
+A drainer thread replays the operations to the service in order: consecutive upserts are sent as
+one multi-document UpsertRequest, deletes one by one. Failures the service may recover from
+(connection errors, timeouts, 408 / 429 / 5xx) are retried with exponential backoff, holding back
+later operations so the order is kept. Operations the service rejects (other 4xx, validation
+errors) are moved to a dead letter table and logged. Operations still spooled when the process
+stops are sent after the next start.
+
+Example:
+    spool = MemorySpool(client, os.getenv("MEMORY_SPOOL_PATH", "memory_spool.db"))
+    spool_information(spool, None, text, chat_id, created_at, author)
+    spool.stats()  # depth, lag, sent, retries, ...
+"""
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import attr
+import httpx
+
+from . import errors
+from .api.default import delete_delete, upsert_post
+from .client import Client
+from .errors import APIError, is_retriable
+from .http_utils import get_parsed_or_raise
+from .models import DeleteRequest, DeleteResponse, Document, DocumentMetadataFilter, UpsertRequest, UpsertResponse
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    seq INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    error TEXT NOT NULL
+);
+"""
+
+
+class SpoolClosed(RuntimeError):
+    """Raised when an operation is added to a closed MemorySpool"""
+
+
+class _Rejected(Exception):
+    """The service refused the operations for good"""
+
+
+@attr.s(auto_attribs=True, slots=True)
+class SpoolStats:
+    """
+    Attributes:
+        depth (int): Operations waiting to be sent (spooled or being committed)
+        lag (float): Seconds since the oldest waiting operation was added
+        enqueued (int): Operations added since the spool was opened
+        sent (int): Operations applied by the service since the spool was opened
+        batches (int): Requests sent successfully
+        retries (int): Failed attempts that will be retried
+        dead_letters (int): Operations rejected by the service, kept in the dead_letters table
+        last_error (Optional[str]): The last send error
+    """
+
+    depth: int
+    lag: float
+    enqueued: int
+    sent: int
+    batches: int
+    retries: int
+    dead_letters: int
+    last_error: Optional[str] = None
+
+
+class MemorySpool:
+    """
+    Args:
+        client: The API client
+        path: SQLite database file (created if missing)
+        max_batch_size: Maximum number of documents per UpsertRequest
+        commit_interval: Seconds between group commits of new operations
+        retry_initial: Seconds before the first retry of a failed send
+        retry_max: Maximum seconds between retries
+        drain: Start the drainer thread (False only spools, e.g. to fill a spool offline)
+        flush_at_exit: Register `close` to run at interpreter exit
+    """
+
+    def __init__(self, client: Client, path: str, max_batch_size: int = 64, commit_interval: float = 0.05,
+                 retry_initial: float = 0.5, retry_max: float = 60.0, drain: bool = True, flush_at_exit: bool = True):
+        self.client = client
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self.commit_interval = commit_interval
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._condition = threading.Condition()
+        self._buffer: List[Tuple[str, str, float, Future]] = []
+        self._committing = 0
+        self._closed = False
+        self._stopping = False
+        # After a rejected batch, operations up to this seq are sent in smaller batches to isolate the bad one
+        self._split_until = 0
+        self._split_size = max_batch_size
+
+        self._enqueued = 0
+        self._sent = 0
+        self._batches = 0
+        self._retries = 0
+        self._last_error: Optional[str] = None
+
+        self._committer = threading.Thread(target=self._commit_loop, name="memory-spool-commit", daemon=True)
+        self._committer.start()
+        self._drainer = None
+        if drain:
+            self._drainer = threading.Thread(target=self._drain_loop, name="memory-spool-drain", daemon=True)
+            self._drainer.start()
+        if flush_at_exit:
+            atexit.register(self.close)
+
+    # Producers
+
+    def _add(self, kind: str, payload: Dict[str, Any]) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise SpoolClosed("MemorySpool is closed")
+            self._buffer.append((kind, json.dumps(payload), time.time(), future))
+            self._enqueued += 1
+            self._condition.notify_all()
+        return future
+
+    def upsert(self, document: Document) -> Future:
+        """
+        Spool a document upsert.
+
+        Returns:
+            Future resolving to the operation sequence number once it is on disk
+        """
+        return self._add(UPSERT, document.to_dict())
+
+    def delete(self, ids: Optional[Sequence[str]] = None, filter_: Optional[DocumentMetadataFilter] = None,
+               delete_all: bool = False) -> Future:
+        """Spool a delete; it is applied after every operation spooled before it"""
+        request = DeleteRequest(delete_all=delete_all)
+        if ids is not None:
+            request.ids = list(ids)
+        if filter_ is not None:
+            request.filter_ = filter_
+        return self._add(DELETE, request.to_dict())
+
+    # Metrics
+
+    def _query(self, sql: str, parameters: Sequence[Any] = ()) -> List[Tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def depth(self) -> int:
+        with self._condition:
+            buffered = len(self._buffer) + self._committing
+        return self._query("SELECT COUNT(*) FROM operations")[0][0] + buffered
+
+    def lag(self) -> float:
+        with self._condition:
+            oldest_buffered = self._buffer[0][2] if self._buffer else None
+        oldest = self._query("SELECT MIN(enqueued_at) FROM operations")[0][0]
+        oldest = oldest if oldest is not None else oldest_buffered
+        return max(0.0, time.time() - oldest) if oldest is not None else 0.0
+
+    def stats(self) -> SpoolStats:
+        return SpoolStats(
+            depth=self.depth(),
+            lag=self.lag(),
+            enqueued=self._enqueued,
+            sent=self._sent,
+            batches=self._batches,
+            retries=self._retries,
+            dead_letters=self._query("SELECT COUNT(*) FROM dead_letters")[0][0],
+            last_error=self._last_error,
+        )
+
+    # Lifecycle
+
+    def wait_empty(self, timeout: Optional[float] = None) -> bool:
+        """Block until every spooled operation has been sent (or dead lettered); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.depth():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def close(self):
+        """Commit buffered operations and stop the background threads; unsent operations stay spooled"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._committer.join()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._drainer is not None:
+            self._drainer.join()
+        with self._db_lock:
+            self._db.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "MemorySpool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Group commit
+
+    def _commit_loop(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if not self._closed:
+                    # Let more operations join this transaction
+                    self._condition.wait(self.commit_interval)
+                batch, self._buffer = self._buffer, []
+                self._committing = len(batch)
+                closed = self._closed
+            if batch:
+                self._commit(batch)
+                with self._condition:
+                    self._committing = 0
+                    self._condition.notify_all()
+            if closed and not batch:
+                return
+
+    def _commit(self, batch: List[Tuple[str, str, float, Future]]):
+        try:
+            with self._db_lock:
+                self._db.execute("BEGIN")
+                seqs = [
+                    self._db.execute("INSERT INTO operations (kind, payload, enqueued_at) VALUES (?, ?, ?)",
+                                     (kind, payload, enqueued_at)).lastrowid
+                    for kind, payload, enqueued_at, _ in batch
+                ]
+                self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.error(f"Could not spool {len(batch)} memory operations: {e}")
+            with self._db_lock:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        for (*_, future), seq in zip(batch, seqs):
+            future.set_result(seq)
+
+    # Drain
+
+    def _next_operations(self) -> List[Tuple[int, str, str, float]]:
+        rows = self._query("SELECT seq, kind, payload, enqueued_at FROM operations ORDER BY seq LIMIT ?",
+                           (self.max_batch_size,))
+        if not rows:
+            return rows
+        if rows[0][1] == DELETE:
+            return rows[:1]
+        if rows[0][0] <= self._split_until:
+            rows = rows[:self._split_size]
+        for position, row in enumerate(rows):
+            if row[1] != UPSERT:
+                return rows[:position]
+        return rows
+
+    def _send(self, operations: List[Tuple[int, str, str, float]]):
+        if operations[0][1] == DELETE:
+            response = get_parsed_or_raise(delete_delete.sync_detailed(
+                client=self.client, json_body=DeleteRequest.from_dict(json.loads(operations[0][2]))))
+            if not isinstance(response, DeleteResponse):
+                raise _Rejected(f"Delete rejected: {response.to_dict()}")
+            return
+
+        documents = [Document.from_dict(json.loads(payload)) for _, _, payload, _ in operations]
+        response = get_parsed_or_raise(upsert_post.sync_detailed(client=self.client,
+                                                                 json_body=UpsertRequest(documents=documents)))
+        if not isinstance(response, UpsertResponse):
+            raise _Rejected(f"Upsert rejected: {response.to_dict()}")
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep unless the spool is stopping; True when it is"""
+        with self._condition:
+            if not self._stopping:
+                self._condition.wait(seconds)
+            return self._stopping
+
+    def _drain_loop(self):
+        delay = self.retry_initial
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+            operations = self._next_operations()
+            if not operations:
+                if self._wait(1.0):
+                    return
+                continue
+
+            seqs = [operation[0] for operation in operations]
+            try:
+                self._send(operations)
+            except (_Rejected, APIError, errors.UnexpectedStatus, httpx.HTTPError) as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                if is_retriable(e):
+                    self._retries += 1
+                    logger.warning(f"Sending {len(seqs)} spooled memory operations failed, retrying in {delay:.1f}s: {e}")
+                    if self._wait(delay):
+                        return
+                    delay = min(delay * 2, self.retry_max)
+                    continue
+                if len(operations) > 1:
+                    # One bad document fails the whole batch: bisect to find it
+                    self._split_until = max(self._split_until, seqs[-1])
+                    self._split_size = len(operations) // 2
+                    continue
+                logger.error(f"Memory service rejected spooled operation {seqs[0]}, moving it to dead letters: {e}")
+                self._dead_letter(operations[0], self._last_error)
+            except Exception as e:
+                # Unexpected errors must not stop the drainer; the operations stay spooled
+                self._last_error = f"{type(e).__name__}: {e}"
+                self._retries += 1
+                logger.exception(f"Unexpected error sending spooled memory operations, retrying in {delay:.1f}s")
+                if self._wait(delay):
+                    return
+                delay = min(delay * 2, self.retry_max)
+                continue
+            else:
+                self._sent += len(seqs)
+                self._batches += 1
+                self._remove(seqs)
+            if seqs[-1] >= self._split_until:
+                self._split_size = self.max_batch_size
+            delay = self.retry_initial
+
+    def _remove(self, seqs: List[int]):
+        with self._db_lock:
+            self._db.execute(f"DELETE FROM operations WHERE seq IN ({','.join('?' * len(seqs))})", seqs)
+        with self._condition:
+            self._condition.notify_all()
+
+    def _dead_letter(self, operation: Tuple[int, str, str, float], error: str):
+        seq, kind, payload, enqueued_at = operation
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR REPLACE INTO dead_letters VALUES (?, ?, ?, ?, ?, ?)",
+                             (seq, kind, payload, enqueued_at, time.time(), error))
+            self._db.execute("DELETE FROM operations WHERE seq = ?", (seq,))
+            self._db.execute("COMMIT")
+        with self._condition:
+            self._condition.notify_all()
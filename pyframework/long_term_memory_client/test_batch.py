@@ -0,0 +1,59 @@
+"""Tests for multi-query batching"""
+import json
+import threading
+
+import httpx
+import pytest
+
+from .batch import BatcherClosed, QueryBatcher, query_batch
+from .client import AuthenticatedClient
+
+
+def _client(batch_sizes, max_queries=3):
+    def handler(request: httpx.Request) -> httpx.Response:
+        queries = json.loads(request.content)["queries"]
+        batch_sizes.append(len(queries))
+        if len(queries) > max_queries:
+            return httpx.Response(413, text="Response too large")
+        return httpx.Response(200, json={"results": [{"query": query["query"], "results": []} for query in queries]})
+
+    return AuthenticatedClient(base_url="http://memory", token="secret",
+                               httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_query_batch_splits_oversized_batches_and_keeps_order():
+    """Test that batches rejected as too large are split and results come back in input order"""
+    batch_sizes = []
+    results = query_batch(_client(batch_sizes), [(f"q{i}", None, 2) for i in range(7)], max_batch_size=5)
+
+    assert [result.query for result in results] == [f"q{i}" for i in range(7)]
+    assert batch_sizes == [5, 2, 3, 2]
+
+
+def test_query_batcher_coalesces_concurrent_queries():
+    """Test that concurrent single queries are sent as one request, sharing identical queries"""
+    batch_sizes = []
+    batcher = QueryBatcher(_client(batch_sizes), max_wait=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(batcher.query((f"q{i % 2}", None, 2)).query))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ["q0", "q0", "q1", "q1"]
+    assert batch_sizes == [2]
+
+
+def test_query_batcher_close_flushes_pending_queries():
+    """Test that close sends queued queries without waiting for max_wait and stops the threads"""
+    batch_sizes = []
+    with QueryBatcher(_client(batch_sizes), max_wait=60) as batcher:
+        futures = [batcher.submit((f"q{i}", None, 2)) for i in range(3)]
+
+    assert [future.result(timeout=0).query for future in futures] == ["q0", "q1", "q2"]
+    assert batch_sizes == [3]
+    assert not batcher._worker.is_alive()
+    with pytest.raises(BatcherClosed):
+        batcher.submit(("q3", None, 2))
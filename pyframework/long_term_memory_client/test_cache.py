@@ -0,0 +1,74 @@
+"""Tests for the client-side query result cache"""
+import asyncio
+import json
+
+import httpx
+
+from . import create_client
+from .api.default.query_post import query_long_term_memory
+from .cache import QueryCache
+from .models import Query, QueryResult
+from .operations import upsert_information
+
+
+def _client(paths):
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/upsert":
+            return httpx.Response(200, json={"ids": ["doc2"]})
+        queries = json.loads(request.content)["queries"]
+        return httpx.Response(200, json={"results": [{"query": query["query"], "results": []} for query in queries]})
+
+    return create_client("http://memory", "secret", query_cache=QueryCache(ttl=60),
+                         httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_repeated_queries_are_served_from_cache():
+    """Test that queries differing only in case and spacing share one request"""
+    paths = []
+    client = _client(paths)
+    query_long_term_memory(client, "Travel  plans", user_id=1, k=3)
+    response = query_long_term_memory(client, "travel plans", user_id=1, k=3)
+
+    assert response.results[0].query == "Travel  plans"
+    assert paths == ["/query"]
+
+
+def test_upsert_invalidates_only_matching_entries():
+    """Test that an upsert drops cached results whose filter may match the written document"""
+    paths = []
+    client = _client(paths)
+    query_long_term_memory(client, "travel plans", source_id="chat-1")
+    query_long_term_memory(client, "travel plans", source_id="chat-2")
+
+    upsert_information(client, None, "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    query_long_term_memory(client, "travel plans", source_id="chat-1")
+    query_long_term_memory(client, "travel plans", source_id="chat-2")
+
+    assert paths == ["/query", "/query", "/upsert", "/query"]
+
+
+def test_cancelled_loader_hands_the_load_to_a_waiter():
+    """Test that cancelling the caller loading a query makes a waiting caller load it instead of failing"""
+    cache = QueryCache(ttl=60)
+    query = Query(query="travel plans")
+    loads = []
+
+    async def load():
+        loads.append(len(loads))
+        await asyncio.sleep(0.05)
+        return QueryResult(query="travel plans", results=[])
+
+    async def main():
+        owner = asyncio.create_task(cache.aget_or_load(query, load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.aget_or_load(query, load))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        result = await waiter
+        assert owner.cancelled()
+        return result
+
+    assert asyncio.run(main()).query == "travel plans"
+    assert loads == [0, 1]
+    assert len(cache) == 1
@@ -0,0 +1,98 @@
+"""Tests for the pooled httpx clients owned by Client"""
+import asyncio
+import gc
+import threading
+import weakref
+from http import HTTPStatus
+
+import httpx
+
+from .client import AuthenticatedClient
+from .http_utils import execute_request, execute_request_async
+from .types import Response
+
+
+def _build_response(*, client, response: httpx.Response) -> Response[dict]:
+    return Response(
+        status_code=HTTPStatus(response.status_code),
+        content=response.content,
+        headers=response.headers,
+        parsed=response.json(),
+    )
+
+
+def _client(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"authorization": request.headers.get("authorization")})
+
+    return AuthenticatedClient(base_url="http://memory", token="secret",
+                               httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def _kwargs(client):
+    return {"method": "post", "url": f"{client.base_url}/query", "headers": client.get_headers(),
+            "cookies": client.get_cookies(), "timeout": client.get_timeout(), "json": {}}
+
+
+def test_requests_reuse_one_httpx_client():
+    """Test that the httpx client is created once and shared with copies made by with_headers"""
+    requests = []
+    client = _client(requests)
+    with client:
+        first = client.get_httpx_client()
+        response = execute_request(client=client, kwargs=_kwargs(client), parse_response_fn=None,
+                                   build_response_fn=_build_response)
+        copy = client.with_headers({"x-extra": "1"})
+        execute_request(client=copy, kwargs=_kwargs(copy), parse_response_fn=None, build_response_fn=_build_response)
+
+        assert response.parsed == {"authorization": "Bearer secret"}
+        assert copy.get_httpx_client() is first
+        assert requests[1].headers["x-extra"] == "1"
+    assert first.is_closed
+
+
+def test_async_requests_reuse_one_httpx_client():
+    """Test that the async httpx client is reused within an event loop and closed by the context manager"""
+    requests = []
+    client = _client(requests)
+
+    async def run():
+        async with client:
+            first = client.get_async_httpx_client()
+            for _ in range(2):
+                await execute_request_async(client=client, kwargs=_kwargs(client), parse_response_fn=None,
+                                            build_response_fn=_build_response)
+            assert client.get_async_httpx_client() is first
+        return first
+
+    assert asyncio.run(run()).is_closed
+    assert len(requests) == 2
+
+
+def test_async_clients_are_per_event_loop():
+    """Test that a loop running in another thread keeps its client and closed loops' clients are dropped"""
+    client = _client([])
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def get():
+        return client.get_async_httpx_client()
+
+    try:
+        other = asyncio.run_coroutine_threadsafe(get(), other_loop).result()
+        first = weakref.ref(asyncio.run(get()))
+        second = asyncio.run(get())
+        gc.collect()
+
+        assert first() is None
+        assert not other.is_closed and not second.is_closed
+        assert asyncio.run_coroutine_threadsafe(get(), other_loop).result() is other
+    finally:
+        asyncio.run_coroutine_threadsafe(client.aclose(), other_loop).result()
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+    assert other.is_closed
@@ -0,0 +1,81 @@
+"""Tests for the fast /query decode path"""
+import json
+
+import numpy as np
+import pytest
+
+from .models import QueryResponse
+from .models.fast_decode import LazyEmbedding, decode_query_response_json
+from .types import UNSET
+
+
+def _chunk(i, **extra):
+    return {
+        "id": f"doc-{i}_0",
+        "text": f"text {i}",
+        "score": 1 - i / 10,
+        "metadata": {"source": "chat", "source_id": "chat-1", "document_id": f"doc-{i}", "user_id": "42"},
+        **extra,
+    }
+
+
+PAYLOAD = {
+    "results": [
+        {"query": "first", "results": [_chunk(0, embedding=[0.5, -0.25, 1.0]), _chunk(1)], "took_ms": 3},
+        {"query": "second", "results": [_chunk(2, embedding=[0.125, 2.0, -4.0], rank=1)]},
+        {"query": "empty", "results": []},
+    ],
+    "model": "text-embedding-3-small",
+}
+
+
+def _generic(payload):
+    return QueryResponse.from_dict(json.loads(json.dumps(payload)))
+
+
+def _chunks(response):
+    return [chunk for result in response.results for chunk in result.results]
+
+
+def test_list_mode_equals_from_dict():
+    """Test that the default mode decodes to the same models as from_dict, unknown keys included"""
+    content = json.dumps(PAYLOAD).encode("utf-8")
+
+    assert decode_query_response_json(content) == _generic(PAYLOAD)
+    assert decode_query_response_json(content).to_dict() == PAYLOAD
+
+
+def test_error_payload_equals_from_dict():
+    """Test that a detail payload decodes to an empty response keeping the detail"""
+    payload = {"detail": "ResponseTooLargeError"}
+    decoded = decode_query_response_json(json.dumps(payload).encode("utf-8"), "drop")
+
+    assert decoded == _generic(payload)
+    assert decoded.results == []
+
+
+def test_drop_mode_equals_from_dict_without_embeddings():
+    """Test that "drop" only leaves the chunk embeddings UNSET, even for an embedding key outside chunks"""
+    payload = dict(PAYLOAD, embedding=[1.0, 2.0])
+    expected = _generic(payload)
+    for chunk in _chunks(expected):
+        chunk.embedding = UNSET
+
+    assert decode_query_response_json(json.dumps(payload).encode("utf-8"), "drop") == expected
+
+
+def test_float32_mode_equals_from_dict_with_lazy_embeddings():
+    """Test that "float32" keeps every other field and decodes vectors to read-only float32 arrays"""
+    decoded = decode_query_response_json(json.dumps(PAYLOAD).encode("utf-8"), "float32")
+    expected = _generic(PAYLOAD)
+
+    embeddings = [chunk.embedding for chunk in _chunks(decoded)]
+    assert [type(embedding) for embedding in embeddings] == [LazyEmbedding, type(UNSET), LazyEmbedding]
+    assert decoded == expected
+    for embedding, chunk in zip(embeddings, _chunks(expected)):
+        if chunk.embedding is UNSET:
+            continue
+        array = np.asarray(embedding)
+        assert array.dtype == np.float32
+        assert not array.flags.writeable
+        assert embedding.tolist() == pytest.approx(chunk.embedding)
@@ -0,0 +1,85 @@
+"""Tests for the content fingerprint index"""
+import json
+
+import httpx
+
+from . import create_client
+from .api.default import delete_delete
+from .fingerprint import DIGEST_SIZE, FingerprintIndex
+from .models import DeleteRequest, DocumentMetadataFilter
+from .operations import upsert_information
+
+
+def _client(paths, fingerprints):
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/delete":
+            return httpx.Response(200, json={"success": True})
+        return httpx.Response(200, json={"ids": [document["id"] for document in json.loads(request.content)["documents"]]})
+
+    return create_client("http://memory", "secret", fingerprints=fingerprints,
+                         httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_unchanged_documents_are_skipped_across_restarts(tmp_path):
+    """Test that an unchanged document is not sent again, even with a reopened index, unless forced"""
+    paths = []
+    client = _client(paths, FingerprintIndex(str(tmp_path / "fingerprints")))
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    client.fingerprints.close()
+
+    client = _client(paths, FingerprintIndex(str(tmp_path / "fingerprints")))
+    response = upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user", force=True)
+    upsert_information(client, "doc1", "Going to Porto", "chat-1", "2024-05-01", "user")
+
+    assert response.ids == ["doc1"]
+    assert paths == ["/upsert", "/upsert", "/upsert"]
+
+
+def test_delete_forgets_fingerprints():
+    """Test that a deleted document is upserted again"""
+    paths = []
+    client = _client(paths, FingerprintIndex())
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    delete_delete.sync(client=client, json_body=DeleteRequest(ids=["doc1"]))
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+
+    assert paths == ["/upsert", "/delete", "/upsert"]
+
+
+def test_delete_by_source_only_forgets_that_source():
+    """Test that a delete filtered on source_id keeps the fingerprints of other sources, across reopen too"""
+    paths = []
+    client = _client(paths, FingerprintIndex())
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    upsert_information(client, "doc2", "Going to Porto", "chat-2", "2024-05-01", "user")
+    delete_delete.sync(client=client, json_body=DeleteRequest(
+        filter_=DocumentMetadataFilter.from_dict({"source_id": "chat-1", "author": "user"})))
+
+    assert "doc1" not in client.fingerprints and "doc2" in client.fingerprints
+
+    delete_delete.sync(client=client, json_body=DeleteRequest(filter_=DocumentMetadataFilter.from_dict({"author": "user"})))
+
+    assert len(client.fingerprints) == 0
+
+
+def test_source_ids_persist_and_old_logs_are_read(tmp_path):
+    """Test that source ids survive a reopen, and entries of a first format log count as of any source"""
+    path = str(tmp_path / "fingerprints")
+    client = _client([], FingerprintIndex(path))
+    upsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user")
+    client.fingerprints.close()
+
+    index = FingerprintIndex(path)
+    index.forget_source("chat-2")
+    assert "doc1" in index
+    index.forget_source("chat-1")
+    assert "doc1" not in index
+
+    old = tmp_path / "old"
+    old.write_bytes(b"PFFP1\n" + bytes([1, 0, 4]) + b"doc9" + b"\0" * DIGEST_SIZE)
+    index = FingerprintIndex(str(old))
+    assert "doc9" in index
+    index.forget_source("chat-2")
+    assert "doc9" not in index
@@ -0,0 +1,90 @@
+"""Tests for the bulk ingestion pipeline"""
+import json
+
+import httpx
+
+from . import create_client
+from .fingerprint import FingerprintIndex
+from .ingest import IngestPipeline, SourceRecord, read_jsonl
+from .local_store import LocalVectorStore
+from .local_transport import create_local_client
+from .models import Query
+
+
+def _client(batches, rejected=()):
+    def handler(request: httpx.Request) -> httpx.Response:
+        documents = json.loads(request.content)["documents"]
+        batches.append([document["id"] for document in documents])
+        if any(document["id"] in rejected for document in documents):
+            return httpx.Response(422, json={"detail": [{"loc": ["body"], "msg": "invalid", "type": "value_error"}]})
+        return httpx.Response(200, json={"ids": [document["id"] for document in documents]})
+
+    return create_client("http://memory", "secret", httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_records_are_deduplicated_and_batched(tmp_path):
+    """Test that chat lines become batched documents and only repeated texts of a document are sent once"""
+    archive = tmp_path / "chats.jsonl"
+    lines = [{"id": f"m{index % 4}", "text": f"message {index % 2}", "chat_id": "chat-1"} for index in range(6)]
+    archive.write_text("\n".join(json.dumps(line) for line in lines))
+    batches = []
+
+    stats = IngestPipeline(_client(batches), max_batch_size=2, max_workers=1).run(
+        read_jsonl([str(archive)], field_map={"source_id": "chat_id"}))
+
+    # m0 and m1 come back with the same texts; m2 and m3 repeat texts of other messages of the chat
+    assert batches == [["m0", "m1"], ["m2", "m3"]]
+    assert (stats.records, stats.duplicates, stats.documents) == (6, 2, 4)
+
+
+def test_run_resumes_after_checkpoint(tmp_path):
+    """Test that a second run over the same records only sends the records after the checkpoint"""
+    checkpoint = str(tmp_path / "checkpoint.json")
+    records = [SourceRecord(document_id=f"doc{index}", text=f"text number {index}") for index in range(5)]
+    batches = []
+    IngestPipeline(_client(batches), max_batch_size=10, checkpoint_path=checkpoint).run(records[:3])
+
+    stats = IngestPipeline(_client(batches), max_batch_size=10, checkpoint_path=checkpoint).run(records)
+
+    assert batches == [["doc0", "doc1", "doc2"], ["doc3", "doc4"]]
+    assert (stats.records, stats.documents) == (5, 5)
+
+
+def test_checkpoint_stops_at_a_failed_batch(tmp_path):
+    """Test that the checkpoint does not move past a rejected batch, so the next run sends it again"""
+    checkpoint = str(tmp_path / "checkpoint.json")
+    records = [SourceRecord(document_id=f"doc{index}", text=f"text number {index}") for index in range(4)]
+    batches = []
+    stats = IngestPipeline(_client(batches, rejected={"doc1"}), max_batch_size=1, max_workers=1,
+                           checkpoint_path=checkpoint).run(records)
+
+    assert (stats.documents, stats.failed) == (3, 1)
+    with open(checkpoint) as f:
+        assert json.load(f)["position"] == 1
+
+    batches.clear()
+    IngestPipeline(_client(batches), max_batch_size=1, checkpoint_path=checkpoint).run(records)
+
+    assert sorted(batches) == [["doc1"], ["doc2"], ["doc3"]]
+
+
+def test_changed_record_replaces_all_its_chunks():
+    """Test that chunks share the record id as document_id and a shorter new version leaves no stale chunk"""
+    store = LocalVectorStore()
+    client = create_local_client(store=store, fingerprints=FingerprintIndex())
+    long_text = " ".join(f"Sentence number {index} about the trip to Lisbon." for index in range(40))
+
+    stats = IngestPipeline(client, chunk_tokens=50).run([SourceRecord(document_id="trip", text=long_text)])
+    chunks = store.query([Query(query="trip to Lisbon", top_k=100)])[0].results
+
+    assert stats.documents == len(chunks) > 1
+    assert {chunk.metadata.document_id for chunk in chunks} == {"trip"}
+
+    stats = IngestPipeline(client, chunk_tokens=50).run([SourceRecord(document_id="trip", text="Trip cancelled.")])
+    chunks = store.query([Query(query="trip to Lisbon", top_k=100)])[0].results
+
+    assert (stats.replaced, stats.documents) == (1, 1)
+    assert [(chunk.id, chunk.metadata.document_id, chunk.text) for chunk in chunks] == [("trip_0", "trip", "Trip cancelled.")]
+
+    stats = IngestPipeline(client, chunk_tokens=50).run([SourceRecord(document_id="trip", text="Trip cancelled.")])
+    assert (stats.unchanged, stats.replaced, stats.documents) == (1, 0, 0)
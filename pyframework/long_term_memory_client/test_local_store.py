@@ -0,0 +1,89 @@
+"""Tests for the embedded vector store and its transport"""
+import os
+
+import pytest
+
+from . import local_store
+from .api.default import delete_delete
+from .api.default.query_post import query_long_term_top_results
+from .local_store import LocalVectorStore
+from .local_transport import create_local_client
+from .models import DeleteRequest, Document, Query
+from .operations import upsert_information
+
+
+def test_client_round_trip_with_filters():
+    """Test that upsert, filtered query and delete work through the regular client"""
+    client = create_local_client()
+    upsert_information(client, "trip", "Going to Lisbon in May for vacation", "chat-1", "2024-05-01", "user")
+    upsert_information(client, "food", "My favourite food is sushi", "chat-2", "2024-06-01", "user")
+
+    results = query_long_term_top_results(client, "vacation in Lisbon", threshold=0.0, k=2)
+    assert results[0].id == "trip_0"
+    assert results[0].metadata.document_id == "trip"
+
+    results = query_long_term_top_results(client, "vacation in Lisbon", source_id="chat-2", threshold=-1.0, k=2)
+    assert [chunk.metadata.document_id for chunk in results] == ["food"]
+
+    delete_delete.sync(client=client, json_body=DeleteRequest(ids=["food"]))
+    assert query_long_term_top_results(client, "sushi", threshold=-1.0, k=2)[0].metadata.document_id == "trip"
+
+
+def test_store_persists_across_reopen(tmp_path):
+    """Test that vectors and chunks are replayed from disk, including replacements"""
+    with LocalVectorStore(str(tmp_path)) as store:
+        store.upsert([Document(text="first version", id="doc")])
+        store.upsert([Document(text="second version", id="doc")])
+
+    with LocalVectorStore(str(tmp_path)) as store:
+        assert len(store) == 1
+        result = store.query([Query(query="version", top_k=3)])[0]
+        assert [chunk.text for chunk in result.results] == ["second version"]
+
+
+def _store_with_deletes(path):
+    store = LocalVectorStore(path)
+    store.upsert([Document(text=f"note number {i} about topic{i}", id=f"doc{i}") for i in range(6)])
+    store.delete(ids=["doc0", "doc2", "doc4"])
+    return store
+
+
+def _texts(store, query):
+    return [chunk.text for chunk in store.query([Query(query=query, top_k=1)])[0].results]
+
+
+@pytest.mark.parametrize("crash_at", [None, 1, 2])
+def test_compaction_survives_a_crash(tmp_path, monkeypatch, crash_at):
+    """Test that a compaction interrupted before, between or after its file replacements reopens consistently"""
+    store = _store_with_deletes(str(tmp_path))
+    replace = os.replace
+    calls = []
+
+    def crashing_replace(src, dst):
+        calls.append(dst)
+        if len(calls) == crash_at:
+            raise OSError("crash")
+        replace(src, dst)
+
+    monkeypatch.setattr(local_store.os, "replace", crashing_replace)
+    if crash_at is None:
+        store.compact()
+        store.close()
+    else:
+        with pytest.raises(OSError):
+            store.compact()
+    monkeypatch.setattr(local_store.os, "replace", replace)
+    if crash_at == 1:
+        # Nothing was replaced: the store keeps working on its old files
+        store.upsert([Document(text="note number 7 about topic7", id="doc7")])
+        store.close()
+    elif crash_at == 2:
+        # Only the next open can finish the compaction, so changes are refused rather than lost
+        with pytest.raises(RuntimeError):
+            store.upsert([Document(text="note number 7 about topic7", id="doc7")])
+
+    with LocalVectorStore(str(tmp_path)) as reopened:
+        assert len(reopened) == (4 if crash_at == 1 else 3)
+        for i in (1, 3, 5):
+            assert _texts(reopened, f"topic{i}") == [f"note number {i} about topic{i}"]
+    assert sorted(os.listdir(tmp_path)) == [local_store.CHUNKS_FILE, local_store.VECTORS_FILE]
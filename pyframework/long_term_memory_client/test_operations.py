@@ -0,0 +1,79 @@
+"""Tests for the async and multi-source memory operations"""
+import asyncio
+import json
+
+import httpx
+
+from pyframework.trace.deadline import deadline_scope, remaining_time
+
+from . import create_client
+from .cache import QueryCache
+from .operations import aquery_sources, aupsert_information, query_sources
+
+
+def _response(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/upsert":
+        return httpx.Response(200, json={"ids": ["doc1"]})
+    results = []
+    for query in json.loads(request.content)["queries"]:
+        source = query["filter"]["source"]
+        chunks = [{"id": f"{source}-{i}_0", "text": source, "score": 0.9 - i / 10 - (source == "email") / 20,
+                   "metadata": {"document_id": f"{source}-{i}", "source": source}} for i in range(3)]
+        results.append({"query": query["query"], "results": chunks})
+    return httpx.Response(200, json={"results": results})
+
+
+def test_query_sources_merges_into_global_top_n():
+    """Test that each source is queried once and the best chunks across sources are kept"""
+    sources = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sources.append(json.loads(request.content)["queries"][0]["filter"]["source"])
+        return _response(request)
+
+    client = create_client("http://memory", "secret", httpx_args={"transport": httpx.MockTransport(handler)})
+    selection = query_sources(client, "plans", [{"source": "chat"}, {"source": "email"}, {"source": "file"}],
+                              k=3, n=4)
+
+    assert sorted(sources) == ["chat", "email", "file"]
+    assert [chunk.id for chunk in selection.chunks] == ["chat-0_0", "file-0_0", "email-0_0", "chat-1_0"]
+
+
+def test_aquery_sources_uses_cache_and_async_upsert_invalidates():
+    """Test the async path: cached sources are not queried again until an upsert touches them"""
+    paths = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        return _response(request)
+
+    async def run():
+        client = create_client("http://memory", "secret", query_cache=QueryCache(ttl=60),
+                               httpx_args={"transport": httpx.MockTransport(handler)})
+        filters = [{"source": "chat"}, {"source": "email"}]
+        first = await aquery_sources(client, "plans", filters, k=3, threshold=0.75)
+        await aquery_sources(client, "plans", filters, k=3, threshold=0.75)
+        await aupsert_information(client, "doc1", "Going to Lisbon", "chat-1", "2024-05-01", "user", source="chat")
+        await aquery_sources(client, "plans", filters, k=3, threshold=0.75)
+        await client.aclose()
+        return first
+
+    selection = asyncio.run(run())
+
+    assert [chunk.id for chunk in selection.chunks] == ["chat-0_0", "email-0_0", "chat-1_0"]
+    assert paths == ["/query", "/query", "/upsert", "/query"]
+
+
+def test_query_sources_keeps_the_callers_context():
+    """Test that the concurrent queries see the caller's request deadline"""
+    budgets = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        budgets.append(remaining_time())
+        return _response(request)
+
+    client = create_client("http://memory", "secret", httpx_args={"transport": httpx.MockTransport(handler)})
+    with deadline_scope(30):
+        query_sources(client, "plans", [{"source": "chat"}, {"source": "email"}], k=3)
+
+    assert len(budgets) == 2 and all(budget is not None and budget <= 30 for budget in budgets)
@@ -0,0 +1,31 @@
+"""Tests for the vectorized post-processing of query results"""
+from .models import QueryResponse
+from .models.query_response import create_json_payload_from_results
+from .postprocess import select_results
+
+
+def _response(*queries):
+    return QueryResponse.from_dict({"results": [
+        {"query": f"query {index}", "results": [
+            {"id": f"{document_id}_{rank}", "text": document_id, "score": score, "metadata": {"document_id": document_id}}
+            for rank, (document_id, score) in enumerate(results)
+        ]}
+        for index, results in enumerate(queries)
+    ]})
+
+
+def test_max_fusion_matches_json_payload():
+    """Test that dedup with max fusion gives the payload of create_json_payload_from_results"""
+    response = _response([("a", 0.9), ("b", 0.8), ("a", 0.7), ("c", 0.2)], [("b", 0.95), ("d", 0.5)])
+    chunks = [chunk for result in response.results for chunk in result.results if chunk.score > 0.3]
+
+    assert select_results(response, threshold=0.3, n=3).payload() == create_json_payload_from_results(chunks)[:3]
+
+
+def test_rrf_favours_documents_found_by_several_queries():
+    """Test that reciprocal-rank fusion ranks a document returned by every query first"""
+    response = _response([("a", 0.9), ("b", 0.8)], [("c", 0.9), ("b", 0.8)])
+
+    selection = select_results(response, fusion="rrf")
+
+    assert [chunk.metadata.document_id for chunk in selection] == ["b", "a", "c"]
@@ -0,0 +1,57 @@
+"""Tests for streamed and compressed upsert request bodies"""
+import asyncio
+import json
+
+import httpx
+
+from . import create_client
+from .api.default import upsert_post
+from .local_transport import create_local_client
+from .models import UpsertRequest
+from .operations import aupsert_information, build_document, query_information, upsert_information
+from .request_body import UpsertBody, decode_body
+
+
+def _request(n=3):
+    documents = [build_document(f"doc{i}", f"Trip number {i} " * 100, "chat-1", "2024-05-01", "user") for i in range(n)]
+    return UpsertRequest(documents=documents)
+
+
+def test_body_matches_to_dict():
+    """Test that the incremental encoding, plain or compressed, decodes to the request dict"""
+    request = _request()
+    request["namespace"] = "travel"
+    body = UpsertBody(request, chunk_size=100)
+
+    assert len(list(body)) > 1
+    assert json.loads(b"".join(body)) == request.to_dict()
+    assert json.loads(decode_body(b"".join(UpsertBody(request, "gzip")), "gzip")) == request.to_dict()
+
+
+def test_large_upserts_are_streamed_compressed():
+    """Test that upserts above stream_upload_min_size are sent chunked with Content-Encoding"""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append((request.headers.get("transfer-encoding"), request.headers.get("content-encoding")))
+        documents = json.loads(decode_body(request.read(), request.headers.get("content-encoding")))["documents"]
+        return httpx.Response(200, json={"ids": [document["id"] for document in documents]})
+
+    client = create_client("http://memory", "secret", request_compression="gzip", stream_upload_min_size=10_000,
+                           httpx_args={"transport": httpx.MockTransport(handler)})
+    small = upsert_post.sync(client=client, json_body=_request(1))
+    large = upsert_post.sync(client=client, json_body=_request(50))
+
+    assert small.ids == ["doc0"] and len(large.ids) == 50
+    assert sent == [(None, "gzip"), ("chunked", "gzip")]
+
+
+def test_local_transport_decodes_compressed_bodies():
+    """Test sync and async compressed, streamed upserts against the embedded store"""
+    client = create_local_client(request_compression="gzip", stream_upload_min_size=0)
+    upsert_information(client, "a", "Going to Lisbon in May " * 100, "chat-1", "2024-05-01", "user")
+    asyncio.run(aupsert_information(client, "b", "Train to Porto in June " * 100, "chat-1", "2024-05-01", "user"))
+
+    response = query_information(client, "Lisbon", source_id="chat-1")
+
+    assert {chunk.metadata.document_id for chunk in response.results[0].results} == {"a", "b"}
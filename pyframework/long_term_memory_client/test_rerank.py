@@ -0,0 +1,39 @@
+"""Tests for MMR reranking"""
+import numpy as np
+
+from .models import DocumentChunkMetadata, DocumentChunkWithScore
+from .rerank import mmr_rerank
+
+
+def _chunk(text, score, embedding=None):
+    chunk = DocumentChunkWithScore(text=text, metadata=DocumentChunkMetadata(), score=score)
+    if embedding is not None:
+        chunk.embedding = embedding
+    return chunk
+
+
+def test_near_duplicates_are_pushed_down():
+    """Test that MMR prefers a less relevant but different chunk over a near duplicate"""
+    chunks = [_chunk("a", 0.9, [1.0, 0.0]), _chunk("a'", 0.89, [0.99, 0.01]), _chunk("b", 0.7, [0.0, 1.0])]
+
+    assert [chunk.text for chunk in mmr_rerank(chunks, k=2)] == ["a", "b"]
+    assert [chunk.text for chunk in mmr_rerank(chunks, k=2, diversity_tradeoff=1.0)] == ["a", "a'"]
+
+
+def test_missing_embeddings_come_from_embedder():
+    """Test that all chunks are embedded with the embedder when some were returned without embeddings"""
+    class Embedder:
+        def __init__(self):
+            self.texts = []
+
+        def embed(self, texts):
+            self.texts.extend(texts)
+            # Another model than the service's, with another dimension
+            return np.array([[1.0, 0.0, 0.0] if text.startswith("a") else [0.0, 0.0, 1.0] for text in texts],
+                            dtype=np.float32)
+
+    embedder = Embedder()
+    chunks = [_chunk("a", 0.9, [1.0, 0.0]), _chunk("a'", 0.89), _chunk("b", 0.7, [0.0, 1.0])]
+
+    assert [chunk.text for chunk in mmr_rerank(chunks, k=2, embedder=embedder)] == ["a", "b"]
+    assert embedder.texts == ["a", "a'", "b"]
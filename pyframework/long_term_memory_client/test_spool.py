@@ -0,0 +1,60 @@
+"""Tests for the durable memory spool"""
+import json
+
+import httpx
+
+from . import create_client
+from .operations import spool_information
+from .spool import MemorySpool
+
+
+def _client(calls, failures):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if failures:
+            failures.pop()
+            return httpx.Response(503, text="busy")
+        if request.url.path == "/delete":
+            calls.append(("delete", body["ids"]))
+            return httpx.Response(200, json={"success": True})
+        texts = [document["text"] for document in body["documents"]]
+        if "rejected" in texts:
+            return httpx.Response(422, json={"detail": [{"loc": ["body"], "msg": "invalid", "type": "value_error"}]})
+        calls.append(("upsert", texts))
+        return httpx.Response(200, json={"ids": [f"id-{text}" for text in texts]})
+
+    return create_client("http://memory", "secret", httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_spooled_operations_survive_restart_and_keep_order(tmp_path):
+    """Test that operations spooled without a drainer are sent in order, after retries, by the next spool"""
+    calls = []
+    client = _client(calls, failures=[1, 1])
+    with MemorySpool(client, str(tmp_path / "spool.db"), drain=False, flush_at_exit=False) as spool:
+        spool_information(spool, None, "first", "chat-1", "2024-05-01", "user")
+        spool_information(spool, None, "second", "chat-1", "2024-05-01", "user")
+        spool.delete(ids=["old"])
+        spool_information(spool, None, "third", "chat-1", "2024-05-01", "user").result()
+        assert spool.depth() == 4
+
+    with MemorySpool(client, str(tmp_path / "spool.db"), retry_initial=0.01, flush_at_exit=False) as spool:
+        assert spool.wait_empty(timeout=5)
+        stats = spool.stats()
+
+    assert calls == [("upsert", ["first", "second"]), ("delete", ["old"]), ("upsert", ["third"])]
+    assert (stats.sent, stats.retries, stats.depth) == (4, 2, 0)
+
+
+def test_rejected_document_goes_to_dead_letters(tmp_path):
+    """Test that a document the service rejects is isolated and the rest of its batch is sent"""
+    calls = []
+    client = _client(calls, failures=[])
+    with MemorySpool(client, str(tmp_path / "spool.db"), drain=False, flush_at_exit=False) as spool:
+        for text in ("a", "b", "rejected", "c"):
+            spool_information(spool, None, text, "chat-1", "2024-05-01", "user")
+
+    with MemorySpool(client, str(tmp_path / "spool.db"), flush_at_exit=False) as spool:
+        assert spool.wait_empty(timeout=5)
+        assert spool.stats().dead_letters == 1
+
+    assert [text for _, texts in calls for text in texts] == ["a", "b", "c"]
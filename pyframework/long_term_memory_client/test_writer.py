@@ -0,0 +1,71 @@
+"""Tests for the background upsert writer"""
+import json
+import threading
+
+import httpx
+import pytest
+
+from . import create_client
+from .models import Document
+from .writer import UpsertWriter, WriterClosed
+
+
+def _client(batches):
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = [document["text"] for document in json.loads(request.content)["documents"]]
+        batches.append(texts)
+        return httpx.Response(200, json={"ids": [f"id-{text}" for text in texts]})
+
+    return create_client("http://memory", "secret", httpx_args={"transport": httpx.MockTransport(handler)})
+
+
+def test_close_writes_pending_documents_and_rejects_new_ones():
+    """Test that close flushes queued documents as one batch and later submits raise WriterClosed"""
+    batches = []
+    with UpsertWriter(_client(batches), max_wait=60, flush_at_exit=False) as writer:
+        futures = [writer.submit(Document(text=f"doc{i}")) for i in range(3)]
+
+    assert [future.result(timeout=0) for future in futures] == ["id-doc0", "id-doc1", "id-doc2"]
+    assert batches == [["doc0", "doc1", "doc2"]]
+    with pytest.raises(WriterClosed):
+        writer.submit(Document(text="late"))
+
+
+def test_submits_racing_close_are_written_or_rejected():
+    """Test that every document accepted while another thread closes the writer is still written"""
+    batches = []
+    writer = UpsertWriter(_client(batches), max_wait=0.001, flush_at_exit=False)
+    futures = []
+
+    def produce():
+        for i in range(10_000):
+            try:
+                futures.append(writer.submit(Document(text=f"doc{i}")))
+            except WriterClosed:
+                return
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while not futures:
+        pass
+    writer.close()
+    producer.join()
+
+    assert all(future.done() for future in futures)
+    assert [future.result() for future in futures] == [f"id-doc{i}" for i in range(len(futures))]
+
+
+def test_close_fails_documents_left_by_a_dead_worker():
+    """Test that documents the worker never picked up fail instead of leaving callers waiting"""
+    class DeadWriter(UpsertWriter):
+        def _run(self):
+            pass
+
+    writer = DeadWriter(_client([]), max_queue=2, flush_at_exit=False)
+    futures = [writer.submit(Document(text=f"doc{i}")) for i in range(2)]
+    writer.close()
+
+    for future in futures:
+        with pytest.raises(WriterClosed):
+            future.result(timeout=0)
+    writer.flush()
@@ -0,0 +1,199 @@
+"""Background micro-batching upsert writer
+
+Documents are queued and written by a background thread as multi-document UpsertRequests, flushed
+when `max_batch_size` documents or `max_batch_chars` characters of text are collected, or
+`max_wait` seconds after the first queued document. Each submitted document gets a Future
+resolving to its id.
+
+The queue is bounded: `submit` blocks (up to `put_timeout`) while `max_queue` documents are
+waiting, which slows producers down instead of growing memory without limit. Pending documents are
+flushed by `close()`, on context manager exit and at interpreter exit.
+
+Example:
+    writer = UpsertWriter(client)
+    future = writer.submit(build_document(None, text, chat_id, created_at, author))
+    ...
+    writer.close()
+"""
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from .api.default.upsert_post import sync_detailed
+from .client import Client
+from .errors import APIError
+from .http_utils import get_parsed_or_raise
+from .models import Document, UpsertRequest, UpsertResponse
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriterClosed(RuntimeError):
+    """Raised when a document is submitted to a closed UpsertWriter"""
+
+
+class UpsertWriter:
+    """
+    Args:
+        client: The API client
+        max_batch_size: Maximum number of documents per UpsertRequest
+        max_batch_chars: Flush once the queued texts reach this many characters
+        max_wait: Seconds to wait for more documents after the first one of a batch
+        max_queue: Maximum number of documents waiting to be written
+        put_timeout: Seconds `submit` waits for queue space before raising queue.Full (None waits forever)
+        flush_at_exit: Register `close` to run at interpreter exit
+    """
+
+    def __init__(self, client: Client, max_batch_size: int = 64, max_batch_chars: int = 1_000_000,
+                 max_wait: float = 0.5, max_queue: int = 10_000, put_timeout: Optional[float] = None,
+                 flush_at_exit: bool = True):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_wait = max_wait
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        # Held while enqueueing so no document can be queued behind the stop marker
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="upsert-writer", daemon=True)
+        self._worker.start()
+        if flush_at_exit:
+            atexit.register(self.close)
+
+    def submit(self, document: Document) -> Future:
+        """
+        Queue a document for writing.
+
+        Returns:
+            Future resolving to the document id, or raising the APIError of its batch
+
+        Raises:
+            WriterClosed: If the writer has been closed
+            queue.Full: If no queue space frees up within `put_timeout`
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosed("UpsertWriter is closed")
+            self._queue.put((document, future), timeout=self.put_timeout)
+        return future
+
+    async def asubmit(self, document: Document) -> str:
+        """Queue a document without blocking the event loop and wait for its id"""
+        try:
+            future = self._submit_nowait(document)
+        except queue.Full:
+            future = await asyncio.to_thread(self.submit, document)
+        return await asyncio.wrap_future(future)
+
+    def _submit_nowait(self, document: Document) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriterClosed("UpsertWriter is closed")
+            self._queue.put_nowait((document, future))
+        return future
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every document queued so far has been written (or failed)"""
+        self._queue.join()
+
+    def close(self):
+        """Write pending documents and stop the background thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # A worker that died cannot make room for the stop marker
+            while self._worker.is_alive():
+                try:
+                    self._queue.put(_STOP, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        self._worker.join()
+        self._fail_pending()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "UpsertWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _fail_pending(self):
+        """Fail the documents the worker left behind, so no caller waits on them forever"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(WriterClosed("UpsertWriter closed before the document was written"))
+            self._queue.task_done()
+
+    def _next_batch(self) -> Tuple[List[Tuple[Document, Future]], bool]:
+        item = self._queue.get()
+        if item is _STOP:
+            self._queue.task_done()
+            return [], True
+
+        batch = [item]
+        chars = len(item[0].text)
+        flush_at = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and chars < self.max_batch_chars:
+            timeout = flush_at - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.task_done()
+                return batch, True
+            batch.append(item)
+            chars += len(item[0].text)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if stopping:
+                # Drain whatever was queued before close()
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            for start in range(0, len(batch), self.max_batch_size):
+                self._write(batch[start:start + self.max_batch_size])
+
+    def _write(self, batch: List[Tuple[Document, Future]]):
+        try:
+            response = get_parsed_or_raise(
+                sync_detailed(client=self.client, json_body=UpsertRequest(documents=[document for document, _ in batch]))
+            )
+            if not isinstance(response, UpsertResponse) or len(response.ids) != len(batch):
+                raise APIError(status_code=422, content=b"",
+                               message=f"Upsert of {len(batch)} documents returned {response.to_dict()}")
+            for (_, future), document_id in zip(batch, response.ids):
+                future.set_result(document_id)
+        except Exception as e:
+            logger.error(f"Upsert batch of {len(batch)} documents failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
@@ -0,0 +1,86 @@
+"""Tests for the image encoding engine"""
+import base64
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from .image import ImageDecodeError, ImageEncoder, ImageNotFound, decode_image, encode_jpeg
+
+
+def _write_jpeg(path, width=2400, height=1600, color=(200, 30, 30)):
+    Image.new("RGB", (width, height), color).save(path, format="JPEG")
+    return str(path)
+
+
+def _size(data):
+    return Image.open(io.BytesIO(base64.b64decode(data))).size
+
+
+def test_decode_downscales_and_converts():
+    """Test that decoded images fit max_size, keep their aspect ratio and are RGB"""
+    buffer = io.BytesIO()
+    Image.new("RGBA", (800, 400), (0, 0, 255, 128)).save(buffer, format="PNG")
+
+    img = decode_image(buffer.getvalue(), (200, 200))
+
+    assert img.size == (200, 100) and img.mode == "RGB"
+
+
+def test_typed_errors(tmp_path):
+    """Test ImageNotFound for missing files and ImageDecodeError for invalid or truncated data"""
+    path = _write_jpeg(tmp_path / "photo.jpg")
+    with open(path, "rb") as f:
+        truncated = f.read()[:200]
+
+    with pytest.raises(ImageNotFound):
+        encode_jpeg(str(tmp_path / "missing.jpg"))
+    with pytest.raises(ImageNotFound):
+        ImageEncoder().encode(str(tmp_path / "missing.jpg"))
+    with pytest.raises(ImageDecodeError):
+        encode_jpeg(b"GIF89a garbage")
+    with pytest.raises(ImageDecodeError):
+        encode_jpeg(truncated)
+
+
+def test_encoder_cache_follows_file_changes(tmp_path):
+    """Test that encodings are cached per file and refreshed when the file changes"""
+    encoder = ImageEncoder(workers=1)
+    path = _write_jpeg(tmp_path / "photo.jpg")
+
+    first = encoder.encode(path, (600, 600))
+    assert encoder.encode(path, (600, 600)) is first
+    assert _size(first) == (600, 400)
+
+    _write_jpeg(path, 1200, 1200, (0, 0, 0))
+    os.utime(path, ns=(0, 0))
+
+    assert _size(encoder.encode(path, (600, 600))) == (600, 600)
+
+
+def test_encode_many_uses_the_process_pool(tmp_path):
+    """Test that a batch with several uncached images is encoded by worker processes in order"""
+    encoder = ImageEncoder(workers=2)
+    paths = [_write_jpeg(tmp_path / f"{i}.jpg", 400 + 100 * i, 300) for i in range(3)]
+    try:
+        results = encoder.encode_many(paths, (300, 300))
+    finally:
+        encoder.shutdown()
+
+    assert [_size(data) for data in results] == [(300, 225), (300, 180), (300, 150)]
+    assert encoder.encode(paths[0], (300, 300)) is results[0]
+
+
+
+def test_streams_are_encoded_without_caching(tmp_path):
+    """Test that file-like sources are encoded uncached and bad ones keep the error string contract"""
+    from .utils import encode_image_to_base64
+
+    encoder = ImageEncoder()
+    with open(_write_jpeg(tmp_path / "photo.jpg"), "rb") as f:
+        assert _size(encoder.encode(f, (600, 600))) == (600, 400)
+    assert _size(encoder.encode(io.BytesIO(base64.b64decode(encoder.encode(str(tmp_path / "photo.jpg")))))) == (1024, 683)
+    assert len(encoder._cache) == 1
+
+    assert encode_image_to_base64(io.BytesIO(b"not an image")).startswith("Error encoding image: ")
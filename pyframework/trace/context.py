@@ -1,3 +1,9 @@
 import contextvars
 
 trace_id_var = contextvars.ContextVar('trace_id', default=None)
+
+# Absolute time.monotonic() value after which the current request's result is no longer useful
+deadline_var = contextvars.ContextVar('deadline', default=None)
+
+# threading.Event set when the HTTP client of the current request disconnects
+disconnect_event_var = contextvars.ContextVar('disconnect_event', default=None)
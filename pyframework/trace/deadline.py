@@ -0,0 +1,139 @@
+# trace/deadline.py
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .context import deadline_var
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work is about to start after the current request's deadline has passed"""
+
+
+def get_deadline() -> Optional[float]:
+    return deadline_var.get()
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left before the current deadline.
+
+    Returns:
+        The remaining seconds (may be negative), or None if no deadline is set
+    """
+    deadline = deadline_var.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(operation: str = "operation"):
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {operation} ({-remaining:.3f}s late)")
+
+
+def bounded_timeout(timeout: Optional[float], operation: str = "operation") -> Optional[float]:
+    """
+    Clamp a timeout to the remaining deadline.
+
+    Args:
+        timeout: The timeout the caller would use without a deadline (None means no timeout)
+        operation: Name used in the DeadlineExceeded message
+
+    Returns:
+        The smaller of timeout and the remaining deadline
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    check_deadline(operation)
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """
+    Run a block with a deadline `seconds` from now. A scope can only shorten an outer deadline.
+
+    Example:
+        with deadline_scope(5):
+            call_model(...)
+    """
+    if seconds is None:
+        yield
+        return
+
+    deadline = time.monotonic() + seconds
+    outer = deadline_var.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+
+    token = deadline_var.set(deadline)
+    try:
+        yield
+    finally:
+        deadline_var.reset(token)
+
+
+class DeadlineMiddleware:
+    """
+    Sets the request deadline from the `x-request-timeout` header (seconds) or a default budget.
+
+    Add it next to TraceIDMiddleware so LLM, memory and database calls made while handling the
+    request can stop once the caller can no longer use the result. The header can only shorten
+    the budget: it is clamped to `max_timeout`, or to the default when no maximum is set, and
+    values that are not finite positive numbers are ignored.
+    """
+
+    HEADER = 'x-request-timeout'
+
+    def __init__(self, app: ASGIApp, default_timeout: Optional[float] = None, max_timeout: Optional[float] = None):
+        self.app = app
+        env_timeout = os.getenv('REQUEST_TIMEOUT')
+        self.default_timeout = default_timeout if default_timeout is not None else (
+            float(env_timeout) if env_timeout else None
+        )
+        self.max_timeout = max_timeout
+        if self.default_timeout is not None and max_timeout is not None:
+            self.default_timeout = min(self.default_timeout, max_timeout)
+        self.logger = logging.getLogger('DeadlineMiddleware')
+        self.logger.setLevel(logging.INFO)
+
+    def _header_timeout(self, value: bytes) -> Optional[float]:
+        try:
+            timeout = float(value.decode('latin1'))
+        except ValueError:
+            timeout = None
+        if timeout is None or not math.isfinite(timeout) or timeout <= 0:
+            self.logger.debug(f"Ignoring invalid {self.HEADER} header: {value!r}")
+            return None
+        return timeout
+
+    def request_timeout(self, scope: Scope) -> Optional[float]:
+        """The budget of a request: the header clamped to the maximum (or default), else the default"""
+        timeout = None
+        for key, value in scope.get('headers', []):
+            if key.decode('latin1').lower() == self.HEADER:
+                timeout = self._header_timeout(value)
+                break
+
+        if timeout is None:
+            return self.default_timeout
+        limit = self.max_timeout if self.max_timeout is not None else self.default_timeout
+        return timeout if limit is None else min(timeout, limit)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        with deadline_scope(self.request_timeout(scope)):
+            await self.app(scope, receive, send)
@@ -0,0 +1,91 @@
+# trace/disconnect.py
+import asyncio
+import logging
+import threading
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .context import disconnect_event_var, trace_id_var
+
+
+class ClientDisconnected(Exception):
+    """Raised by synchronous code that checks for a disconnected client before starting costly work"""
+
+
+def client_disconnected() -> bool:
+    event = disconnect_event_var.get()
+    return event is not None and event.is_set()
+
+
+def check_disconnected(operation: str = "operation"):
+    """
+    Stop synchronous work (e.g. a threadpool endpoint) once the HTTP client has gone away.
+
+    Async work is cancelled directly by DisconnectMiddleware, this covers code running in threads,
+    which cannot be cancelled from the event loop.
+
+    Raises:
+        ClientDisconnected: If the client of the current request has disconnected
+    """
+    if client_disconnected():
+        raise ClientDisconnected(f"Client disconnected before {operation}")
+
+
+class DisconnectMiddleware:
+    """
+    Cancels the request handler when the client sends `http.disconnect`.
+
+    The middleware becomes the only reader of `receive` and forwards every message to the
+    handler through a queue, so it notices a disconnect even while the handler is busy awaiting
+    an LLM or memory call. Add it inside TraceIDMiddleware so cancellations are logged with the
+    request's trace id.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.logger = logging.getLogger('DisconnectMiddleware')
+        self.logger.setLevel(logging.INFO)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = threading.Event()
+        token = disconnect_event_var.set(disconnected)
+
+        async def receive_wrapper():
+            return await messages.get()
+
+        # The handler task copies the current context, so it sees the disconnect event too
+        app_task = asyncio.ensure_future(self.app(scope, receive_wrapper, send))
+
+        async def watch():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    app_task.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        watcher.add_done_callback(self._watcher_done)
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not (disconnected.is_set() and app_task.cancelled()):
+                raise
+            self.logger.info(
+                f"Client disconnected, cancelled {scope.get('method')} {scope.get('path')} "
+                f"(trace_id={trace_id_var.get() or 'no-trace-id'})"
+            )
+        finally:
+            watcher.cancel()
+            await asyncio.wait([watcher])
+            disconnect_event_var.reset(token)
+
+    def _watcher_done(self, watcher: asyncio.Task):
+        # Retrieve the result so a failing receive() is logged instead of "never retrieved"
+        if not watcher.cancelled() and watcher.exception() is not None:
+            self.logger.warning(f"Disconnect watcher failed: {watcher.exception()!r}")
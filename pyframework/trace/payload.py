@@ -13,6 +13,7 @@ class PayloadMiddleware:
     SKIP_PATH_PREFIXES = [
         "/api/ml_data_candles",
     ]
+    STREAMING_MEDIA_TYPES = ("text/event-stream",)
 
     def __init__(self, app: ASGIApp):
         self.app = app
@@ -48,12 +49,14 @@ class PayloadMiddleware:
         # Capture the response
         response_body = b''
         status_code = None
+        streaming = False
 
         async def send_wrapper(message):
-            nonlocal response_body, status_code
+            nonlocal response_body, status_code, streaming
             if message['type'] == 'http.response.start':
                 status_code = message['status']
-            elif message['type'] == 'http.response.body':
+                streaming = self._is_streaming(message.get('headers', []))
+            elif message['type'] == 'http.response.body' and not streaming:
                 response_body += message.get('body', b'')
             await send(message)
 
@@ -76,6 +79,10 @@ class PayloadMiddleware:
         self.logger.info(f"{scope['method']} {path} {request_body_str}")
 
         # Log the response
+        if streaming:
+            self.logger.info(f"response: {status_code} [streamed response not logged]")
+            return
+
         try:
             response_body_str = response_body.decode('utf-8')
             response_json = json.loads(response_body_str)
@@ -86,6 +93,17 @@ class PayloadMiddleware:
         response_body_str = self._truncate(response_body_str)
         self.logger.info(f"response: {status_code} {response_body_str}")
 
+    def _is_streaming(self, raw_headers) -> bool:
+        # Event streams and bodies marked as unbuffered are passed through without being captured
+        for key, value in raw_headers:
+            key = key.decode('latin1').lower()
+            value = value.decode('latin1').lower()
+            if key == 'content-type' and value.startswith(self.STREAMING_MEDIA_TYPES):
+                return True
+            if key == 'x-accel-buffering' and value == 'no':
+                return True
+        return False
+
     def _truncate(self, text: str) -> str:
         if len(text) > self.MAX_LOG_CHARS:
             return text[: self.MAX_LOG_CHARS] + "...[truncated]"
@@ -0,0 +1,63 @@
+"""Tests for request deadlines"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from .deadline import DeadlineExceeded, DeadlineMiddleware, bounded_timeout, deadline_scope, remaining_time
+
+
+def _budget(middleware_args, header=None):
+    """The remaining time seen by a handler behind DeadlineMiddleware"""
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(remaining_time())
+
+    headers = [(b"x-request-timeout", header.encode("latin1"))] if header is not None else []
+    middleware = DeadlineMiddleware(app, **middleware_args)
+    asyncio.run(middleware({"type": "http", "headers": headers}, None, None))
+    return seen[0]
+
+
+def test_header_can_only_shorten_the_budget():
+    """Test that the header is clamped to the maximum, or to the default when there is none"""
+    assert _budget({"default_timeout": 10}, "2") == pytest.approx(2, abs=0.1)
+    assert _budget({"default_timeout": 10}, "600") == pytest.approx(10, abs=0.1)
+    assert _budget({"default_timeout": 10, "max_timeout": 30}, "20") == pytest.approx(20, abs=0.1)
+    assert _budget({"default_timeout": 60, "max_timeout": 30}) == pytest.approx(30, abs=0.1)
+
+
+@pytest.mark.parametrize("header", ["nan", "inf", "-inf", "-5", "0", "soon"])
+def test_invalid_headers_fall_back_to_the_default(header):
+    """Test that non-finite, non-positive and unparsable headers are ignored"""
+    assert _budget({"default_timeout": 10}, header) == pytest.approx(10, abs=0.1)
+    assert _budget({}, header) is None
+
+
+def test_bounded_timeout_clamps_to_the_deadline():
+    """Test that timeouts shrink to the remaining deadline and fail once it has passed"""
+    assert bounded_timeout(30) == 30
+    with deadline_scope(1):
+        assert bounded_timeout(30) == pytest.approx(1, abs=0.1)
+        assert bounded_timeout(None) == pytest.approx(1, abs=0.1)
+        assert bounded_timeout(0.5) == 0.5
+        with deadline_scope(10):
+            assert remaining_time() <= 1
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            bounded_timeout(30, "query")
+
+
+def test_retries_stop_before_the_deadline():
+    """Test that LLM retries stop when the backoff sleep would outlast the deadline"""
+    from pyframework.chat.base import _stop_before_deadline
+
+    retry_state = SimpleNamespace(upcoming_sleep=4)
+    assert not _stop_before_deadline(retry_state)
+    with deadline_scope(2):
+        assert _stop_before_deadline(retry_state)
+    with deadline_scope(10):
+        assert not _stop_before_deadline(retry_state)
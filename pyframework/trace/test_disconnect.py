@@ -0,0 +1,67 @@
+"""Tests for cancelling requests whose client disconnected"""
+import asyncio
+import threading
+
+from .disconnect import ClientDisconnected, DisconnectMiddleware, check_disconnected, client_disconnected
+
+
+def _receive(messages):
+    async def receive():
+        message = messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        if message["type"] == "http.disconnect":
+            await asyncio.sleep(0.05)
+        return message
+
+    return receive
+
+
+def test_disconnect_cancels_handler_and_stops_threads():
+    """Test that a disconnect cancels the handler and makes check_disconnected raise in its threads"""
+    stopped, errors, cancelled = threading.Event(), [], []
+
+    def work():
+        # A threadpool endpoint polling between costly steps
+        while not client_disconnected():
+            stopped.wait(0.01)
+        try:
+            check_disconnected("summary")
+        except ClientDisconnected as e:
+            errors.append(e)
+        stopped.set()
+
+    async def app(scope, receive, send):
+        assert (await receive())["type"] == "http.request"
+        try:
+            await asyncio.to_thread(work)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    middleware = DisconnectMiddleware(app)
+    messages = [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}]
+    asyncio.run(middleware({"type": "http", "method": "POST", "path": "/chat"}, _receive(messages), None))
+
+    assert stopped.wait(1)
+    assert cancelled == [True]
+    assert len(errors) == 1
+    assert not client_disconnected()
+
+
+def test_watcher_errors_are_consumed(caplog):
+    """Test that a failing receive() is logged and does not leak an unretrieved task exception"""
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.05)
+
+    middleware = DisconnectMiddleware(app)
+    asyncio.run(middleware({"type": "http"}, _receive([RuntimeError("receive failed")]), None))
+
+    assert "Disconnect watcher failed: RuntimeError('receive failed')" in caplog.text
+    assert "never retrieved" not in caplog.text
+
+
+def test_check_disconnected_outside_requests():
+    """Test that code running outside a request is never considered disconnected"""
+    check_disconnected()
+    assert not client_disconnected()
@@ -1,6 +1,4 @@
-import base64
 import datetime
-import io
 import os
 import re
 import textwrap
@@ -9,9 +7,9 @@ from functools import lru_cache
 import pytz
 import regex
 from IPython.display import Markdown
-from PIL import Image
 
 from pyframework.file import read_text_file
+from pyframework.image import ImageEncodingError, image_encoder
 
 UNAUTHORIZED_MESSAGE = "Unauthorized: Invalid client token."
 BAD_REQUEST_MESSAGE = "Bad Request: 'ticker' and 'operation' must be present in the request body."
@@ -179,20 +177,9 @@ def is_time_between(self, begin_time, end_time, check_time):
 
 def encode_image_to_base64(image_path):
     try:
-        with Image.open(image_path) as img:
-
-            # Resize image if it's too large
-            max_size = (1024, 1024)
-            img.thumbnail(max_size, Image.DEFAULT_STRATEGY)
-
-            # Convert image to RGB if it's not
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='JPEG')
-            return base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-    except Exception as e:
-        return f"Error encoding image: {str(e)}"
+        return image_encoder.encode(image_path)
+    except ImageEncodingError as e:
+        return f"Error encoding image: {e.message}"
 
 
 @lru_cache(maxsize=None)